@@ -1,13 +1,23 @@
 import os
 from contextlib import asynccontextmanager
+from typing import Annotated
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from api.sections.cache import load_section_cache
-from api.sections.helpers import load_ratings
+from api.sections.cache import load_semester_caches, start_section_cache_reloader
+from api.sections.encoded import json_response
+from api.sections.helpers import get_section_cache, load_global_sections, load_ratings
+from api.sections.parse_cache import load_parse_cache
+from api.sections.ratings_index import (
+    DEFAULT_SEARCH_LIMIT,
+    RatingsIndex,
+    build_ratings_index,
+)
+from api.sections.router import CATALOG_VERSION_HEADER
 from api.sections.router import router as section_router
+from scraper.catalog_store import CatalogStore
 from scraper.files import Files
 from scraper.models import GlobalAllSections, Rating
 
@@ -16,10 +26,19 @@ _ = load_dotenv()
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    _app.state.section_cache = load_section_cache()
-    _app.state.ratings = load_ratings()
+    _app.state.catalog_store = CatalogStore(Files().catalog_dir)
+    _app.state.section_caches = load_semester_caches(
+        catalog_store=_app.state.catalog_store
+    )
+    _app.state.ratings_index = build_ratings_index(load_ratings())
+    _app.state.parse_cache = load_parse_cache()
+    reloader = start_section_cache_reloader(_app.state)
+
     yield
 
+    if reloader is not None:
+        reloader.stop()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -54,26 +73,51 @@ async def health():
     return {"status": "ok"}
 
 
-@app.get("/global-all-sections")
-async def get_global_all_sections() -> GlobalAllSections:
-    files = Files()
-    globalAllSections = files.get_global_all_sections_content()
+@app.get("/global-all-sections", response_model=GlobalAllSections)
+async def get_global_all_sections(
+    request: Request, semester: str | None = None
+) -> Response | GlobalAllSections:
+    section_cache = get_section_cache(request, semester)
+
+    if section_cache is not None:
+        return json_response(
+            request,
+            section_cache.global_json,
+            {CATALOG_VERSION_HEADER: section_cache.version},
+        )
+
+    return load_global_sections(semester)
+
+
+def _get_ratings_index(request: Request) -> RatingsIndex:
+    ratings_index = getattr(request.app.state, "ratings_index", None)
+
+    if isinstance(ratings_index, RatingsIndex):
+        return ratings_index
+
+    return build_ratings_index(load_ratings())
+
 
-    return globalAllSections
+# declared before /ratings/{prof} so "search" isn't taken for a prof
+@app.get("/ratings/search")
+async def search_ratings(
+    request: Request,
+    q: str,
+    limit: Annotated[int, Query(ge=1, le=100)] = DEFAULT_SEARCH_LIMIT,
+) -> list[Rating]:
+    return _get_ratings_index(request).search(q, limit)
 
 
 @app.get("/ratings/{prof}")
 async def get_rating_prof(prof: str, request: Request) -> Rating:
-    ratings = getattr(request.app.state, "ratings", None)
-    if ratings is None:
-        ratings = load_ratings()
+    rating = _get_ratings_index(request).get(prof)
 
-    if prof not in ratings:
+    if rating is None:
         raise HTTPException(
             status_code=400, detail=f"Rating for prof '{prof}' not found"
         )
 
-    return ratings[prof]
+    return rating
 
 
 @app.get("/ratings")
@@ -1,31 +1,328 @@
-from __future__ import annotations
-
+import logging
 import os
-from dataclasses import dataclass
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import final
+
+from starlette.datastructures import State
 
+from api.sections.encoded import EncodedJson, encode_json, join_json_array
+from api.sections.section_index import (
+    RawSection,
+    SectionIndex,
+    build_raw_section_index,
+)
+from scraper.catalog_store import CatalogStore, catalog_version
+from scraper.compact_sections import load_compact_sections
 from scraper.files import Files
-from scraper.models import Section
+from scraper.models import GlobalAllSections, Section
+from scraper.util import normalize_semester
+
+logger = logging.getLogger(__name__)
+
+SECTION_CACHE_RELOAD_SECONDS = float(
+    os.environ.get("SECTION_CACHE_RELOAD_SECONDS", str(5))
+)
+
+# path, mtime in ns and size of a file the section caches were built from
+type SourceStat = tuple[str, int, int]
 
 
 @dataclass(frozen=True)
 class SectionCache:
-    by_id: dict[str, Section]
-    all_sections: tuple[Section, ...]
+    """
+    The sections are kept as their encoded json, and the index is built from their
+    decoded json, so a Section is only validated when one is asked for
+    """
+
+    semester: str
+    # version of the sections in the catalog store, changes are served since a version
+    version: str
+
+    # id of the section at each position of the index
+    ids: tuple[str, ...]
+    index: SectionIndex
+
+    # the sections are never mutated once loaded, so their json is encoded once
+    json_by_id: dict[str, EncodedJson]
+    all_json: EncodedJson
+    # the whole GlobalAllSections, with the diff and comments
+    global_json: EncodedJson
+
+    # the encoded changes since each version they were precomputed since, see CatalogStore
+    changes_json: dict[str, EncodedJson] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    _sections_by_id: dict[str, Section] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    def section_json(self, position: int) -> bytes:
+        return self.json_by_id[self.ids[position]].body
+
+    def get_section(self, section_id: str) -> Section | None:
+        section = self._sections_by_id.get(section_id)
+
+        if section is None:
+            encoded = self.json_by_id.get(section_id)
+            if encoded is None:
+                return None
+
+            section = Section.model_validate_json(encoded.body)
+            self._sections_by_id[section_id] = section
+
+        return section
+
+
+@dataclass(frozen=True)
+class SemesterSectionCaches:
+    """
+    The section cache of every semester, keyed by GlobalAllSections.semester.
+    The current semester is the one of all_sections_final.json
+    """
+
+    current_semester: str
+    by_semester: dict[str, SectionCache]
+    sources: tuple[SourceStat, ...]
+
+    def get(self, semester: str | None = None) -> SectionCache | None:
+        if semester is None:
+            return self.by_semester[self.current_semester]
+
+        return self.by_semester.get(normalize_semester(semester))
 
 
 def section_cache_enabled() -> bool:
     return os.environ.get("ENABLE_SECTION_CACHE", "1") != "0"
 
 
-def load_section_cache() -> SectionCache | None:
+def load_semester_caches(
+    use_compact: bool = True,
+    files: Files | None = None,
+    catalog_store: CatalogStore | None = None,
+) -> SemesterSectionCaches | None:
+    """
+    Loads the section cache of the current semester and of every archived semester,
+    with the changes to their versions from the catalog store
+    """
     if not section_cache_enabled():
         return None
 
-    files = Files()
-    global_sections = files.get_global_all_sections_content()
-    all_sections = tuple(
+    files = files or Files()
+    catalog_store = catalog_store or CatalogStore(files.catalog_dir)
+    # taken before loading, so a file changed while loading is loaded again later
+    sources = section_cache_sources(files)
+
+    current = load_section_cache(use_compact, files)
+    if current is None:
+        return None
+
+    by_semester: dict[str, SectionCache] = {}
+    for path in sorted(files.global_semesters_dir.glob("*.json")):
+        try:
+            with open(path, "r") as file:
+                global_sections = GlobalAllSections.model_validate_json(file.read())
+        except (OSError, ValueError) as err:
+            # an archived semester that can't be loaded isn't served, the others still are
+            logger.warning(f"Could not load the archived semester at {path}: {err}")
+            continue
+
+        if (cache := _global_sections_cache(global_sections)) is not None:
+            by_semester[cache.semester] = cache
+
+    by_semester[current.semester] = current
+
+    return SemesterSectionCaches(
+        current_semester=current.semester,
+        by_semester={
+            semester: replace(cache, changes_json=_load_changes(catalog_store, cache))
+            for semester, cache in by_semester.items()
+        },
+        sources=sources,
+    )
+
+
+def _load_changes(
+    catalog_store: CatalogStore, cache: SectionCache
+) -> dict[str, EncodedJson]:
+    return {
+        since: encode_json(changes_json, compress=True)
+        for since, changes_json in catalog_store.changes(cache.version).items()
+    }
+
+
+def section_cache_sources(files: Files) -> tuple[SourceStat, ...]:
+    paths = [
+        files.global_all_sections_final_path_json,
+        files.global_all_sections_compact_path,
+        *sorted(files.global_semesters_dir.glob("*.json")),
+    ]
+
+    return tuple(source for path in paths if (source := source_stat(path)) is not None)
+
+
+def source_stat(path: Path) -> SourceStat | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+@final
+class SectionCacheReloader:
+    """
+    Polls the files the section caches were built from and rebuilds the caches
+    in the background when one of them changes. The new caches replace the old ones
+    in a single assignment, so in-flight requests finish with the caches they started with
+    """
+
+    def __init__(
+        self, state: State, interval_seconds: float, files: Files | None = None
+    ) -> None:
+        self.state = state
+        self.interval_seconds = interval_seconds
+        self.files = files or Files()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="section-cache-reloader", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Rebuilds the caches if their files changed.
+        Returns whether the caches were replaced
+        """
+        caches: SemesterSectionCaches | None = getattr(
+            self.state, "section_caches", None
+        )
+        if caches is not None and caches.sources == section_cache_sources(self.files):
+            return False
+
+        try:
+            new_caches = load_semester_caches(
+                files=self.files,
+                catalog_store=getattr(self.state, "catalog_store", None),
+            )
+        except (OSError, ValueError) as err:
+            # most likely a file being written, the old caches are kept until the next poll
+            logger.warning(f"Could not reload the section caches: {err}")
+            return False
+
+        if new_caches is None:
+            return False
+
+        self.state.section_caches = new_caches
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            _ = self.reload_if_changed()
+
+
+def start_section_cache_reloader(state: State) -> SectionCacheReloader | None:
+    if not section_cache_enabled() or SECTION_CACHE_RELOAD_SECONDS <= 0:
+        return None
+
+    reloader = SectionCacheReloader(state, SECTION_CACHE_RELOAD_SECONDS)
+    reloader.start()
+    return reloader
+
+
+def load_section_cache(
+    use_compact: bool = True, files: Files | None = None
+) -> SectionCache | None:
+    """
+    Loads the sections from the compact copy of all_sections_final.json when it is up to date,
+    otherwise from the json itself
+    """
+    if not section_cache_enabled():
+        return None
+
+    files = files or Files()
+
+    if use_compact and (
+        cache := _load_compact_section_cache(
+            files.global_all_sections_compact_path,
+            files.global_all_sections_final_path_json,
+        )
+    ):
+        return cache
+
+    return _global_sections_cache(files.get_global_all_sections_content())
+
+
+def _global_sections_cache(global_sections: GlobalAllSections) -> SectionCache | None:
+    sections = [
         section.model_copy(update={"id": f"{section.code}-{section.section}"})
         for section in global_sections.sections_by_id.values()
+    ]
+    sections_json = [
+        section.model_dump_json(by_alias=True).encode() for section in sections
+    ]
+
+    return _build_section_cache(
+        global_sections.semester,
+        [section.model_dump(mode="json", by_alias=True) for section in sections],
+        sections_json,
+        join_json_array(sections_json),
+        global_sections.model_dump_json(by_alias=True).encode(),
+    )
+
+
+def _load_compact_section_cache(
+    compact_path: Path, source_path: Path
+) -> SectionCache | None:
+    compact = load_compact_sections(compact_path, source_path)
+
+    if compact is None:
+        return None
+
+    return _build_section_cache(
+        compact.semester,
+        compact.index_sections,
+        compact.section_bodies,
+        compact.body,
+        compact.global_json(),
+    )
+
+
+def _build_section_cache(
+    semester: str,
+    raw_sections: Sequence[RawSection],
+    sections_json: Sequence[bytes],
+    all_json: bytes,
+    global_json: bytes,
+) -> SectionCache | None:
+    # the json of the sections is served as is, so their ids must already be canonical
+    if any(
+        section["id"] != f"{section['code']}-{section['section']}"
+        for section in raw_sections
+    ):
+        return None
+
+    ids = tuple(section["id"] for section in raw_sections)
+
+    return SectionCache(
+        semester=semester,
+        version=catalog_version(all_json),
+        ids=ids,
+        index=build_raw_section_index(raw_sections),
+        json_by_id={
+            section_id: encode_json(section_json)
+            for section_id, section_json in zip(ids, sections_json)
+        },
+        all_json=encode_json(all_json, compress=True),
+        global_json=encode_json(global_json, compress=True),
     )
-    by_id = {section.id: section for section in all_sections}
-    return SectionCache(by_id=by_id, all_sections=all_sections)
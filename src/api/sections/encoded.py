@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+
+try:
+    import brotli  # type: ignore[import-untyped]
+except ImportError:  # brotli is optional, only gzip variants are built without it
+    brotli = None
+
+
+@dataclass(frozen=True)
+class EncodedJson:
+    """
+    A json body encoded once, with its etag and optionally its compressed variants
+    """
+
+    body: bytes
+    etag: str
+    gzip: bytes | None = None
+    br: bytes | None = None
+
+
+def encode_json(body: bytes, compress: bool = False) -> EncodedJson:
+    # weak since the compressed variants share the etag of the body
+    etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    if not compress:
+        return EncodedJson(body=body, etag=etag)
+
+    return EncodedJson(
+        body=body,
+        etag=etag,
+        gzip=gzip.compress(body, compresslevel=9),
+        br=brotli.compress(body) if brotli is not None else None,
+    )
+
+
+def join_json_array(items: Iterable[bytes]) -> bytes:
+    """
+    Joins already encoded json values into a json array
+    """
+    return b"[" + b",".join(items) + b"]"
+
+
+def json_response(
+    request: Request,
+    encoded: EncodedJson,
+    extra_headers: Mapping[str, str] | None = None,
+) -> Response:
+    """
+    Serves the encoded json as is, answering 304 when the client already has it
+    and picking the best compressed variant the client accepts
+    """
+    headers = {"ETag": encoded.etag, "Vary": "Accept-Encoding", **(extra_headers or {})}
+
+    if _etag_matches(request.headers.get("if-none-match"), encoded.etag):
+        return Response(status_code=304, headers=headers)
+
+    accepted = _accepted_encodings(request.headers.get("accept-encoding"))
+    content = encoded.body
+
+    if encoded.br is not None and "br" in accepted:
+        content = encoded.br
+        headers["Content-Encoding"] = "br"
+    elif encoded.gzip is not None and "gzip" in accepted:
+        content = encoded.gzip
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+
+    opaque_tag = etag.removeprefix("W/")
+
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque_tag:
+            return True
+
+    return False
+
+
+def _accepted_encodings(accept_encoding: str | None) -> set[str]:
+    if accept_encoding is None:
+        return set()
+
+    accepted: set[str] = set()
+
+    for token in accept_encoding.split(","):
+        encoding, _, params = token.partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(encoding.strip().lower())
+
+    return accepted
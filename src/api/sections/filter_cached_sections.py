@@ -1,50 +1,12 @@
 from __future__ import annotations
 
-from scraper.models import Section, Status
+import numpy as np
 
-
-def _contains_ignore_case(value: str, query: str) -> bool:
-    return query in value.lower()
-
-
-def _starts_with_ignore_case(value: str, query: str) -> bool:
-    return value.lower().startswith(query)
-
-
-def _valid_rating_for_min(section: Section, min_rating: int) -> bool:
-    for leclab in section.leclabs:
-        rating = leclab.rating
-        if rating is None or rating.status != Status.FOUND or rating.avg < min_rating:
-            return False
-    return True
-
-
-def _valid_rating_for_max(section: Section, max_rating: int) -> bool:
-    for leclab in section.leclabs:
-        rating = leclab.rating
-        if rating is None or rating.status != Status.FOUND or rating.avg > max_rating:
-            return False
-    return True
-
-
-def _valid_score_for_min(section: Section, min_score: int) -> bool:
-    for leclab in section.leclabs:
-        rating = leclab.rating
-        if rating is None or rating.status != Status.FOUND or rating.score < min_score:
-            return False
-    return True
-
-
-def _valid_score_for_max(section: Section, max_score: int) -> bool:
-    for leclab in section.leclabs:
-        rating = leclab.rating
-        if rating is None or rating.status != Status.FOUND or rating.score > max_score:
-            return False
-    return True
+from api.sections.section_index import SectionIndex, day_columns
 
 
 def filter_cached_sections(
-    sections: tuple[Section, ...],
+    index: SectionIndex,
     q: str | None = None,
     course: str | None = None,
     domain: str | None = None,
@@ -62,132 +24,97 @@ def filter_cached_sections(
     honours: bool = False,
     limit: int | None = None,
     offset: int = 0,
-) -> list[Section]:
-    qv = q.lower() if q is not None else None
-    coursev = course.lower() if course is not None else None
-    domainv = domain.lower() if domain is not None else None
-    codev = code.lower() if code is not None else None
-    titlev = title.lower() if title is not None else None
-    teacherv = teacher.lower() if teacher is not None else None
-
-    filtered = sections
-
-    if qv is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if _contains_ignore_case(section.title, qv)
-            or _starts_with_ignore_case(section.course, qv)
-            or _starts_with_ignore_case(section.domain, qv)
-            or _contains_ignore_case(section.code, qv)
-        )
+) -> list[int]:
+    """
+    Returns the positions of the sections matching every given filter, in order,
+    without touching the sections themselves.
+    The numeric filters are combined into a single mask over the columns of the index
+    """
+    mask = np.ones(index.size, dtype=np.bool_)
 
-    if coursev is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if _starts_with_ignore_case(section.course, coursev)
-        )
-
-    if domainv is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if _starts_with_ignore_case(section.domain, domainv)
-        )
+    if days_off is not None:
+        mask &= ~index.occupancy[:, day_columns(days_off)].any(axis=1)
 
-    if codev is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if _contains_ignore_case(section.code, codev)
-        )
+    if time_start_query is not None:
+        mask &= index.earliest_start >= int(time_start_query)
 
-    if titlev is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if _contains_ignore_case(section.title, titlev)
-        )
+    if time_end_query is not None:
+        mask &= index.latest_end <= int(time_end_query)
 
     if blended:
-        filtered = tuple(
-            section for section in filtered if section.more.startswith("BLENDED")
-        )
+        mask &= index.blended
 
     if honours:
-        filtered = tuple(
-            section for section in filtered if section.more.startswith("For Honours")
-        )
-
-    if teacherv is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if any(teacherv in leclab.prof.lower() for leclab in section.leclabs)
-        )
+        mask &= index.honours
 
     if min_rating is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if _valid_rating_for_min(section, min_rating)
-        )
+        mask &= index.lowest_avg >= min_rating
 
     if max_rating is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if _valid_rating_for_max(section, max_rating)
-        )
+        mask &= index.highest_avg <= max_rating
 
     if min_score is not None:
-        filtered = tuple(
-            section for section in filtered if _valid_score_for_min(section, min_score)
-        )
+        mask &= index.lowest_score >= min_score
 
     if max_score is not None:
-        filtered = tuple(
-            section for section in filtered if _valid_score_for_max(section, max_score)
-        )
+        mask &= index.highest_score <= max_score
 
-    if days_off is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if all(
-                not any(day_off in day_time.day for day_off in days_off)
-                for leclab in section.leclabs
-                for day_time in leclab.day_times
-            )
-        )
+    candidates = _filter_text(index, q, course, domain, code, title, teacher)
 
-    if time_start_query is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if all(
-                day_time.start_time_hhmm >= time_start_query
-                for leclab in section.leclabs
-                for day_time in leclab.day_times
-            )
+    if candidates is None:
+        positions = np.flatnonzero(mask)
+    else:
+        positions = np.fromiter(
+            sorted(candidates), dtype=np.intp, count=len(candidates)
         )
-
-    if time_end_query is not None:
-        filtered = tuple(
-            section
-            for section in filtered
-            if all(
-                day_time.end_time_hhmm <= time_end_query
-                for leclab in section.leclabs
-                for day_time in leclab.day_times
-            )
+        positions = positions[mask[positions]]
+
+    end = None if limit is None else offset + limit
+    return positions[offset:end].tolist()
+
+
+def _filter_text(
+    index: SectionIndex,
+    q: str | None,
+    course: str | None,
+    domain: str | None,
+    code: str | None,
+    title: str | None,
+    teacher: str | None,
+) -> set[int] | None:
+    """
+    Resolves the text filters to the positions of the matching sections
+    through the index, intersecting each filter's matches.
+    Returns None when there is no text filter
+    """
+    matches: list[set[int]] = []
+
+    if q is not None:
+        qv = q.lower()
+        matches.append(
+            index.title.containing(qv)
+            | index.course.starting_with(qv)
+            | index.domain.starting_with(qv)
+            | index.code.containing(qv)
         )
 
-    if offset > 0:
-        filtered = filtered[offset:]
+    if course is not None:
+        matches.append(index.course.starting_with(course.lower()))
+
+    if domain is not None:
+        matches.append(index.domain.starting_with(domain.lower()))
+
+    if code is not None:
+        matches.append(index.code.containing(code.lower()))
+
+    if title is not None:
+        matches.append(index.title.containing(title.lower()))
+
+    if teacher is not None:
+        matches.append(index.teacher.containing(teacher.lower()))
 
-    if limit is not None:
-        filtered = filtered[:limit]
+    if not matches:
+        return None
 
-    return list(filtered)
+    matches.sort(key=len)
+    return matches[0].intersection(*matches[1:])
@@ -1,12 +1,22 @@
+import functools
+import hashlib
 import os
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 
-from fastapi import HTTPException, UploadFile
+from fastapi import HTTPException, Request, UploadFile
 from pydantic import TypeAdapter
 
+from api.sections.cache import (
+    SectionCache,
+    SemesterSectionCaches,
+    SourceStat,
+    source_stat,
+)
+from api.sections.section_index import SectionIndex, build_section_index
 from scraper.files import Files
-from scraper.models import Rating, Section
+from scraper.models import GlobalAllSections, Rating, Section
+from scraper.util import normalize_semester
 
 
 UPLOAD_CHUNK_SIZE = 1024 * 1024
@@ -19,15 +29,74 @@ def _canonical_section_id(section: Section) -> str:
     return f"{section.code}-{section.section}"
 
 
-def load_sections_from_json() -> tuple[Section, ...]:
-    files = Files()
-    global_sections = files.get_global_all_sections_content()
+def load_sections_from_json(semester: str | None = None) -> tuple[Section, ...]:
+    global_sections = load_global_sections(semester)
     return tuple(
         section.model_copy(update={"id": _canonical_section_id(section)})
         for section in global_sections.sections_by_id.values()
     )
 
 
+def load_indexed_sections(
+    semester: str | None = None,
+) -> tuple[tuple[Section, ...], SectionIndex]:
+    """
+    Loads the sections like load_sections_from_json along with their index,
+    which is only built again once the files they may be loaded from changed
+    """
+    files = Files()
+    paths = [files.global_all_sections_final_path_json]
+    if semester is not None:
+        semester = normalize_semester(semester)
+        paths.append(files.global_semester_path(semester))
+
+    return _load_indexed_sections(semester, tuple(source_stat(p) for p in paths))
+
+
+@functools.lru_cache(maxsize=4)
+def _load_indexed_sections(
+    semester: str | None, _sources: tuple[SourceStat | None, ...]
+) -> tuple[tuple[Section, ...], SectionIndex]:
+    sections = load_sections_from_json(semester)
+    return sections, build_section_index(sections)
+
+
+def load_global_sections(semester: str | None = None) -> GlobalAllSections:
+    """
+    Gets the global all sections of the given semester, the current one by default.
+    Raises 404 if there are none for that semester
+    """
+    files = Files()
+    global_sections = files.get_global_all_sections_content()
+
+    if semester is None or normalize_semester(semester) == global_sections.semester:
+        return global_sections
+
+    archived = files.get_global_semester_content(semester)
+    if archived is None:
+        raise HTTPException(status_code=404, detail=f"Semester {semester} not found")
+
+    return archived
+
+
+def get_section_cache(request: Request, semester: str | None) -> SectionCache | None:
+    """
+    Gets the cache of the given semester, the current one by default.
+    Returns None when the sections aren't cached
+    """
+    # read once, the reloader may swap the caches in the middle of the request
+    section_caches = getattr(request.app.state, "section_caches", None)
+
+    if not isinstance(section_caches, SemesterSectionCaches):
+        return None
+
+    section_cache = section_caches.get(semester)
+    if section_cache is None:
+        raise HTTPException(status_code=404, detail=f"Semester {semester} not found")
+
+    return section_cache
+
+
 def lookup_section(
     by_id: dict[str, Section],
     section_id: str,
@@ -40,31 +109,39 @@ def load_ratings() -> dict[str, Rating]:
     return TypeAdapter(dict[str, Rating]).validate_json(files.ratings_path.read_text())
 
 
-def copy_upload_to_tempfile(file: UploadFile) -> Path:
+def copy_upload_to_tempfile(
+    file: UploadFile, max_bytes: int = MAX_PDF_UPLOAD_BYTES
+) -> tuple[Path, str]:
+    """
+    Copies the uploaded pdf to a temporary file, hashing it along the way.
+    Returns the path of the temporary file and the sha256 hex digest of its content
+    """
     _ = file.file.seek(0)
     if file.file.read(5) != b"%PDF-":
         raise HTTPException(status_code=400, detail="Invalid PDF file")
     _ = file.file.seek(0)
 
     bytes_written = 0
+    digest = hashlib.sha256()
     tmp_pdf_path: Path | None = None
     try:
         with NamedTemporaryFile(suffix=".pdf", delete=False, dir="/tmp") as tmp_file:
             tmp_pdf_path = Path(tmp_file.name)
             while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
                 bytes_written += len(chunk)
-                if bytes_written > MAX_PDF_UPLOAD_BYTES:
+                if bytes_written > max_bytes:
                     raise HTTPException(
                         status_code=413,
-                        detail=f"Uploaded PDF exceeds the {MAX_PDF_UPLOAD_BYTES}-byte limit",
+                        detail=f"Uploaded PDF exceeds the {max_bytes}-byte limit",
                     )
+                digest.update(chunk)
                 _ = tmp_file.write(chunk)
 
             if bytes_written == 0:
                 raise HTTPException(status_code=400, detail="Uploaded PDF is empty")
 
         assert tmp_pdf_path is not None
-        return tmp_pdf_path
+        return tmp_pdf_path, digest.hexdigest()
     except Exception:
         if tmp_pdf_path is not None:
             tmp_pdf_path.unlink(missing_ok=True)
@@ -0,0 +1,130 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import final
+
+from scraper.lib import get_current_semester
+from scraper.models import ConfiguredBaseModel, ParsedPdf
+from scraper.new_parser import PARSER_VERSION
+
+
+class ParseCacheStats(ConfiguredBaseModel):
+    hits: int
+    misses: int
+    memory_entries: int
+    disk_entries: int
+
+
+@final
+class ParseCache:
+    """
+    Bounded LRU of the ParsedPdf of uploaded pdfs, keyed by the sha256 of the pdf,
+    the parser version and the current semester the ParsedPdf is stamped with.
+    Recently used entries are kept in memory and every entry is also written to disk,
+    so identical uploads skip pymupdf entirely
+    """
+
+    def __init__(
+        self, cache_dir: Path, max_memory_entries: int, max_disk_entries: int
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: OrderedDict[str, ParsedPdf] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, digest: str) -> ParsedPdf | None:
+        key = _cache_key(digest)
+
+        with self._lock:
+            parsed = self._memory.get(key)
+
+            if parsed is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return parsed
+
+            path = self._path(key)
+            try:
+                parsed = ParsedPdf.model_validate_json(path.read_bytes())
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            # refresh the mtime so disk eviction is least recently used too
+            path.touch()
+            self._remember(key, parsed)
+            self.hits += 1
+            return parsed
+
+    def put(self, digest: str, parsed: ParsedPdf) -> None:
+        key = _cache_key(digest)
+
+        with self._lock:
+            self._remember(key, parsed)
+
+            path = self._path(key)
+            tmp_path = path.with_suffix(".tmp")
+            _ = tmp_path.write_text(parsed.model_dump_json(by_alias=True))
+            _ = tmp_path.replace(path)
+
+            self._evict_disk()
+
+    def stats(self) -> ParseCacheStats:
+        with self._lock:
+            return ParseCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                memory_entries=len(self._memory),
+                disk_entries=len(self._disk_paths()),
+            )
+
+    def _remember(self, key: str, parsed: ParsedPdf) -> None:
+        self._memory[key] = parsed
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_memory_entries:
+            _ = self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        paths = self._disk_paths()
+
+        if len(paths) <= self.max_disk_entries:
+            return
+
+        paths.sort(key=lambda path: path.stat().st_mtime)
+        for path in paths[: len(paths) - self.max_disk_entries]:
+            path.unlink(missing_ok=True)
+
+    def _disk_paths(self) -> list[Path]:
+        return list(self.cache_dir.glob("*.json"))
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+
+def _cache_key(digest: str) -> str:
+    semester = get_current_semester().replace(" ", "_")
+    return f"v{PARSER_VERSION}-{semester}-{digest}"
+
+
+def parse_cache_enabled() -> bool:
+    return os.environ.get("ENABLE_PARSE_CACHE", "1") != "0"
+
+
+def load_parse_cache() -> ParseCache | None:
+    if not parse_cache_enabled():
+        return None
+
+    return ParseCache(
+        cache_dir=Path(os.environ.get("PARSE_CACHE_DIR", "/tmp/parse-cache")),
+        max_memory_entries=int(os.environ.get("PARSE_CACHE_MEMORY_ENTRIES", "8")),
+        max_disk_entries=int(os.environ.get("PARSE_CACHE_DISK_ENTRIES", "64")),
+    )
@@ -0,0 +1,87 @@
+from bisect import bisect_left
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+from scraper.models import Rating
+from scraper.util import normalize_string
+
+DEFAULT_SEARCH_LIMIT = 10
+
+
+@dataclass(frozen=True)
+class RatingsIndex:
+    """
+    Ratings looked up by the normalized name of their prof, so a prof is found
+    whatever the case, accents or order of their last and first names
+    """
+
+    ratings: tuple[Rating, ...]
+    # sorted names of the profs of each rating, to look a prof up regardless of order
+    positions_by_names: dict[tuple[str, ...], int]
+
+    # every rotation of the names of each prof, sorted, for the prefix search
+    keys: tuple[str, ...]
+    key_positions: tuple[int, ...]
+
+    def get(self, prof: str) -> Rating | None:
+        position = self.positions_by_names.get(tuple(sorted(prof_names(prof))))
+        if position is None:
+            return None
+
+        return self.ratings[position]
+
+    def search(self, prefix: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list[Rating]:
+        """
+        Ratings of the profs with a name starting with the given prefix,
+        the following names included, ie. "ken", "kenzy abd" and "abdel malek, k"
+        all match "Abdel Malek, Kenzy"
+        """
+        query = " ".join(prof_names(prefix))
+        if query == "":
+            return []
+
+        matches: list[Rating] = []
+        seen: set[int] = set()
+
+        i = bisect_left(self.keys, query)
+        while (
+            i < len(self.keys)
+            and self.keys[i].startswith(query)
+            and len(matches) < limit
+        ):
+            position = self.key_positions[i]
+            if position not in seen:
+                seen.add(position)
+                matches.append(self.ratings[position])
+            i += 1
+
+        return matches
+
+
+def prof_names(prof: str) -> list[str]:
+    """
+    Names of the prof, accents removed and case folded, in the order they are written
+    """
+    return normalize_string(prof).replace(",", " ").casefold().split()
+
+
+def build_ratings_index(ratings: Mapping[str, Rating]) -> RatingsIndex:
+    all_ratings = tuple(ratings.values())
+    positions_by_names: dict[tuple[str, ...], int] = {}
+    keyed_positions: list[tuple[str, int]] = []
+
+    for position, rating in enumerate(all_ratings):
+        names = prof_names(rating.prof)
+        _ = positions_by_names.setdefault(tuple(sorted(names)), position)
+
+        for i in range(len(names)):
+            keyed_positions.append((" ".join(names[i:] + names[:i]), position))
+
+    keyed_positions.sort()
+
+    return RatingsIndex(
+        ratings=all_ratings,
+        positions_by_names=positions_by_names,
+        keys=tuple(key for key, _ in keyed_positions),
+        key_positions=tuple(position for _, position in keyed_positions),
+    )
@@ -1,46 +1,88 @@
+import itertools
+import logging
 import os
+from collections.abc import Iterator
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, HTTPException, Query, Request, UploadFile
+from fastapi import APIRouter, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 
-from api.sections.cache import SectionCache
+from api.sections.encoded import join_json_array, json_response
 from api.sections.filter_cached_sections import filter_cached_sections
 from api.sections.helpers import (
+    MAX_PDF_UPLOAD_BYTES,
     copy_upload_to_tempfile,
+    get_section_cache,
+    load_indexed_sections,
     load_sections_from_json,
     lookup_section,
 )
-from scraper.lib import the_entire_loop
-from scraper.models import ParsedPdf, Section
+from api.sections.parse_cache import ParseCache, ParseCacheStats
+from scraper import util
+from scraper.catalog_store import SectionChanges
+from scraper.lib import get_current_semester, stream_sections, the_entire_loop
+from scraper.models import ConfiguredBaseModel, ParsedPdf, Section
+from scraper.parser_utils import get_page_count
+
+logger = logging.getLogger(__name__)
 
 MAX_PDF_PAGES = int(os.environ.get("MAX_PDF_PAGES", str(250)))
+# processes used to extract the pages of each uploaded pdf. One by default, since every
+# request would start its own pool and the api may run on small serverless instances
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", str(1)))
 
 router = APIRouter(prefix="/sections", tags=["Sections"])
 
+# version of the sections served by /sections/all and /global-all-sections,
+# to then ask for the changes since it
+CATALOG_VERSION_HEADER = "X-Catalog-Version"
+
+
+class ParseStreamError(ConfiguredBaseModel):
+    """
+    Last line of a /parse-pdf/stream response whose parsing failed partway,
+    so it can be told apart from a complete stream
+    """
+
+    error: str
+
 
-@router.get("/all")
-def get_all(request: Request) -> list[Section]:
-    section_cache = getattr(request.app.state, "section_cache", None)
+@router.get("/all", response_model=list[Section])
+def get_all(request: Request, semester: str | None = None) -> Response | list[Section]:
+    section_cache = get_section_cache(request, semester)
 
-    if isinstance(section_cache, SectionCache):
-        return list(section_cache.all_sections)
+    if section_cache is not None:
+        return json_response(
+            request,
+            section_cache.all_json,
+            {CATALOG_VERSION_HEADER: section_cache.version},
+        )
 
-    return list(load_sections_from_json())
+    return list(load_sections_from_json(semester))
 
 
 @router.post("/parse-pdf")
-def parse_uploaded_pdf(file: UploadFile) -> ParsedPdf:
-    filename = (file.filename or "").lower()
-    if not filename.endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Uploaded file must be a PDF")
+def parse_uploaded_pdf(file: UploadFile, request: Request) -> ParsedPdf:
+    _validate_pdf_filename(file)
 
     tmp_pdf_path: Path | None = None
+    parse_cache = _get_parse_cache(request)
 
     try:
-        tmp_pdf_path = copy_upload_to_tempfile(file)
+        tmp_pdf_path, digest = copy_upload_to_tempfile(file, MAX_PDF_UPLOAD_BYTES)
 
-        return the_entire_loop(tmp_pdf_path, max_pages=MAX_PDF_PAGES)
+        if parse_cache is not None and (parsed := parse_cache.get(digest)):
+            return parsed
+
+        parsed = the_entire_loop(
+            tmp_pdf_path, max_pages=MAX_PDF_PAGES, workers=PDF_EXTRACT_WORKERS
+        )
+
+        if parse_cache is not None:
+            parse_cache.put(digest, parsed)
+
+        return parsed
 
     except HTTPException:
         raise
@@ -54,9 +96,124 @@ def parse_uploaded_pdf(file: UploadFile) -> ParsedPdf:
             tmp_pdf_path.unlink(missing_ok=True)
 
 
-@router.get("/")
+@router.post(
+    "/parse-pdf/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+def stream_uploaded_pdf(file: UploadFile, request: Request) -> StreamingResponse:
+    """
+    Streams the sections of the uploaded pdf as newline delimited json,
+    one Section per line, while the pdf is still being parsed.
+    If the parsing fails once the stream started, its last line is a ParseStreamError
+    """
+    _validate_pdf_filename(file)
+
+    try:
+        tmp_pdf_path, digest = copy_upload_to_tempfile(file, MAX_PDF_UPLOAD_BYTES)
+    finally:
+        file.file.close()
+
+    parse_cache = _get_parse_cache(request)
+
+    if parse_cache is not None and (parsed := parse_cache.get(digest)):
+        tmp_pdf_path.unlink(missing_ok=True)
+        return StreamingResponse(
+            (
+                section.model_dump_json(by_alias=True) + "\n"
+                for section in parsed.sections_by_id.values()
+            ),
+            media_type="application/x-ndjson",
+        )
+
+    try:
+        _ = get_page_count(tmp_pdf_path, max_pages=MAX_PDF_PAGES)
+        sections = stream_sections(
+            tmp_pdf_path, max_pages=MAX_PDF_PAGES, workers=PDF_EXTRACT_WORKERS
+        )
+        # parsed up to the first section before answering, so a pdf without
+        # a column header or sections is a 400 rather than a broken stream
+        first_section = next(sections, None)
+    except Exception as err:
+        tmp_pdf_path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=400, detail=f"Could not parse PDF: {err}"
+        ) from err
+
+    if first_section is None:
+        tmp_pdf_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Could not parse PDF: no sections")
+
+    return StreamingResponse(
+        _stream_ndjson_sections(
+            itertools.chain([first_section], sections),
+            tmp_pdf_path,
+            digest,
+            parse_cache,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/parse-pdf/cache")
+def get_parse_cache_stats(request: Request) -> ParseCacheStats:
+    parse_cache = _get_parse_cache(request)
+
+    if parse_cache is None:
+        raise HTTPException(status_code=404, detail="Parse cache is disabled")
+
+    return parse_cache.stats()
+
+
+def _stream_ndjson_sections(
+    sections: Iterator[Section],
+    pdf_path: Path,
+    digest: str,
+    parse_cache: ParseCache | None,
+) -> Iterator[str]:
+    parsed_sections: list[Section] = []
+
+    try:
+        for section in sections:
+            parsed_sections.append(section)
+            yield section.model_dump_json(by_alias=True) + "\n"
+    except Exception as err:
+        logger.exception("could not parse the streamed pdf")
+        error = ParseStreamError(error=f"Could not parse PDF: {err}")
+        yield error.model_dump_json(by_alias=True) + "\n"
+        return
+    finally:
+        pdf_path.unlink(missing_ok=True)
+
+    if parse_cache is not None:
+        parse_cache.put(
+            digest,
+            ParsedPdf(
+                semester=get_current_semester(),
+                sections_by_id=util.to_sections_by_id(parsed_sections),
+            ),
+        )
+
+
+def _get_parse_cache(request: Request) -> ParseCache | None:
+    parse_cache = getattr(request.app.state, "parse_cache", None)
+
+    if isinstance(parse_cache, ParseCache):
+        return parse_cache
+
+    return None
+
+
+def _validate_pdf_filename(file: UploadFile) -> None:
+    filename = (file.filename or "").lower()
+    if not filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Uploaded file must be a PDF")
+
+
+@router.get("/", response_model=list[Section])
 def get_sections(
     request: Request,
+    semester: str | None = None,
     q: str | None = None,
     course: str | None = None,
     domain: str | None = None,
@@ -74,7 +231,7 @@ def get_sections(
     honours: bool = False,
     limit: Annotated[int | None, Query(ge=1, le=500)] = None,
     offset: Annotated[int, Query(ge=0)] = 0,
-) -> list[Section]:
+) -> Response | list[Section]:
     def _is_blank(value: str | None) -> bool:
         return value is None or value.strip() == ""
 
@@ -97,31 +254,16 @@ def get_sections(
     ):
         return []
 
-    section_cache = getattr(request.app.state, "section_cache", None)
-    if isinstance(section_cache, SectionCache):
-        return filter_cached_sections(
-            section_cache.all_sections,
-            q,
-            course,
-            domain,
-            code,
-            title,
-            teacher,
-            min_rating,
-            max_rating,
-            min_score,
-            max_score,
-            days_off,
-            time_start,
-            time_end,
-            blended,
-            honours,
-            limit,
-            offset,
-        )
+    section_cache = get_section_cache(request, semester)
+    sections: tuple[Section, ...] = ()
 
-    return filter_cached_sections(
-        load_sections_from_json(),
+    if section_cache is not None:
+        index = section_cache.index
+    else:
+        sections, index = load_indexed_sections(semester)
+
+    positions = filter_cached_sections(
+        index,
         q,
         course,
         domain,
@@ -141,19 +283,95 @@ def get_sections(
         offset,
     )
 
+    if section_cache is not None:
+        return Response(
+            content=join_json_array(section_cache.section_json(i) for i in positions),
+            media_type="application/json",
+        )
+
+    return [sections[i] for i in positions]
+
+
+# declared before /{section_id} so "changes" isn't taken for a section id
+@router.get(
+    "/changes",
+    response_model=SectionChanges,
+    responses={404: {"description": "The version isn't in the catalog"}},
+)
+def get_changes(
+    request: Request, since: str, semester: str | None = None
+) -> Response | SectionChanges:
+    """
+    The sections added, changed and removed since the given version,
+    for clients that already have the sections of that version.
+    Sections whose only change is their ratings are included with the changed ones
+    """
+    section_cache = get_section_cache(request, semester)
+
+    if section_cache is None:
+        raise HTTPException(status_code=404, detail="Section changes aren't cached")
+
+    if since == section_cache.version:
+        return SectionChanges(
+            since=since,
+            version=section_cache.version,
+            sections_added=[],
+            sections_changed=[],
+            sections_removed=[],
+        )
+
+    # precomputed in the catalog store when the version was published
+    changes_json = section_cache.changes_json.get(since)
+    if changes_json is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Version {since} is not in the catalog, get every section instead",
+        )
 
-@router.get("/{section_id}")
-def get_section(section_id: str, request: Request) -> Section:
-    section_cache = getattr(request.app.state, "section_cache", None)
-    if isinstance(section_cache, SectionCache):
-        section = lookup_section(section_cache.by_id, section_id)
-        if section is None:
+    return json_response(request, changes_json)
+
+
+# declared before /{section_id} so "autocomplete" isn't taken for a section id
+@router.get("/autocomplete")
+def autocomplete(
+    request: Request,
+    field: Literal["code", "title", "teacher"],
+    prefix: str,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    semester: str | None = None,
+) -> list[str]:
+    section_cache = get_section_cache(request, semester)
+
+    if section_cache is not None:
+        index = section_cache.index
+    else:
+        _, index = load_indexed_sections(semester)
+
+    match field:
+        case "code":
+            words = index.code_words
+        case "title":
+            words = index.title_words
+        case "teacher":
+            words = index.teacher_words
+
+    return words.get_words(prefix, limit)
+
+
+@router.get("/{section_id}", response_model=Section)
+def get_section(
+    section_id: str, request: Request, semester: str | None = None
+) -> Response | Section:
+    section_cache = get_section_cache(request, semester)
+    if section_cache is not None:
+        section_json = section_cache.json_by_id.get(section_id)
+        if section_json is None:
             raise HTTPException(
                 status_code=404, detail=f"Section {section_id} not found"
             )
-        return section
+        return json_response(request, section_json)
 
-    all_sections = load_sections_from_json()
+    all_sections = load_sections_from_json(semester)
     by_id = {section.id: section for section in all_sections}
     section = lookup_section(by_id, section_id)
 
@@ -163,19 +381,22 @@ def get_section(section_id: str, request: Request) -> Section:
     return section
 
 
-@router.post("/")
-def get_many(ids: list[str], request: Request) -> list[Section]:
-    section_cache = getattr(request.app.state, "section_cache", None)
+@router.post("/", response_model=list[Section])
+def get_many(
+    ids: list[str], request: Request, semester: str | None = None
+) -> Response | list[Section]:
+    section_cache = get_section_cache(request, semester)
 
-    if isinstance(section_cache, SectionCache):
-        cached_sections: list[Section] = []
-        for section_id in ids:
-            section = lookup_section(section_cache.by_id, section_id)
-            if section is not None:
-                cached_sections.append(section)
-        return cached_sections
+    if section_cache is not None:
+        json_by_id = section_cache.json_by_id
+        return Response(
+            content=join_json_array(
+                json_by_id[id].body for id in ids if id in json_by_id
+            ),
+            media_type="application/json",
+        )
 
-    all_sections = load_sections_from_json()
+    all_sections = load_sections_from_json(semester)
     by_id = {section.id: section for section in all_sections}
     matched_sections: list[Section] = []
     for section_id in ids:
@@ -0,0 +1,318 @@
+import math
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, fields
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from scraper.models import Section, Status
+from scraper.new_parser import VIEW_DATA_DAYS, VIEW_DATA_TIMES
+from scraper.trie import Trie
+
+# a section as decoded from its json, with the camelCase keys
+type RawSection = Mapping[str, Any]
+
+NGRAM_SIZE = 3
+
+# the occupancy has a bit per half hour slot of the view data grid, for each day
+SLOTS_PER_DAY = len(VIEW_DATA_TIMES) - 1
+
+# earliest start of sections without times, so they pass every time_start
+NO_START = 10_000
+
+
+@dataclass(frozen=True)
+class PrefixLookup:
+    """Sorted distinct values, each with the positions of the sections having it"""
+
+    values: tuple[str, ...]
+    positions: tuple[frozenset[int], ...]
+
+    def starting_with(self, prefix: str) -> set[int]:
+        matches: set[int] = set()
+
+        i = bisect_left(self.values, prefix)
+        while i < len(self.values) and self.values[i].startswith(prefix):
+            matches.update(self.positions[i])
+            i += 1
+
+        return matches
+
+
+@dataclass(frozen=True)
+class NgramLookup:
+    """Positions of the sections whose values contain each n-gram"""
+
+    values: tuple[tuple[str, ...], ...]
+    positions_by_ngram: dict[str, frozenset[int]]
+
+    def containing(self, query: str) -> set[int]:
+        if len(query) < NGRAM_SIZE:
+            return {
+                i
+                for i, values in enumerate(self.values)
+                if any(query in value for value in values)
+            }
+
+        candidates: set[int] | None = None
+        for ngram in sorted(
+            _ngrams(query), key=lambda g: len(self.positions_by_ngram.get(g, ()))
+        ):
+            positions = self.positions_by_ngram.get(ngram)
+            if positions is None:
+                return set()
+
+            candidates = (
+                set(positions) if candidates is None else candidates & positions
+            )
+            if not candidates:
+                return set()
+
+        assert candidates is not None
+
+        # n-grams can match out of order, so confirm the whole query is there
+        return {
+            i for i in candidates if any(query in value for value in self.values[i])
+        }
+
+
+@dataclass(frozen=True)
+class SectionIndex:
+    """
+    Lowercased fields and lookups built once from the cached sections.
+    Every lookup returns positions into the tuple of sections it was built from,
+    and the numeric columns are arrays indexed by those positions, to be filtered at once
+    """
+
+    size: int
+    course: PrefixLookup
+    domain: PrefixLookup
+    code: NgramLookup
+    title: NgramLookup
+    teacher: NgramLookup
+
+    # weekly occupancy of each section, a column per day of VIEW_DATA_DAYS
+    # holding the bitmask of the half hour slots the section takes that day
+    occupancy: npt.NDArray[np.uint32]
+    # earliest start and latest end in hhmm of each section
+    earliest_start: npt.NDArray[np.int32]
+    latest_end: npt.NDArray[np.int32]
+
+    blended: npt.NDArray[np.bool_]
+    honours: npt.NDArray[np.bool_]
+
+    # lowest and highest rating avg and score among the leclabs of each section
+    lowest_avg: npt.NDArray[np.float64]
+    highest_avg: npt.NDArray[np.float64]
+    lowest_score: npt.NDArray[np.float64]
+    highest_score: npt.NDArray[np.float64]
+
+    # distinct course codes, titles and profs, to autocomplete them
+    code_words: Trie
+    title_words: Trie
+    teacher_words: Trie
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SectionIndex):
+            return NotImplemented
+
+        return all(
+            _column_equal(getattr(self, field.name), getattr(other, field.name))
+            for field in fields(self)
+        )
+
+
+def _column_equal(a: object, b: object) -> bool:
+    if isinstance(a, np.ndarray) and isinstance(b, np.ndarray):
+        return a.dtype == b.dtype and np.array_equal(a, b)
+
+    return a == b
+
+
+def build_section_index(sections: Sequence[Section]) -> SectionIndex:
+    return build_raw_section_index(
+        [section.model_dump(mode="json", by_alias=True) for section in sections]
+    )
+
+
+def build_raw_section_index(sections: Sequence[RawSection]) -> SectionIndex:
+    """
+    Builds the index straight from the decoded json of the sections,
+    so no Section has to be validated for it
+    """
+    avg_ranges = np.array(
+        [_rating_range(section, "avg") for section in sections], dtype=np.float64
+    ).reshape(-1, 2)
+    score_ranges = np.array(
+        [_rating_range(section, "score") for section in sections], dtype=np.float64
+    ).reshape(-1, 2)
+
+    return SectionIndex(
+        size=len(sections),
+        course=_build_prefix_lookup(section["course"].lower() for section in sections),
+        domain=_build_prefix_lookup(section["domain"].lower() for section in sections),
+        code=_build_ngram_lookup((section["code"].lower(),) for section in sections),
+        title=_build_ngram_lookup((section["title"].lower(),) for section in sections),
+        teacher=_build_ngram_lookup(
+            tuple(leclab["prof"].lower() for leclab in section["leclabs"])
+            for section in sections
+        ),
+        occupancy=np.array(
+            [section_occupancy(section) for section in sections], dtype=np.uint32
+        ).reshape(-1, len(VIEW_DATA_DAYS)),
+        earliest_start=np.fromiter(
+            (_earliest_start(section) for section in sections),
+            dtype=np.int32,
+            count=len(sections),
+        ),
+        latest_end=np.fromiter(
+            (_latest_end(section) for section in sections),
+            dtype=np.int32,
+            count=len(sections),
+        ),
+        blended=np.fromiter(
+            (section["more"].startswith("BLENDED") for section in sections),
+            dtype=np.bool_,
+            count=len(sections),
+        ),
+        honours=np.fromiter(
+            (section["more"].startswith("For Honours") for section in sections),
+            dtype=np.bool_,
+            count=len(sections),
+        ),
+        lowest_avg=avg_ranges[:, 0].copy(),
+        highest_avg=avg_ranges[:, 1].copy(),
+        lowest_score=score_ranges[:, 0].copy(),
+        highest_score=score_ranges[:, 1].copy(),
+        code_words=Trie(section["code"] for section in sections),
+        title_words=Trie(section["title"] for section in sections),
+        teacher_words=Trie(
+            leclab["prof"]
+            for section in sections
+            for leclab in section["leclabs"]
+            if leclab["prof"].strip() != ""
+        ),
+    )
+
+
+def _build_prefix_lookup(values: Iterable[str]) -> PrefixLookup:
+    positions_by_value: dict[str, set[int]] = {}
+
+    for i, value in enumerate(values):
+        positions_by_value.setdefault(value, set()).add(i)
+
+    sorted_values = tuple(sorted(positions_by_value))
+    return PrefixLookup(
+        values=sorted_values,
+        positions=tuple(frozenset(positions_by_value[v]) for v in sorted_values),
+    )
+
+
+def _build_ngram_lookup(values: Iterable[tuple[str, ...]]) -> NgramLookup:
+    all_values = tuple(values)
+    positions_by_ngram: dict[str, set[int]] = {}
+
+    for i, section_values in enumerate(all_values):
+        for value in section_values:
+            for ngram in _ngrams(value):
+                positions_by_ngram.setdefault(ngram, set()).add(i)
+
+    return NgramLookup(
+        values=all_values,
+        positions_by_ngram={
+            ngram: frozenset(positions)
+            for ngram, positions in positions_by_ngram.items()
+        },
+    )
+
+
+def _ngrams(value: str) -> set[str]:
+    return {value[i : i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1)}
+
+
+def section_occupancy(section: RawSection) -> list[int]:
+    """
+    Bitmask of the half hour slots the section takes on each day of VIEW_DATA_DAYS.
+    Any time on a day sets at least one of its bits, even off the grid
+    """
+    occupancy = [0] * len(VIEW_DATA_DAYS)
+
+    for leclab in section["leclabs"]:
+        for day_time in leclab["dayTimes"]:
+            slots = _slots(day_time["startTimeHhmm"], day_time["endTimeHhmm"])
+
+            for day in day_time["day"]:
+                if day in VIEW_DATA_DAYS:
+                    occupancy[VIEW_DATA_DAYS.index(day)] |= slots
+
+    return occupancy
+
+
+def day_columns(days: str) -> list[int]:
+    """
+    Columns of the occupancy of the given days
+    """
+    return [VIEW_DATA_DAYS.index(day) for day in days if day in VIEW_DATA_DAYS]
+
+
+def _slots(start_hhmm: str, end_hhmm: str) -> int:
+    start = _hhmm(start_hhmm)
+    end = _hhmm(end_hhmm)
+
+    first = 0 if start is None else bisect_right(VIEW_DATA_TIMES, start) - 1
+    first = min(max(first, 0), SLOTS_PER_DAY - 1)
+
+    last = SLOTS_PER_DAY if end is None else bisect_left(VIEW_DATA_TIMES, end)
+    last = min(max(last, first + 1), SLOTS_PER_DAY)
+
+    return ((1 << (last - first)) - 1) << first
+
+
+def _earliest_start(section: RawSection) -> int:
+    starts = [
+        _hhmm(day_time["startTimeHhmm"])
+        for leclab in section["leclabs"]
+        for day_time in leclab["dayTimes"]
+    ]
+
+    # a start that isn't hhmm never satisfies a time_start
+    return min((-1 if start is None else start for start in starts), default=NO_START)
+
+
+def _latest_end(section: RawSection) -> int:
+    ends = [
+        _hhmm(day_time["endTimeHhmm"])
+        for leclab in section["leclabs"]
+        for day_time in leclab["dayTimes"]
+    ]
+
+    # an end that isn't hhmm always satisfies a time_end
+    return max((0 if end is None else end for end in ends), default=0)
+
+
+def _rating_range(section: RawSection, key: str) -> tuple[float, float]:
+    """
+    The lowest and highest value of the key among the ratings of the leclabs of the section.
+    A leclab without a found rating fails every bound, a section without leclabs passes them all
+    """
+    values: list[float] = []
+
+    for leclab in section["leclabs"]:
+        rating = leclab["rating"]
+        if rating is None or rating["status"] != Status.FOUND.value:
+            return -math.inf, math.inf
+        values.append(rating[key])
+
+    if not values:
+        return math.inf, -math.inf
+
+    return min(values), max(values)
+
+
+def _hhmm(value: str) -> int | None:
+    if len(value) != 4 or not value.isdigit():
+        return None
+
+    return int(value)
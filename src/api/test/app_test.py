@@ -1,4 +1,5 @@
 from typing import Any
+import pymupdf
 import pytest
 from api.app import app
 from api.sections import router as section_router
@@ -39,8 +40,9 @@ def test_parse_uploaded_pdf_rejects_non_pdf():
 
 
 def test_parse_uploaded_pdf_returns_sections_schema(monkeypatch: pytest.MonkeyPatch):
-    def fake_parse(_pdf_path, _ratings, max_pages):
+    def fake_parse(_pdf_path, max_pages, workers):
         assert max_pages == section_router.MAX_PDF_PAGES
+        assert workers == section_router.PDF_EXTRACT_WORKERS
         day_time = DayTime(
             day="M",
             start_time_hhmm="0900",
@@ -87,6 +89,76 @@ def test_parse_uploaded_pdf_returns_sections_schema(monkeypatch: pytest.MonkeyPa
     assert sections[0].leclabs[0].day_times[0].start_time_hhmm == "0900"
 
 
+def test_stream_uploaded_pdf_emits_ndjson(monkeypatch: pytest.MonkeyPatch):
+    def fake_stream(_pdf_path, max_pages, workers):
+        assert max_pages == section_router.MAX_PDF_PAGES
+        assert workers == section_router.PDF_EXTRACT_WORKERS
+        yield Section(code="201-NYA-05", section="00001")
+        yield Section(code="201-NYA-05", section="00002")
+
+    monkeypatch.setattr(section_router, "get_page_count", lambda *_, **__: 1)
+    monkeypatch.setattr(section_router, "stream_sections", fake_stream)
+
+    res = client.post(
+        "/sections/parse-pdf/stream",
+        files={"file": ("schedule.pdf", b"%PDF-1.7\nfake", "application/pdf")},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+
+    sections = [Section.model_validate_json(line) for line in res.text.splitlines()]
+    assert [section.section for section in sections] == ["00001", "00002"]
+
+
+def test_stream_uploaded_pdf_ends_with_error_when_parsing_fails(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    def fake_stream(_pdf_path, max_pages, workers):
+        yield Section(code="201-NYA-05", section="00001")
+        raise ValueError("bad page")
+
+    monkeypatch.setattr(section_router, "get_page_count", lambda *_, **__: 1)
+    monkeypatch.setattr(section_router, "stream_sections", fake_stream)
+
+    res = client.post(
+        "/sections/parse-pdf/stream",
+        files={"file": ("schedule.pdf", b"%PDF-1.7\nfake", "application/pdf")},
+    )
+    assert res.status_code == 200
+
+    first, last = res.text.splitlines()
+    assert Section.model_validate_json(first).section == "00001"
+    assert section_router.ParseStreamError.model_validate_json(last).error == (
+        "Could not parse PDF: bad page"
+    )
+
+
+def test_stream_uploaded_pdf_rejects_pdf_without_sections():
+    with pymupdf.open() as doc:
+        page = doc.new_page()
+        # a column header followed by a line that isn't a section
+        _ = page.insert_text((72, 72), "SECTION DISC COURSE")
+        _ = page.insert_text((72, 90), "Fall 2026 schedule")
+        pdf = doc.tobytes()
+
+    res = client.post(
+        "/sections/parse-pdf/stream",
+        files={"file": ("schedule.pdf", pdf, "application/pdf")},
+    )
+
+    assert res.status_code == 400
+    assert "column header" in res.json()["detail"]
+
+
+def test_stream_uploaded_pdf_rejects_invalid_pdf():
+    res = client.post(
+        "/sections/parse-pdf/stream",
+        files={"file": ("schedule.pdf", b"%PDF-1.7\nfake", "application/pdf")},
+    )
+
+    assert res.status_code == 400
+
+
 def test_parse_uploaded_pdf_rejects_oversized_upload(monkeypatch: pytest.MonkeyPatch):
     monkeypatch.setattr(section_router, "MAX_PDF_UPLOAD_BYTES", 10)
 
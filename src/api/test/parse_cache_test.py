@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import app
+from api.sections import router as section_router
+from api.sections import parse_cache
+from api.sections.parse_cache import ParseCache
+from scraper.models import ParsedPdf, Section
+
+client = TestClient(app)
+
+
+def _parsed_pdf(section_number: str) -> ParsedPdf:
+    section = Section(code="201-NYA-05", section=section_number)
+    return ParsedPdf(semester="FALL 2026", sections_by_id={section.id: section})
+
+
+def test_parse_cache_memory_lru(tmp_path: Path):
+    cache = ParseCache(tmp_path, max_memory_entries=1, max_disk_entries=10)
+
+    cache.put("a", _parsed_pdf("00001"))
+    cache.put("b", _parsed_pdf("00002"))
+
+    assert cache.get("b") == _parsed_pdf("00002")
+    # evicted from memory but still on disk
+    assert cache.get("a") == _parsed_pdf("00001")
+    assert cache.get("c") is None
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (2, 1)
+    assert stats.memory_entries == 1
+    assert stats.disk_entries == 2
+
+
+def test_parse_cache_disk_eviction(tmp_path: Path):
+    cache = ParseCache(tmp_path, max_memory_entries=1, max_disk_entries=2)
+
+    for digest in ["a", "b", "c"]:
+        cache.put(digest, _parsed_pdf("00001"))
+
+    assert cache.stats().disk_entries == 2
+
+
+def test_parse_cache_survives_restart(tmp_path: Path):
+    ParseCache(tmp_path, 1, 10).put("a", _parsed_pdf("00001"))
+
+    assert ParseCache(tmp_path, 1, 10).get("a") == _parsed_pdf("00001")
+
+
+def test_parse_cache_misses_after_semester_change(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    monkeypatch.setattr(parse_cache, "get_current_semester", lambda: "SUMMER 2026")
+    cache = ParseCache(tmp_path, 1, 10)
+    cache.put("a", _parsed_pdf("00001"))
+
+    monkeypatch.setattr(parse_cache, "get_current_semester", lambda: "FALL 2026")
+    assert cache.get("a") is None
+    assert ParseCache(tmp_path, 1, 10).get("a") is None
+
+
+def test_parse_uploaded_pdf_uses_cache(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    calls: list[Path] = []
+
+    def fake_parse(pdf_path, max_pages, workers):
+        calls.append(pdf_path)
+        return _parsed_pdf("00001")
+
+    monkeypatch.setattr(section_router, "the_entire_loop", fake_parse)
+    monkeypatch.setattr(app.state, "parse_cache", ParseCache(tmp_path, 4, 4), False)
+
+    for _ in range(2):
+        res = client.post(
+            "/sections/parse-pdf",
+            files={"file": ("schedule.pdf", b"%PDF-1.7\nsame", "application/pdf")},
+        )
+        assert res.status_code == 200
+        assert ParsedPdf.model_validate(res.json()) == _parsed_pdf("00001")
+
+    assert len(calls) == 1
+
+    res = client.get("/sections/parse-pdf/cache")
+    assert res.status_code == 200
+    assert res.json()["hits"] == 1
+    assert res.json()["misses"] == 1
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
@@ -0,0 +1,88 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import app
+from api.sections.ratings_index import build_ratings_index, prof_names
+from scraper.models import Rating, Status
+
+ratings_index = build_ratings_index(
+    {
+        prof: Rating(prof=prof, status=Status.FOUND, pId=str(i))
+        for i, prof in enumerate(
+            [
+                "Abdel Malek, Kenzy",
+                "Hughes, Cameron",
+                "Hughes, Kim",
+                "Élie, Stéphane",
+                "Kennedy, Anne-Marie",
+            ]
+        )
+    }
+)
+
+
+def test_prof_names():
+    assert prof_names("Élie,  Stéphane ") == ["elie", "stephane"]
+    assert prof_names("ABDEL MALEK, Kenzy") == ["abdel", "malek", "kenzy"]
+
+
+@pytest.mark.parametrize(
+    "prof",
+    [
+        "Abdel Malek, Kenzy",
+        "abdel malek, kenzy",
+        "Kenzy Abdel Malek",
+        "  kenzy   ABDEL malek ",
+    ],
+)
+def test_get_tolerates_case_and_order(prof: str):
+    rating = ratings_index.get(prof)
+
+    assert rating is not None
+    assert rating.prof == "Abdel Malek, Kenzy"
+
+
+def test_get_removes_accents():
+    rating = ratings_index.get("Stephane Elie")
+
+    assert rating is not None
+    assert rating.prof == "Élie, Stéphane"
+    assert ratings_index.get("Kenzy Malek") is None
+
+
+@pytest.mark.parametrize(
+    "prefix, expected",
+    [
+        ("hughes", ["Hughes, Cameron", "Hughes, Kim"]),
+        ("Hughes, K", ["Hughes, Kim"]),
+        ("cameron hu", ["Hughes, Cameron"]),
+        ("ken", ["Abdel Malek, Kenzy", "Kennedy, Anne-Marie"]),
+        ("mal", ["Abdel Malek, Kenzy"]),
+        ("ste", ["Élie, Stéphane"]),
+        ("", []),
+        ("zzz", []),
+    ],
+)
+def test_search(prefix: str, expected: list[str]):
+    assert sorted(rating.prof for rating in ratings_index.search(prefix)) == expected
+
+
+def test_search_limit():
+    assert len(ratings_index.search("h", limit=1)) == 1
+
+
+def test_search_endpoint():
+    with TestClient(app) as client:
+        res = client.get("/ratings/search", params={"q": "cameron hugh"})
+        assert res.status_code == 200
+        assert [rating["prof"] for rating in res.json()] == ["Hughes, Cameron"]
+
+        res = client.get("/ratings/cameron hughes")
+        assert res.status_code == 200
+        assert res.json()["prof"] == "Hughes, Cameron"
+
+        assert client.get("/ratings/search").status_code == 422
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
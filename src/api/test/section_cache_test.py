@@ -0,0 +1,403 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.datastructures import State
+
+from api.app import app
+from api.sections.cache import (
+    SectionCacheReloader,
+    load_section_cache,
+    load_semester_caches,
+)
+from api.sections.helpers import load_indexed_sections
+from api.sections.router import router as section_router
+from scraper import util
+from scraper.catalog_store import CatalogStore
+from scraper.compact_sections import load_compact_sections, save_compact_sections
+from scraper.files import Files
+from scraper.models import GlobalAllSections, LecLab, Rating, Section
+
+# without the lifespan, the routes fall back to reading the json on every request
+uncached_client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    with TestClient(app) as client:
+        yield client
+
+
+def test_get_all_matches_uncached(client: TestClient):
+    res = client.get("/sections/all")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/json"
+    assert res.json() == uncached_client.get("/sections/all").json()
+
+
+def test_get_all_gzip(client: TestClient):
+    res = client.get("/sections/all", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+
+    raw = client.get("/sections/all", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert res.json() == raw.json()
+
+
+def test_get_all_not_modified(client: TestClient):
+    etag = client.get("/sections/all").headers["etag"]
+
+    res = client.get("/sections/all", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+
+
+def test_get_section_matches_uncached(client: TestClient):
+    res = client.get("/sections/101-SN1-RE-00002")
+    assert res.status_code == 200
+    assert res.headers["etag"]
+    assert res.json() == uncached_client.get("/sections/101-SN1-RE-00002").json()
+
+    assert client.get("/sections/nan").status_code == 404
+
+
+def test_get_many_matches_uncached(client: TestClient):
+    ids = ["101-SN1-RE-00002", "nan", "101-SN1-RE-00001"]
+
+    res = client.post("/sections/", json=ids)
+    assert res.status_code == 200
+    assert res.json() == uncached_client.post("/sections/", json=ids).json()
+    assert [section["id"] for section in res.json()] == [ids[0], ids[2]]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "q=calculus",
+        "teacher=smith&days_off=F",
+        "course=science&time_start=1000&time_end=1600",
+        "min_rating=4",
+        "max_rating=2&min_score=10",
+        "max_score=60&domain=bio",
+        "blended=true",
+        "honours=true&limit=3&offset=1",
+    ],
+)
+def test_get_filtered_matches_uncached(client: TestClient, query: str):
+    res = client.get(f"/sections/?{query}")
+    assert res.status_code == 200
+    assert res.json() == uncached_client.get(f"/sections/?{query}").json()
+
+
+@pytest.mark.parametrize(
+    "field, prefix",
+    [("code", "603-"), ("title", "calc"), ("teacher", "smi"), ("title", "zzz")],
+)
+def test_autocomplete_matches_uncached(client: TestClient, field: str, prefix: str):
+    params = {"field": field, "prefix": prefix, "limit": 5}
+
+    res = client.get("/sections/autocomplete", params=params)
+    assert res.status_code == 200
+    assert len(res.json()) <= 5
+    assert all(word.lower().startswith(prefix) for word in res.json())
+    assert (
+        res.json()
+        == uncached_client.get("/sections/autocomplete", params=params).json()
+    )
+
+
+def test_sections_are_built_on_demand():
+    cache = load_section_cache()
+    assert cache is not None
+
+    section = cache.get_section("101-SN1-RE-00002")
+    assert section is not None
+    assert section.id == "101-SN1-RE-00002"
+    assert cache.get_section("101-SN1-RE-00002") is section
+    assert cache.get_section("nan") is None
+
+
+def test_uncached_index_is_built_once_per_file():
+    sections, index = load_indexed_sections()
+    semester = Files().get_global_all_sections_content().semester
+
+    assert load_indexed_sections()[1] is index
+    assert load_indexed_sections(semester)[0] == sections
+
+
+def test_compact_cache_matches_json_cache():
+    from_compact = load_section_cache()
+    from_json = load_section_cache(use_compact=False)
+    assert from_compact is not None and from_json is not None
+
+    assert from_compact.all_json.body == from_json.all_json.body
+    assert from_compact.global_json.body == from_json.global_json.body
+    assert from_compact.json_by_id == from_json.json_by_id
+    assert from_compact.ids == from_json.ids
+    assert from_compact.index == from_json.index
+
+
+def test_compact_sections_round_trip(tmp_path: Path):
+    files = Files()
+    global_sections = files.get_global_all_sections_content()
+    source_path = files.global_all_sections_final_path_json
+    compact_path = tmp_path / "all_sections_final.compact"
+
+    save_compact_sections(global_sections, source_path, compact_path)
+    compact = load_compact_sections(compact_path, source_path)
+
+    assert compact is not None
+    assert compact.semester == global_sections.semester
+    assert compact.sections() == tuple(global_sections.sections_by_id.values())
+    assert compact.section_bodies == tuple(
+        section.model_dump_json(by_alias=True).encode()
+        for section in global_sections.sections_by_id.values()
+    )
+    assert compact.ids == tuple(global_sections.sections_by_id)
+    assert (
+        compact.global_json() == global_sections.model_dump_json(by_alias=True).encode()
+    )
+    assert compact.index_sections == tuple(
+        section.model_dump(mode="json", by_alias=True)
+        for section in global_sections.sections_by_id.values()
+    )
+
+    # each professor is decoded once, however many sections they teach
+    profs = {
+        id(leclab["prof"])
+        for section in compact.index_sections
+        for leclab in section["leclabs"]
+    }
+    assert len(profs) == len(
+        {
+            leclab.prof
+            for section in global_sections.sections_by_id.values()
+            for leclab in section.leclabs
+        }
+    )
+
+
+def test_stale_compact_sections_are_ignored(tmp_path: Path):
+    files = Files()
+    source_path = tmp_path / "all_sections_final.json"
+    _ = source_path.write_bytes(files.global_all_sections_final_path_json.read_bytes())
+    compact_path = tmp_path / "all_sections_final.compact"
+
+    save_compact_sections(
+        files.get_global_all_sections_content(), source_path, compact_path
+    )
+    assert load_compact_sections(compact_path, source_path) is not None
+
+    _ = source_path.write_text(source_path.read_text() + "\n")
+    assert load_compact_sections(compact_path, source_path) is None
+    assert load_compact_sections(tmp_path / "missing.compact", source_path) is None
+
+
+def test_global_all_sections_matches_uncached(client: TestClient):
+    res = client.get("/global-all-sections")
+    assert res.status_code == 200
+    assert res.json() == uncached_client.get("/global-all-sections").json()
+    assert (
+        res.headers["x-catalog-version"]
+        == client.get("/sections/all").headers["x-catalog-version"]
+    )
+
+    etag = res.headers["etag"]
+    res = client.get("/global-all-sections", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+
+    res = client.get("/global-all-sections", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["content-encoding"] == "gzip"
+
+
+def test_semester_query(client: TestClient):
+    semester = Files().get_global_all_sections_content().semester
+
+    res = client.get("/sections/all", params={"semester": semester.lower()})
+    assert res.status_code == 200
+    assert res.content == client.get("/sections/all").content
+
+    res = client.get("/sections/101-SN1-RE-00002", params={"semester": "SUMMER 1999"})
+    assert res.status_code == 404
+    res = uncached_client.get("/sections/all", params={"semester": "SUMMER 1999"})
+    assert res.status_code == 404
+
+
+def _files_with_archived_semester(tmp_path: Path) -> tuple[Files, GlobalAllSections]:
+    files = Files()
+    files.global_semesters_dir = tmp_path
+
+    current = files.get_global_all_sections_content()
+    archived = GlobalAllSections(
+        semester="WINTER 2026",
+        sections_by_id=dict(list(current.sections_by_id.items())[:10]),
+        filename=current.filename,
+        sections_diff=None,
+        comments=[],
+    )
+    util.archive_global_sections(archived, files.global_semester_path("winter 2026"))
+
+    return files, archived
+
+
+def test_archived_semesters_are_cached(tmp_path: Path):
+    files, archived = _files_with_archived_semester(tmp_path)
+
+    caches = load_semester_caches(files=files)
+    assert caches is not None
+
+    current = caches.get()
+    assert current is not None
+    assert current.semester == files.get_global_all_sections_content().semester
+
+    cache = caches.get("winter  2026")
+    assert cache is not None
+    assert cache.ids == tuple(archived.sections_by_id.keys())
+    assert cache.global_json.body == archived.model_dump_json(by_alias=True).encode()
+    assert files.get_global_semester_content("WINTER 2026") == archived
+    assert caches.get("SUMMER 1999") is None
+
+
+def test_broken_archived_semester_is_skipped(tmp_path: Path):
+    files, _ = _files_with_archived_semester(tmp_path)
+    _ = (tmp_path / "SUMMER_2026.json").write_text('{"semester": "SUMMER 2026"')
+
+    caches = load_semester_caches(files=files)
+    assert caches is not None
+    assert caches.get() is not None
+    assert caches.get("WINTER 2026") is not None
+    assert caches.get("SUMMER 2026") is None
+
+
+def test_reloader_swaps_caches_when_files_change(tmp_path: Path):
+    files = Files()
+    files.global_semesters_dir = tmp_path
+    state = State()
+    state.section_caches = load_semester_caches(files=files)
+    before = state.section_caches
+
+    reloader = SectionCacheReloader(state, interval_seconds=60, files=files)
+    assert not reloader.reload_if_changed()
+    assert state.section_caches is before
+
+    _ = _files_with_archived_semester(tmp_path)
+    assert reloader.reload_if_changed()
+    assert state.section_caches is not before
+    assert state.section_caches.get("WINTER 2026") is not None
+    assert before.get("WINTER 2026") is None
+
+    # an archived semester that can't be loaded is skipped, not the others
+    _ = (tmp_path / "BROKEN.json").write_text("{")
+    assert reloader.reload_if_changed()
+    assert state.section_caches.get("WINTER 2026") is not None
+    assert state.section_caches.get("BROKEN") is None
+
+
+def test_served_sections_are_published():
+    cache = load_section_cache()
+    assert cache is not None
+
+    latest = CatalogStore(Files().catalog_dir).latest(cache.semester)
+    assert latest is not None
+    assert latest.version == cache.version
+
+
+def _save_sections(
+    files: Files, catalog_store: CatalogStore, sections: list[Section]
+) -> None:
+    _ = util.save_global_sections_final(
+        "FALL 2026",
+        {section.id: section for section in sections},
+        Path("fall.pdf"),
+        files.global_all_sections_final_path_json,
+        None,
+        [],
+        files.global_all_sections_compact_path,
+        catalog_store,
+    )
+
+
+def test_changes_since_published_versions(tmp_path: Path):
+    files = Files()
+    files.global_semesters_dir = tmp_path / "semesters"
+    files.global_all_sections_final_path_json = tmp_path / "all_sections_final.json"
+    files.global_all_sections_compact_path = tmp_path / "all_sections_final.compact"
+    files.catalog_dir = tmp_path / "catalog"
+    catalog_store = CatalogStore(files.catalog_dir)
+
+    calculus = Section(id="1-00001", code="1", section="00001", title="Calculus I")
+    algebra = Section(id="2-00001", code="2", section="00001", title="Linear Algebra")
+    physics = Section(id="3-00001", code="3", section="00001", title="Physics")
+    chemistry = Section(
+        id="4-00001",
+        code="4",
+        section="00001",
+        title="Chemistry",
+        leclabs=[LecLab(prof="prof 1")],
+    )
+
+    _save_sections(files, catalog_store, [calculus, algebra, chemistry])
+    state = State()
+    state.section_caches = load_semester_caches(files=files)
+    first_version = state.section_caches.get().version
+
+    latest = catalog_store.latest("FALL 2026")
+    assert latest is not None
+    assert latest.version == first_version
+
+    _save_sections(
+        files,
+        catalog_store,
+        [
+            algebra.model_copy(update={"title": "Linear Algebra II"}),
+            physics,
+            chemistry.model_copy(
+                update={
+                    "leclabs": [LecLab(prof="prof 1", rating=Rating(prof="prof 1"))]
+                }
+            ),
+        ],
+    )
+    reloader = SectionCacheReloader(state, interval_seconds=60, files=files)
+    assert reloader.reload_if_changed()
+    cache = state.section_caches.get()
+    assert cache.version != first_version
+
+    # the changes were precomputed when publishing, the app only has the caches
+    changes_app = FastAPI()
+    changes_app.include_router(section_router)
+    changes_app.state.section_caches = state.section_caches
+
+    with TestClient(changes_app) as client:
+        res = client.get("/sections/changes", params={"since": first_version})
+        assert res.status_code == 200
+        changes = res.json()
+        assert changes["since"] == first_version
+        assert changes["version"] == cache.version
+        assert [s["title"] for s in changes["sectionsAdded"]] == ["Physics"]
+        assert changes["sectionsRemoved"] == ["1-00001"]
+        # the version changes with the ratings, so the changes have them too
+        assert [s["title"] for s in changes["sectionsChanged"]] == [
+            "Linear Algebra II",
+            "Chemistry",
+        ]
+        assert changes["sectionsChanged"][1]["leclabs"][0]["rating"]["prof"] == "prof 1"
+
+        res = client.get("/sections/changes", params={"since": cache.version})
+        assert res.status_code == 200
+        assert res.json()["sectionsChanged"] == []
+
+        res = client.get("/sections/all")
+        assert res.headers["x-catalog-version"] == cache.version
+
+        assert client.get("/sections/changes?since=unknown").status_code == 404
+
+    assert list(cache.changes_json) == [first_version]
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
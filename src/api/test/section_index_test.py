@@ -0,0 +1,141 @@
+import pytest
+
+from api.sections.helpers import load_sections_from_json
+from api.sections.section_index import (
+    SLOTS_PER_DAY,
+    build_section_index,
+    day_columns,
+)
+from scraper.models import DayTime, LecLab, Section
+
+sections = load_sections_from_json()
+index = build_section_index(sections)
+
+
+@pytest.mark.parametrize("query", ["", "c", "ca", "calculus", "ulus", "zzz", "i 2"])
+def test_title_containing(query: str):
+    expected = {i for i, s in enumerate(sections) if query in s.title.lower()}
+
+    assert index.title.containing(query) == expected
+
+
+@pytest.mark.parametrize("query", ["603-", "-mq", "101", "9"])
+def test_code_containing(query: str):
+    expected = {i for i, s in enumerate(sections) if query in s.code.lower()}
+
+    assert index.code.containing(query) == expected
+
+
+@pytest.mark.parametrize("query", ["smith", "an", ", j", "tba"])
+def test_teacher_containing(query: str):
+    expected = {
+        i
+        for i, s in enumerate(sections)
+        if any(query in leclab.prof.lower() for leclab in s.leclabs)
+    }
+
+    assert index.teacher.containing(query) == expected
+
+
+@pytest.mark.parametrize("query", ["", "sci", "science", "social science", "x"])
+def test_course_starting_with(query: str):
+    expected = {i for i, s in enumerate(sections) if s.course.lower().startswith(query)}
+
+    assert index.course.starting_with(query) == expected
+
+
+@pytest.mark.parametrize("query", ["bio", "psy", "political", "z"])
+def test_domain_starting_with(query: str):
+    expected = {i for i, s in enumerate(sections) if s.domain.lower().startswith(query)}
+
+    assert index.domain.starting_with(query) == expected
+
+
+@pytest.mark.parametrize("days_off", ["M", "T", "W", "R", "F", "MF", "TR", "MWF"])
+def test_days_off_occupancy(days_off: str):
+    expected = {
+        i
+        for i, s in enumerate(sections)
+        if all(
+            not any(day_off in day_time.day for day_off in days_off)
+            for leclab in s.leclabs
+            for day_time in leclab.day_times
+        )
+    }
+
+    busy = index.occupancy[:, day_columns(days_off)].any(axis=1)
+    assert {i for i in range(index.size) if not busy[i]} == expected
+
+
+@pytest.mark.parametrize("time", ["0800", "0830", "1000", "1215", "1600", "2000"])
+def test_earliest_start_and_latest_end(time: str):
+    expected_start = {
+        i
+        for i, s in enumerate(sections)
+        if all(
+            day_time.start_time_hhmm >= time
+            for leclab in s.leclabs
+            for day_time in leclab.day_times
+        )
+    }
+    expected_end = {
+        i
+        for i, s in enumerate(sections)
+        if all(
+            day_time.end_time_hhmm <= time
+            for leclab in s.leclabs
+            for day_time in leclab.day_times
+        )
+    }
+
+    start = {i for i in range(index.size) if index.earliest_start[i] >= int(time)}
+    end = {i for i in range(index.size) if index.latest_end[i] <= int(time)}
+
+    assert start == expected_start
+    assert end == expected_end
+
+
+def test_occupancy_keeps_the_gaps_of_a_day():
+    section = Section(
+        leclabs=[
+            LecLab(
+                day_times=[
+                    DayTime(day="MW", start_time_hhmm="0800", end_time_hhmm="0930"),
+                    DayTime(day="M", start_time_hhmm="1500", end_time_hhmm="1600"),
+                ]
+            )
+        ]
+    )
+
+    monday, tuesday, wednesday, *_ = build_section_index([section]).occupancy[0]
+
+    # 0800-0930 is the first three slots, 1500-1600 the 15th and 16th
+    assert monday == 0b111 | 0b11 << 14
+    assert tuesday == 0
+    assert wednesday == 0b111
+
+
+def test_occupancy_off_grid_times():
+    section = Section(
+        leclabs=[
+            LecLab(
+                day_times=[
+                    DayTime(day="M", start_time_hhmm="0815", end_time_hhmm="0845"),
+                    DayTime(day="S", start_time_hhmm="1000", end_time_hhmm="1200"),
+                    DayTime(day="F", start_time_hhmm="1900", end_time_hhmm="2100"),
+                ]
+            )
+        ]
+    )
+
+    monday, tuesday, wednesday, thursday, friday = build_section_index(
+        [section]
+    ).occupancy[0]
+
+    assert monday == 0b11
+    assert friday == 1 << (SLOTS_PER_DAY - 1)
+    assert tuesday == wednesday == thursday == 0
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
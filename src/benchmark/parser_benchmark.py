@@ -0,0 +1,113 @@
+import argparse
+import statistics
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter
+
+
+@dataclass
+class ParserMetrics:
+    pdf: str
+    lines: int
+    sections: int
+    median_ms: float
+    ns_per_line: float
+    classify_ns_per_line: float
+
+
+def _ensure_src_on_path() -> None:
+    project_root = Path(__file__).resolve().parents[2]
+    src_path = project_root / "src"
+
+    if str(src_path) not in sys.path:
+        sys.path.insert(0, str(src_path))
+
+
+def _default_pdfs() -> list[Path]:
+    project_root = Path(__file__).resolve().parents[2]
+    return sorted(project_root.glob("*.pdf"))
+
+
+def _median_seconds(fn, repeats: int) -> float:
+    timings: list[float] = []
+
+    for _ in range(repeats):
+        start = perf_counter()
+        fn()
+        timings.append(perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+def benchmark_pdf(pdf_path: Path, repeats: int) -> ParserMetrics:
+    """
+    Times NewParser on the lines of the given pdf, extracted once beforehand
+    so only the parsing is measured
+    """
+    from scraper.new_parser import NewParser, classify_line
+    from scraper.parser_utils import get_parser_deps
+
+    lines, columns_x = get_parser_deps(pdf_path)
+    sections = len(NewParser().parse(lines, columns_x))
+
+    # the columns are assigned by the first parse
+    all_lines = list(lines.lines())
+    title = all_lines[0].text
+
+    parse_seconds = _median_seconds(
+        lambda: NewParser().parse(lines, columns_x), repeats
+    )
+    classify_seconds = _median_seconds(
+        lambda: [classify_line(line, title) for line in all_lines], repeats
+    )
+
+    return ParserMetrics(
+        pdf=pdf_path.name,
+        lines=len(lines),
+        sections=sections,
+        median_ms=parse_seconds * 1000,
+        ns_per_line=parse_seconds * 1e9 / len(lines),
+        classify_ns_per_line=classify_seconds * 1e9 / len(lines),
+    )
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Measure the per-line cost of NewParser on the schedule pdfs."
+    )
+    parser.add_argument(
+        "pdfs",
+        nargs="*",
+        type=Path,
+        help="Pdfs to parse. Defaults to the schedules at the root of the repo.",
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    return parser
+
+
+def main() -> int:
+    args = _build_arg_parser().parse_args()
+    _ensure_src_on_path()
+
+    pdfs: list[Path] = args.pdfs or _default_pdfs()
+    if not pdfs:
+        print("No pdf to benchmark.")
+        return 1
+
+    print(
+        f"{'pdf':<50} {'lines':>6} {'sections':>8} {'parse ms':>9} {'ns/line':>8} {'classify ns/line':>17}"
+    )
+    for pdf_path in pdfs:
+        metrics = benchmark_pdf(pdf_path, args.repeats)
+        print(
+            f"{metrics.pdf:<50} {metrics.lines:>6} {metrics.sections:>8} "
+            f"{metrics.median_ms:>9.2f} {metrics.ns_per_line:>8.0f} "
+            f"{metrics.classify_ns_per_line:>17.0f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
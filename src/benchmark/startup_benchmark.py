@@ -0,0 +1,84 @@
+import argparse
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+
+def _ensure_src_on_path() -> None:
+    project_root = Path(__file__).resolve().parents[2]
+    src_path = project_root / "src"
+
+    if str(src_path) not in sys.path:
+        sys.path.insert(0, str(src_path))
+
+
+def _median_ms(fn, repeats: int) -> float:
+    timings: list[float] = []
+
+    for _ in range(repeats):
+        start = perf_counter()
+        fn()
+        timings.append(perf_counter() - start)
+
+    return statistics.median(timings) * 1000
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare the time to load the sections at api startup from all_sections_final.json and from its compact copy."
+        )
+    )
+    parser.add_argument("--repeats", type=int, default=10)
+    return parser
+
+
+def main() -> int:
+    args = _build_arg_parser().parse_args()
+    _ensure_src_on_path()
+
+    from api.sections.cache import load_section_cache
+    from scraper.compact_sections import load_compact_sections
+    from scraper.files import Files
+
+    files = Files(mkdir=False)
+    json_path = files.global_all_sections_final_path_json
+    compact_path = files.global_all_sections_compact_path
+
+    if load_compact_sections(compact_path, json_path) is None:
+        print(f"{compact_path} is missing or out of date with {json_path}.")
+        return 1
+
+    def load_json_sections() -> None:
+        global_sections = files.get_global_all_sections_content()
+        for section in global_sections.sections_by_id.values():
+            _ = section.model_dump_json(by_alias=True)
+
+    rows = [
+        ("sections from json", _median_ms(load_json_sections, args.repeats)),
+        (
+            "sections from compact",
+            _median_ms(
+                lambda: load_compact_sections(compact_path, json_path), args.repeats
+            ),
+        ),
+        (
+            "section cache from json",
+            _median_ms(lambda: load_section_cache(use_compact=False), args.repeats),
+        ),
+        (
+            "section cache from compact",
+            _median_ms(lambda: load_section_cache(use_compact=True), args.repeats),
+        ),
+    ]
+
+    print(f"{'load':<28} {'median ms':>10}")
+    for name, median_ms in rows:
+        print(f"{name:<28} {median_ms:>10.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
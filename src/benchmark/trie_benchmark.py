@@ -0,0 +1,130 @@
+import argparse
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from pydantic import BaseModel
+
+
+class LegacyTrieNode(BaseModel):
+    children: dict[str, LegacyTrieNode] = {}
+    word: str | None = None
+
+
+class LegacyTrie(BaseModel):
+    """
+    The pydantic trie scraper.trie.Trie replaced, kept to compare against
+    """
+
+    root: LegacyTrieNode = LegacyTrieNode()
+
+    def add(self, word: str):
+        node = self.root
+        for char in word:
+            node = node.children.setdefault(char, LegacyTrieNode())
+        node.word = word
+
+    def get_words(self, prefix: str) -> list[str]:
+        node = self.root
+        for char in prefix:
+            if char not in node.children:
+                return []
+            node = node.children[char]
+
+        words: list[str] = []
+
+        def fn(node: LegacyTrieNode):
+            if node.word is not None:
+                words.append(node.word)
+
+            for child in node.children.values():
+                fn(child)
+
+        fn(node)
+
+        return words
+
+
+def _ensure_src_on_path() -> None:
+    project_root = Path(__file__).resolve().parents[2]
+    src_path = project_root / "src"
+
+    if str(src_path) not in sys.path:
+        sys.path.insert(0, str(src_path))
+
+
+def _median_us(fn, repeats: int) -> float:
+    timings: list[float] = []
+
+    for _ in range(repeats):
+        start = perf_counter()
+        fn()
+        timings.append(perf_counter() - start)
+
+    return statistics.median(timings) * 1e6
+
+
+def _build_legacy_trie(words: list[str]) -> LegacyTrie:
+    trie = LegacyTrie()
+    for word in words:
+        trie.add(word)
+    return trie
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Compare scraper.trie.Trie against the pydantic trie it replaced on the titles, codes and profs of the sections."
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    return parser
+
+
+def main() -> int:
+    args = _build_arg_parser().parse_args()
+    _ensure_src_on_path()
+
+    from api.sections.helpers import load_sections_from_json
+    from scraper.trie import Trie
+
+    sections = load_sections_from_json()
+    words_by_field = {
+        "code": sorted({section.code for section in sections}),
+        "title": sorted({section.title for section in sections}),
+        "teacher": sorted(
+            {leclab.prof for section in sections for leclab in section.leclabs}
+        ),
+    }
+
+    print(
+        f"{'field':<8} {'words':>6} {'legacy build us':>16} {'build us':>9} "
+        f"{'legacy lookup us':>17} {'lookup us':>10}"
+    )
+    for field, words in words_by_field.items():
+        # one letter prefixes, the widest autocompletion queries
+        prefixes = sorted({word[:1] for word in words if word})
+
+        legacy = _build_legacy_trie(words)
+        trie = Trie(words)
+
+        legacy_build = _median_us(lambda: _build_legacy_trie(words), args.repeats)
+        build = _median_us(lambda: Trie(words), args.repeats)
+        legacy_lookup = _median_us(
+            lambda: [legacy.get_words(p)[: args.limit] for p in prefixes],
+            args.repeats,
+        ) / len(prefixes)
+        lookup = _median_us(
+            lambda: [trie.get_words(p, args.limit) for p in prefixes], args.repeats
+        ) / len(prefixes)
+
+        print(
+            f"{field:<8} {len(words):>6} {legacy_build:>16.0f} {build:>9.0f} "
+            f"{legacy_lookup:>17.2f} {lookup:>10.2f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
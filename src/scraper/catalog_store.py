@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import final
+
+from scraper.models import (
+    ConfiguredBaseModel,
+    GlobalAllSections,
+    Section,
+    SectionPatch,
+    SectionsDiff,
+)
+from scraper.section_patch import get_section_patch, section_fingerprint
+
+# versions of a semester the changes are served since: when a version is published,
+# its changes since the previous SECTION_CHANGES_VERSIONS - 1 versions are precomputed
+SECTION_CHANGES_VERSIONS = int(os.environ.get("SECTION_CHANGES_VERSIONS", str(5)))
+
+
+class CatalogVersion(ConfiguredBaseModel):
+    version: str
+    semester: str
+    filename: str
+    published_at: float
+    section_count: int
+
+
+class Snapshot(ConfiguredBaseModel):
+    """
+    A published GlobalAllSections, with the hash of the object of each section
+    instead of the section itself
+    """
+
+    semester: str
+    filename: str
+    sections_diff: SectionsDiff | None
+    comments: list[str]
+    object_by_id: dict[str, str]
+    # fingerprint of each section, to tell the ratings apart without loading the objects
+    fingerprint_by_id: dict[str, str]
+
+
+class CatalogDiff(ConfiguredBaseModel):
+    sections_added: list[str]
+    sections_removed: list[str]
+    sections_changed: list[SectionPatch]
+    # sections whose only change is their ratings, which the version also covers
+    ratings_changed: list[str]
+
+
+class SectionChanges(ConfiguredBaseModel):
+    since: str
+    version: str
+    # the whole new sections, ratings included
+    sections_added: list[Section]
+    sections_changed: list[Section]
+    sections_removed: list[str]
+
+
+@final
+class CatalogStore:
+    """
+    Append-only history of every published GlobalAllSections.
+    Each distinct section is stored once as an object named by the hash of its json,
+    a snapshot lists the object of each of its sections, and the index lists the snapshots
+    in the order they were published.
+    The changes to a version since the previous ones are precomputed when it is published:
+
+        objects/ab/abcdef....json
+        snapshots/<version>.json
+        changes/<version>/<since>.json
+        index.json
+
+    Files are only ever added, except for the index which is replaced with a longer one.
+    A version only depends on the sections, see catalog_version
+    """
+
+    def __init__(self, catalog_dir: Path) -> None:
+        self.catalog_dir = catalog_dir
+        self.objects_dir = catalog_dir / "objects"
+        self.snapshots_dir = catalog_dir / "snapshots"
+        self.changes_dir = catalog_dir / "changes"
+        self.index_path = catalog_dir / "index.json"
+        # the index as last read, with the mtime in ns and the size it had then
+        self._index: tuple[tuple[int, int], tuple[CatalogVersion, ...]] | None = None
+
+    def publish(self, global_sections: GlobalAllSections) -> str:
+        """
+        Adds the global sections to the store, with their changes since the previous
+        versions of their semester, and returns their version.
+        Publishing sections that are already stored changes nothing,
+        even if the diff or the comments changed
+        """
+        object_by_id: dict[str, str] = {}
+        fingerprint_by_id: dict[str, str] = {}
+        sections_json: list[bytes] = []
+
+        for id, section in global_sections.sections_by_id.items():
+            body = section.model_dump_json(by_alias=True).encode()
+            sections_json.append(body)
+            object_by_id[id] = self._put_object(body)
+            fingerprint_by_id[id] = section_fingerprint(section)
+
+        version = catalog_version(b"[" + b",".join(sections_json) + b"]")
+        versions = self.versions()
+        if any(v.version == version for v in versions):
+            return version
+
+        snapshot = Snapshot(
+            semester=global_sections.semester,
+            filename=global_sections.filename,
+            sections_diff=global_sections.sections_diff,
+            comments=global_sections.comments,
+            object_by_id=object_by_id,
+            fingerprint_by_id=fingerprint_by_id,
+        )
+        _write_new(
+            self.snapshots_dir / f"{version}.json",
+            snapshot.model_dump_json(by_alias=True).encode(),
+        )
+
+        previous = [v.version for v in versions if v.semester == snapshot.semester]
+        for since in previous[max(len(previous) - SECTION_CHANGES_VERSIONS + 1, 0) :]:
+            self._put_changes(since, version)
+
+        versions.append(
+            CatalogVersion(
+                version=version,
+                semester=global_sections.semester,
+                filename=global_sections.filename,
+                published_at=time.time(),
+                section_count=len(object_by_id),
+            )
+        )
+        _write_atomic(
+            self.index_path,
+            json.dumps([v.model_dump(by_alias=True) for v in versions]).encode(),
+        )
+        stat = self.index_path.stat()
+        self._index = ((stat.st_mtime_ns, stat.st_size), tuple(versions))
+
+        return version
+
+    def versions(self) -> list[CatalogVersion]:
+        """
+        Every published version, oldest first.
+        The index is only read again once it changed on disk
+        """
+        try:
+            stat = self.index_path.stat()
+        except FileNotFoundError:
+            return []
+
+        index_stat = (stat.st_mtime_ns, stat.st_size)
+        if self._index is None or self._index[0] != index_stat:
+            self._index = (
+                index_stat,
+                tuple(
+                    CatalogVersion.model_validate(v)
+                    for v in json.loads(self.index_path.read_bytes())
+                ),
+            )
+
+        return list(self._index[1])
+
+    def changes(self, version: str) -> dict[str, bytes]:
+        """
+        The json of the SectionChanges to the given version precomputed when it was published,
+        keyed by the version they are since
+        """
+        changes_dir = self.changes_dir / version
+        if not changes_dir.is_dir():
+            return {}
+
+        return {path.stem: path.read_bytes() for path in changes_dir.glob("*.json")}
+
+    def latest(self, semester: str | None = None) -> CatalogVersion | None:
+        versions = [
+            v for v in self.versions() if semester is None or v.semester == semester
+        ]
+        return versions[-1] if versions else None
+
+    def snapshot(self, version: str) -> Snapshot:
+        """
+        Raises FileNotFoundError if the version isn't stored
+        """
+        return Snapshot.model_validate_json(
+            (self.snapshots_dir / f"{version}.json").read_bytes()
+        )
+
+    def checkout(self, version: str) -> GlobalAllSections:
+        """
+        Gets back the GlobalAllSections published as the given version
+        """
+        snapshot = self.snapshot(version)
+
+        return GlobalAllSections(
+            semester=snapshot.semester,
+            filename=snapshot.filename,
+            sections_diff=snapshot.sections_diff,
+            comments=snapshot.comments,
+            sections_by_id={
+                id: self._get_section(object_hash)
+                for id, object_hash in snapshot.object_by_id.items()
+            },
+        )
+
+    def diff(self, old_version: str, new_version: str) -> CatalogDiff:
+        """
+        Diffs two versions from their snapshots, only loading the sections
+        whose objects differ between them
+        """
+        old = self.snapshot(old_version)
+        new = self.snapshot(new_version)
+        old_ids = old.object_by_id.keys()
+        new_ids = new.object_by_id.keys()
+
+        sections_changed: list[SectionPatch] = []
+        ratings_changed: list[str] = []
+        for id in sorted(old_ids & new_ids):
+            if old.object_by_id[id] == new.object_by_id[id]:
+                continue
+
+            if old.fingerprint_by_id[id] == new.fingerprint_by_id[id]:
+                ratings_changed.append(id)
+                continue
+
+            patch = get_section_patch(
+                id,
+                self._get_section(old.object_by_id[id]),
+                self._get_section(new.object_by_id[id]),
+            )
+            if patch.changes:
+                sections_changed.append(patch)
+            else:
+                ratings_changed.append(id)
+
+        return CatalogDiff(
+            sections_added=sorted(new_ids - old_ids),
+            sections_removed=sorted(old_ids - new_ids),
+            sections_changed=sections_changed,
+            ratings_changed=ratings_changed,
+        )
+
+    def _put_changes(self, since: str, version: str) -> None:
+        diff = self.diff(since, version)
+        object_by_id = self.snapshot(version).object_by_id
+
+        changes = SectionChanges(
+            since=since,
+            version=version,
+            sections_added=[
+                self._get_section(object_by_id[id]) for id in diff.sections_added
+            ],
+            # the version covers the ratings, so do the changes
+            sections_changed=[
+                self._get_section(object_by_id[id])
+                for id in sorted(
+                    [patch.id for patch in diff.sections_changed] + diff.ratings_changed
+                )
+            ],
+            sections_removed=diff.sections_removed,
+        )
+        _write_new(
+            self.changes_dir / version / f"{since}.json",
+            changes.model_dump_json(by_alias=True).encode(),
+        )
+
+    def _object_path(self, object_hash: str) -> Path:
+        return self.objects_dir / object_hash[:2] / f"{object_hash}.json"
+
+    def _put_object(self, body: bytes) -> str:
+        object_hash = hashlib.sha256(body).hexdigest()
+        path = self._object_path(object_hash)
+
+        if not path.exists():
+            _write_new(path, body)
+
+        return object_hash
+
+    def _get_section(self, object_hash: str) -> Section:
+        return Section.model_validate_json(self._object_path(object_hash).read_bytes())
+
+
+def catalog_version(sections_json: bytes) -> str:
+    """
+    Version of the sections, the hash of their json array in the order of sections_by_id.
+    The api serves that same array, so it gives the same version to the same sections
+    """
+    return hashlib.sha256(sections_json).hexdigest()[:16]
+
+
+def _write_new(path: Path, body: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, body)
+
+
+def _write_atomic(path: Path, body: bytes) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    _ = tmp_path.write_bytes(body)
+    _ = tmp_path.replace(path)
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from scraper.models import GlobalAllSections, Section
+
+COMPACT_SECTIONS_MAGIC = b"SECS"
+# bumped whenever Section or the metadata changes, since the body is the json of the sections
+COMPACT_SECTIONS_VERSION = 5
+# magic, format version, length of the json metadata that follows
+_HEADER = struct.Struct("<4sII")
+
+_sections_adapter = TypeAdapter(list[Section])
+
+# fields of the day times repeated across most sections, shared once decoded
+_DAY_TIME_FIELDS = ("day", "startTimeHhmm", "endTimeHhmm")
+# the sections of the global json are spliced in between, see CompactSections.global_json
+_SECTIONS_BY_ID_PLACEHOLDER = '"sectionsById":{}'
+
+
+@dataclass(frozen=True)
+class CompactSections:
+    """
+    The sections of a global all sections file, with the minified json of each of them
+    """
+
+    semester: str
+    # json array of every section, and the slice of it that is each section
+    body: bytes
+    section_bodies: tuple[bytes, ...]
+    # key of each section in sections_by_id
+    ids: tuple[str, ...]
+    # decoded json of each section, with the camelCase keys
+    index_sections: tuple[dict[str, Any], ...]
+
+    # json of the GlobalAllSections before and after its sections
+    global_prefix: bytes
+    global_suffix: bytes
+
+    def sections(self) -> tuple[Section, ...]:
+        """
+        Validates the sections, only done when they are needed as Section
+        """
+        return tuple(_sections_adapter.validate_json(self.body))
+
+    def global_json(self) -> bytes:
+        """
+        The json of the whole GlobalAllSections the sections were saved from
+        """
+        return (
+            self.global_prefix
+            + b",".join(
+                json.dumps(id, ensure_ascii=False).encode() + b":" + section_body
+                for id, section_body in zip(self.ids, self.section_bodies)
+            )
+            + self.global_suffix
+        )
+
+
+def save_compact_sections(
+    global_sections: GlobalAllSections, source_path: Path, compact_path: Path
+):
+    """
+    Saves the sections of the given global_sections as a minified json array of the sections,
+    preceded by the offsets of every section in the array, the rest of the global_sections
+    and the sha256 of the source_path it was made from, so a stale file is never loaded
+    """
+
+    section_bodies = [
+        section.model_dump_json(by_alias=True).encode()
+        for section in global_sections.sections_by_id.values()
+    ]
+    body = b"[" + b",".join(section_bodies) + b"]"
+
+    # each section ends right before the following comma, or the closing bracket
+    section_ends: list[int] = []
+    end = 0
+    for section_body in section_bodies:
+        end += 1 + len(section_body)
+        section_ends.append(end)
+
+    global_prefix, global_suffix = (
+        global_sections.model_copy(update={"sections_by_id": {}})
+        .model_dump_json(by_alias=True)
+        .split(_SECTIONS_BY_ID_PLACEHOLDER, 1)
+    )
+
+    metadata = json.dumps(
+        {
+            "sourceSha256": _sha256(source_path),
+            "semester": global_sections.semester,
+            "sectionEnds": section_ends,
+            "ids": list(global_sections.sections_by_id),
+            "globalPrefix": global_prefix + '"sectionsById":{',
+            "globalSuffix": "}" + global_suffix,
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+    tmp_path = compact_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        _ = f.write(
+            _HEADER.pack(
+                COMPACT_SECTIONS_MAGIC, COMPACT_SECTIONS_VERSION, len(metadata)
+            )
+        )
+        _ = f.write(metadata)
+        _ = f.write(body)
+
+    _ = tmp_path.replace(compact_path)
+
+
+def load_compact_sections(
+    compact_path: Path, source_path: Path
+) -> CompactSections | None:
+    """
+    Loads the compact sections saved by save_compact_sections.
+    Returns None if there are none, or if they weren't made from the current source_path
+    """
+
+    try:
+        content = compact_path.read_bytes()
+    except OSError:
+        return None
+
+    if len(content) < _HEADER.size:
+        return None
+
+    magic, version, metadata_length = _HEADER.unpack_from(content)
+    if magic != COMPACT_SECTIONS_MAGIC or version != COMPACT_SECTIONS_VERSION:
+        return None
+
+    body_start = _HEADER.size + metadata_length
+    metadata = json.loads(content[_HEADER.size : body_start])
+
+    if metadata["sourceSha256"] != _sha256(source_path):
+        return None
+
+    body = content[body_start:]
+    section_ends: list[int] = metadata["sectionEnds"]
+
+    return CompactSections(
+        semester=metadata["semester"],
+        body=body,
+        section_bodies=tuple(
+            body[start + 1 : end]
+            for start, end in zip([0, *section_ends], section_ends)
+        ),
+        ids=tuple(metadata["ids"]),
+        index_sections=_decode_sections(body),
+        global_prefix=metadata["globalPrefix"].encode(),
+        global_suffix=metadata["globalSuffix"].encode(),
+    )
+
+
+def _decode_sections(body: bytes) -> tuple[dict[str, Any], ...]:
+    """
+    Decodes the sections for the api to index, with a single copy of each
+    professor and day time string, as they are repeated across the sections
+    """
+    strings: dict[str, str] = {}
+    sections: list[dict[str, Any]] = json.loads(body)
+
+    for section in sections:
+        for leclab in section["leclabs"]:
+            leclab["prof"] = strings.setdefault(leclab["prof"], leclab["prof"])
+            for day_time in leclab["dayTimes"]:
+                for field in _DAY_TIME_FIELDS:
+                    day_time[field] = strings.setdefault(
+                        day_time[field], day_time[field]
+                    )
+
+    return tuple(sections)
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
@@ -1,12 +1,13 @@
-from collections import OrderedDict
 import json
 from pathlib import Path
-from typing import Any, final
+from typing import final
 
 from pydantic import TypeAdapter
 from pydantic_core import from_json
 
-from scraper.models import ColumnsXs, GlobalAllSections, Section, Word
+from scraper import parser_utils, util
+from scraper.models import ColumnsXs, GlobalAllSections, Section
+from scraper.word_table import WordTable
 
 
 @final
@@ -26,7 +27,9 @@ class Files:
 
         self.data_dir = semester_data_dir
 
-        self.sorted_lines_path = semester_data_dir / "sorted_lines.json"
+        self.sorted_lines_path = semester_data_dir / "sorted_lines.bin"
+        # readable export of the sorted lines, only written when asked for
+        self.sorted_lines_json_path = semester_data_dir / "sorted_lines.json"
         self.columns_x_path = semester_data_dir / "section_columns_x.json"
         self.parsed_sections_path = semester_data_dir / "parsed_sections.json"
         self.pids_path = data_dir / "pids.json"
@@ -35,43 +38,39 @@ class Files:
             semester_data_dir / "all_sections_final.json"
         )
         self.ratings_path = data_dir / "ratings.json"
+        # hashes of the inputs and outputs of each stage of the last run, see StageCache
+        self.stages_path = semester_data_dir / "stages.json"
 
-        self.missing_pids_path = semester_data_dir / "missingPids.json"
+        self.missing_pids_path = data_dir / "missing_pids.json"
         self.global_all_sections_final_path_json = cwd / "all_sections_final.json"
+        self.global_all_sections_compact_path = cwd / "all_sections_final.compact"
+        # global all sections of the previous semesters, still served by the api
+        self.global_semesters_dir = cwd / "semesters"
+        # every published global all sections, see CatalogStore
+        self.catalog_dir = data_dir / "catalog"
 
         self.out_file_path = cwd / "winter" / "winter-out.json"  # backwards
 
-    def get_sorted_lines_content(self) -> OrderedDict[int, list[Word]] | None:
+    def get_sorted_lines_content(self) -> WordTable | None:
         """
-        Gets the content of the sorted lines file.
-        Returns None if file doesn't exists
+        Gets the content of the sorted lines file, or of its json export.
+        Returns None if neither exists
         """
-        if not self.sorted_lines_path.exists():
-            return None
+        if self.sorted_lines_path.exists():
+            return parser_utils.load_sorted_lines_binary(self.sorted_lines_path)
 
-        with open(self.sorted_lines_path, "r") as f:
-            adapter = TypeAdapter(OrderedDict[int, list[Word]])
-            data = adapter.validate_json(f.read(), by_alias=True)
-            return data
+        if self.sorted_lines_json_path.exists():
+            return parser_utils.load_sorted_lines(
+                self.sorted_lines_json_path.read_text()
+            )
 
-    def write_to_sorted_lines(self, lines: OrderedDict[int, list[Word]]) -> None:
+        return None
+
+    def write_to_sorted_lines(self, lines: WordTable) -> None:
         """
         Write the given lines to the sorted lines file
         """
-
-        # lines: OrderedDict[int, list[Word]] = parser_utils.compute_sorted_lines(
-        #     self.pdf_path
-        # )
-        #
-        def map(word: Word) -> dict[str, Any]:
-            return word.model_dump(by_alias=True)
-
-        serializable_lines: OrderedDict[float, list[dict[str, Any]]] = OrderedDict()
-        for k, v in lines.items():
-            serializable_lines[k] = [map(w) for w in v]
-
-        with open(self.sorted_lines_path, "w") as f:
-            json.dump(serializable_lines, f, indent=2, ensure_ascii=False)
+        parser_utils.save_sorted_lines_binary(lines, self.sorted_lines_path)
 
     def get_section_columns_x_content(self) -> ColumnsXs:
         """
@@ -103,3 +102,24 @@ class Files:
     def get_global_all_sections_content(self) -> GlobalAllSections:
         with open(self.global_all_sections_final_path_json, "r") as file:
             return GlobalAllSections.model_validate_json(file.read())
+
+    def global_semester_path(self, semester: str) -> Path:
+        """
+        Path of the global all sections of a previous semester
+        """
+        return (
+            self.global_semesters_dir
+            / f"{util.normalize_semester(semester).replace(' ', '_')}.json"
+        )
+
+    def get_global_semester_content(self, semester: str) -> GlobalAllSections | None:
+        """
+        Gets the global all sections of the given previous semester.
+        Returns None if it wasn't archived
+        """
+        path = self.global_semester_path(semester)
+        if not path.exists():
+            return None
+
+        with open(path, "r") as file:
+            return GlobalAllSections.model_validate_json(file.read())
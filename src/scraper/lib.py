@@ -1,9 +1,12 @@
 import datetime
+import itertools
 import logging
+from collections.abc import Iterator
 from pathlib import Path
 
 from scraper import new_parser, parser_utils, util
-from scraper.models import ParsedPdf
+from scraper.models import ColumnsXs, ParsedPdf, Section
+from scraper.word_table import Line, WordTable
 
 logger = logging.getLogger(__name__)
 
@@ -28,26 +31,66 @@ def get_current_semester() -> str:
 def the_entire_loop(
     pdf_path: Path,
     max_pages: int | None = None,
+    workers: int = 1,
 ) -> ParsedPdf:
     """The entire loop with no cached sections, no diff and no ratings"""
 
     semester = get_current_semester()
 
+    sections_by_id = util.to_sections_by_id(
+        stream_sections(pdf_path, max_pages=max_pages, workers=workers)
+    )
+
+    return ParsedPdf(semester=semester, sections_by_id=sections_by_id)
+
+
+def stream_sections(
+    pdf_path: Path,
+    max_pages: int | None = None,
+    workers: int = 1,
+) -> Iterator[Section]:
+    """
+    Parses the pdf page by page, yielding each Section as soon as it is parsed.
+    Only the pages read before the column header is found are kept in memory
+    """
+
     logger.debug(f"parsing pdf at {pdf_path}")
 
-    parser = new_parser.NewParser()
-    sorted_lines, columns_x = parser_utils.get_parser_deps(
-        pdf_path, max_pages=max_pages
+    pages = parser_utils.iter_sorted_lines(
+        pdf_path, max_pages=max_pages, workers=workers
     )
-    sections = parser.parse(sorted_lines, columns_x)
 
-    sections_by_id = util.to_sections_by_id(sections)
+    read_pages: list[WordTable] = []
+    columns_x: ColumnsXs | None = None
+
+    for page in pages:
+        read_pages.append(page)
+
+        try:
+            columns_x = parser_utils.compute_columns_x(page)
+            break
+        except IndexError, AssertionError:
+            # no column header followed by a section on this page
+            continue
 
-    parsed_semester = new_parser.get_semester(sorted_lines)
+    if columns_x is None:
+        raise ValueError("Could not find the column header in the pdf")
+
+    parsed_semester = new_parser.get_semester(read_pages[0])
+    semester = get_current_semester()
 
     if parsed_semester != semester:
         logger.warning(
             f"Parsed and current semester differs: parsed {parsed_semester}, current {semester}",
         )
 
-    return ParsedPdf(semester=semester, sections_by_id=sections_by_id)
+    def page_lines(page: WordTable) -> Iterator[Line]:
+        page.assign_columns(columns_x)
+        return page.lines()
+
+    lines = itertools.chain.from_iterable(
+        page_lines(page) for page in itertools.chain(read_pages, pages)
+    )
+
+    parser = new_parser.NewParser()
+    yield from parser.iter_parse(lines)
@@ -1,4 +1,5 @@
 import logging
+import os
 import sys
 from pathlib import Path
 from typing import Annotated
@@ -8,14 +9,17 @@ import typer
 from dotenv import load_dotenv
 
 from scraper import lib, util
+from scraper.catalog_store import CatalogStore
 from scraper.files import Files
-from scraper.new_parser import get_semester, parse_and_save
+from scraper.new_parser import PARSER_VERSION, get_semester, parse_and_save
 from scraper.parser_utils import (
-    get_parser_deps_if_not_exists,
+    compute_columns_x_if_not_exists,
+    compute_sorted_lines_if_not_exist,
+    export_sorted_lines_json,
 )
 from scraper.scraper import scrape_with_override
+from scraper.stage_cache import StageCache, hash_file, hash_inputs
 from scraper.util import (
-    contains_data,
     get_global_sections_diff,
     make_sections_final,
     save_global_sections_final,
@@ -23,16 +27,40 @@ from scraper.util import (
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_WORKERS = os.cpu_count() or 1
+
 
 def _main(
     pdf_path: Annotated[str, typer.Option(help="Path to the schedule of classes file")],
     override: Annotated[
         bool | None,
         typer.Option(
-            help="Override everything [true] or always used saved data [false]. Omitting this will ask the user for confirmation when there is saved data."
+            help="Override everything [true] or always used saved data [false]. Omitting this only runs again the stages whose inputs changed since their last run."
         ),
     ] = None,
     run_tests: Annotated[bool, typer.Option(help="Run tests")] = False,
+    workers: Annotated[
+        int,
+        typer.Option(help="Number of processes used to extract the pdf pages"),
+    ] = DEFAULT_WORKERS,
+    ratings_ttl_hours: Annotated[
+        float | None,
+        typer.Option(
+            help="Only scrape again the ratings older than this many hours, and the ones of new professors"
+        ),
+    ] = None,
+    missing_pid_ttl_days: Annotated[
+        float,
+        typer.Option(
+            help="Days before searching again for the professors that weren't found on rate my professor"
+        ),
+    ] = 30,
+    export_sorted_lines: Annotated[
+        bool,
+        typer.Option(
+            help="Also export the sorted lines as readable json, next to their binary file"
+        ),
+    ] = False,
 ):
     """
     Parse the schedule of classes pdf and scrape professors' ratings into an ultimate compilation of all sections
@@ -44,17 +72,55 @@ def _main(
 
     logger.info(f"parsing pdf at {files.pdf_path}")
 
-    sorted_lines, columns_x = get_parser_deps_if_not_exists(
-        files.sorted_lines_path, files.pdf_path, files.columns_x_path, override
+    stages = StageCache(files.stages_path)
+
+    inputs = hash_inputs(hash_file(files.pdf_path), PARSER_VERSION)
+    run = stages.should_run("sorted_lines", inputs, files.sorted_lines_path, override)
+    sorted_lines = compute_sorted_lines_if_not_exist(
+        files.sorted_lines_path, files.pdf_path, run, workers
     )
+    sorted_lines_hash = stages.finish(
+        "sorted_lines", inputs, files.sorted_lines_path, run
+    )
+    if export_sorted_lines:
+        export_sorted_lines_json(sorted_lines, files.sorted_lines_json_path)
+
+    inputs = hash_inputs(sorted_lines_hash)
+    run = stages.should_run("columns_x", inputs, files.columns_x_path, override)
+    columns_x = compute_columns_x_if_not_exists(files.columns_x_path, sorted_lines, run)
+    columns_x_hash = stages.finish("columns_x", inputs, files.columns_x_path, run)
 
-    sections = parse_and_save(
-        sorted_lines, columns_x, files.parsed_sections_path, override
+    inputs = hash_inputs(sorted_lines_hash, columns_x_hash, PARSER_VERSION)
+    run = stages.should_run(
+        "parsed_sections", inputs, files.parsed_sections_path, override
+    )
+    sections = parse_and_save(sorted_lines, columns_x, files.parsed_sections_path, run)
+    parsed_sections_hash = stages.finish(
+        "parsed_sections", inputs, files.parsed_sections_path, run
     )
 
+    # the output isn't hashed: the ratings file is shared by every pdf, and a refresh with
+    # a ttl rewrites it in place with new fetch times, so its hash would never match the
+    # record. Only the sections it was scraped for are checked, and that it is still there
+    inputs = hash_inputs(parsed_sections_hash)
+    run = stages.should_run(
+        "ratings", inputs, files.ratings_path, override, verify_output=False
+    )
     ratings = scrape_with_override(
-        sections, files.ratings_path, files.pids_path, override, False
+        sections,
+        files.ratings_path,
+        files.pids_path,
+        # with a ttl, the ratings are refreshed whether the stage is fresh or not.
+        # The refresh validates the saved file, and scrapes again the professors
+        # missing from it or whose rating is stale
+        override if ratings_ttl_hours is not None else run,
+        False,
+        None if ratings_ttl_hours is None else ratings_ttl_hours * 3600,
+        files.missing_pids_path,
+        missing_pid_ttl_days * 24 * 3600,
     )
+    _ = stages.finish("ratings", inputs, files.ratings_path, run, verify_output=False)
+
     make_sections_final(sections, ratings, files.all_sections_final_path_json)
     sections_by_id = util.to_sections_by_id(sections)
 
@@ -65,15 +131,22 @@ def _main(
             f"Parsed and current semester differs: parsed {parsed_semester}, current {semester}",
         )
 
+    old_global_sections = files.get_global_all_sections_content()
     schedule_diff = get_global_sections_diff(
-        semester, files.get_global_all_sections_content(), sections_by_id
+        semester, old_global_sections, sections_by_id
     )
 
-    if not contains_data(
-        override,
-        files.global_all_sections_final_path_json,
-        "Global all sections already exists.",
-    ):
+    inputs = hash_inputs(hash_file(files.all_sections_final_path_json), semester)
+    run = stages.should_run(
+        "global_sections", inputs, files.global_all_sections_final_path_json, override
+    )
+    if run:
+        if old_global_sections.semester != semester:
+            util.archive_global_sections(
+                old_global_sections,
+                files.global_semester_path(old_global_sections.semester),
+            )
+
         _ = save_global_sections_final(
             semester,
             sections_by_id,
@@ -81,7 +154,15 @@ def _main(
             files.global_all_sections_final_path_json,
             schedule_diff,
             [],
+            files.global_all_sections_compact_path,
         )
+    _ = stages.finish(
+        "global_sections", inputs, files.global_all_sections_final_path_json, run
+    )
+
+    # published on every run, even when fresh, so the store always has the served sections.
+    # Publishing a version already in the store changes nothing
+    _ = CatalogStore(files.catalog_dir).publish(files.get_global_all_sections_content())
 
     if run_tests:
         sys.exit(pytest.main(["--no-header", "-s", "-v"]))
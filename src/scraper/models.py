@@ -1,15 +1,23 @@
+import hashlib
 import logging
 from enum import Enum
 from typing import override
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, JsonValue
 from pydantic.alias_generators import to_camel
+from pydantic.main import IncEx
 
 logger = logging.getLogger(__name__)
 
 
 type ViewData = list[dict[str, list[int]]]
 
+# fields of a Section that aren't part of its content, for model_dump's exclude
+SECTION_CONTENT_EXCLUDE: dict[str, IncEx | bool] = {
+    "fingerprint": True,
+    "leclabs": {"__all__": {"rating"}},
+}
+
 
 class Status(str, Enum):
     FOUND = "found"
@@ -42,6 +50,9 @@ class Rating(ConfiguredBaseModel):
     difficulty: float = 0
     status: Status = Status.FOUNDNT
     pId: str | None = None
+    # unix time at which the rating was scraped, None for ratings saved before it was tracked.
+    # Only kept in the ratings file, see _save_ratings
+    fetched_at: float | None = Field(default=None, exclude=True)
 
 
 class LecLab(ConfiguredBaseModel):
@@ -71,6 +82,16 @@ class Section(ConfiguredBaseModel):
     leclabs: list[LecLab] = []
     more: str = ""
     view_data: ViewData = []
+    # hash of every field but the ratings of the leclabs, set once the section is parsed
+    fingerprint: str = ""
+
+    def compute_fingerprint(self) -> str:
+        """
+        Hashes every field of the section except the ratings, which change between
+        scrapes without the section changing, and the fingerprint itself
+        """
+        content = self.model_dump_json(exclude=SECTION_CONTENT_EXCLUDE)
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
 
 
 class ColumnsXs(BaseModel):
@@ -94,8 +115,21 @@ class Word(BaseModel):
         return hash(self.model_dump_json(by_alias=True))
 
 
+class FieldChange(ConfiguredBaseModel):
+    # camelCase path of the changed field in the section json, ie. leclabs.0.dayTimes.
+    # A whole leclab added or removed has the path of the leclab and a null old or new
+    path: str
+    old: JsonValue
+    new: JsonValue
+
+
+class SectionPatch(ConfiguredBaseModel):
+    id: str
+    changes: list[FieldChange]
+
+
 class SectionsDiff(ConfiguredBaseModel):
-    previous_sections_changed: list[Section]
+    sections_changed: list[SectionPatch] = []
     sections_added: list[str]
     sections_removed: list[Section]
 
@@ -3,149 +3,261 @@ import math
 from pathlib import Path
 import re
 import json
+from collections.abc import Iterable, Iterator
+from enum import Enum, auto
 from typing import final
 
 from pydantic import TypeAdapter
 
 from scraper.files import Files
-from scraper.models import ColumnsXs, LecLab, LecLabType, Section, Word
+from scraper.models import ColumnsXs, LecLab, LecLabType, Section
 from scraper.parser_utils import compute_columns_x, compute_sorted_lines
 from scraper.util import contains_data
+from scraper.word_table import Column, Line, WordTable
 
 logger = logging.getLogger(__name__)
 
+# bump whenever a change to the extraction or the parser changes the parsed sections,
+# so that anything cached from an older version gets recomputed
+PARSER_VERSION = "2"
+
+# the weekly grid of the view data: a column per day
+# and a row every half hour from 0800 to 1800, in hhmm
+VIEW_DATA_DAYS = ["M", "T", "W", "R", "F"]
+VIEW_DATA_TIMES = [
+    day * 50 + 800 if day % 2 == 0 else math.floor(day / 2) * 2 * 50 + 830
+    for day in range(21)
+]
+
+# page footer and column header, repeated on every page
+_FOOTER = re.compile(r"John Abbott College \d{1,3}")
+_HEADER = re.compile(r"SECTION")
+_SECTION_NUMBER = re.compile(r"\d{5}")
+_COURSE_CODE = re.compile(r"\d{3}-[A-Z0-9]{3}-[A-Z0-9]{1,2}")
+# notes that start a new line in the section's more
+_NOTE_BREAK = re.compile(r"ADDITIONAL|\*\*\*.*\*\*\*")
+_PROF_NAME = re.compile(r"([A-Z].+), ([A-Z].+)")
+
+
+class LineKind(Enum):
+    FOOTER = auto()
+    HEADER = auto()
+    COMPLEMENTARY_RULES = auto()
+    # the title of the pdf, repeated on every page before the course of the page
+    TITLE = auto()
+    # a domain in the section column, eg. BIOLOGY
+    DOMAIN = auto()
+    # a section number, then the course code, title and times of its first leclab
+    SECTION_START = auto()
+    # the course code, title and times of another leclab of the section
+    COURSE = auto()
+    # Lecture or Laboratory, then the prof and times of the leclab
+    LECLAB = auto()
+    # the rest of the title of the leclab, and maybe its times
+    COURSE_TITLE = auto()
+    DAY_TIME = auto()
+    # a line of the section's more
+    NOTE = auto()
+    # indented in the section column, or with nothing to parse
+    IGNORED = auto()
+
+
+def classify_line(line: Line, title: str) -> LineKind:
+    """
+    Classifies a line once, from its text and then from its first cell that isn't
+    in the none or disc column, before it goes through the parser's state machine.
+    The columns of the table of the line must already be assigned
+    """
+    line_text = line.text
+
+    if _FOOTER.match(line_text):
+        return LineKind.FOOTER
+
+    if _HEADER.match(line_text):
+        return LineKind.HEADER
+
+    if line_text == "COMPLEMENTARY RULES":
+        return LineKind.COMPLEMENTARY_RULES
+
+    if line_text == title:
+        return LineKind.TITLE
+
+    for column, text in line.cells():
+        match column:
+            case Column.SECTION_INDENT:
+                return LineKind.IGNORED
+            case Column.SECTION if _SECTION_NUMBER.fullmatch(text):
+                return LineKind.SECTION_START
+            case Column.SECTION:
+                return LineKind.DOMAIN
+            case Column.DISC | Column.COURSE_NUMBER if _leclab_type(column, text):
+                return LineKind.LECLAB
+            case Column.COURSE_NUMBER if _COURSE_CODE.fullmatch(text):
+                return LineKind.COURSE
+            case Column.COURSE_NUMBER:
+                return LineKind.NOTE
+            case Column.COURSE_TITLE:
+                return LineKind.COURSE_TITLE
+            case Column.DAY:
+                return LineKind.DAY_TIME
+
+    return LineKind.IGNORED
+
+
+def _leclab_type(column: int, text: str) -> LecLabType | None:
+    """
+    The type of leclab the word of a leclab line starts, the disc column only containing it
+    """
+    if column == Column.DISC:
+        if "Lecture" in text:
+            return LecLabType.LECTURE
+        if "Laboratory" in text:
+            return LecLabType.LAB
+    elif column == Column.COURSE_NUMBER:
+        if text == "Lecture":
+            return LecLabType.LECTURE
+        if text == "Laboratory":
+            return LecLabType.LAB
+
+    return None
+
 
 @final
 class NewParser:
     def __init__(self):
+        # sections closed by _update_section that haven't been handed out yet
         self._sections: list[Section] = []
         self._current_section: Section = Section()
         self._leclab: LecLab = LecLab()
 
-    def parse(self, lines: list[list[Word]], columns_x: ColumnsXs) -> list[Section]:
+        self._title: str | None = None
+        self._complementary_rules = False
+        self._next_line_is_course = False
+
+    def parse(self, lines: WordTable, columns_x: ColumnsXs) -> list[Section]:
         """
         Parses the given lines and returns the list of Sections that got parsed
         """
-        title = get_line_text(lines[0])
+        lines.assign_columns(columns_x)
+        return list(self.iter_parse(lines.lines()))
 
-        i = 0
-        complementary_rules = False
+    def iter_parse(self, lines: Iterable[Line]) -> Iterator[Section]:
+        """
+        Parses the given lines, yielding each Section as soon as it is complete,
+        so the lines can still be getting extracted while parsing.
+        The columns of the tables of the lines must already be assigned
+        """
+        for line in lines:
+            self._feed(line)
+            yield from self._take_sections()
 
-        while i < len(lines):
-            line = lines[i]
-            i += 1
-            line_text = get_line_text(line)
+        self._update_section()
+        yield from self._take_sections()
 
-            if re.match(
-                r"John Abbott College \d{1,3}",
-                line_text,  # footer
-            ) or line_text.startswith("SECTION"):  # column header
-                continue
+    def _take_sections(self) -> list[Section]:
+        sections = self._sections
+        self._sections = []
+        return sections
 
-            if line_text == "COMPLEMENTARY RULES":
-                complementary_rules = True
+    def _feed(self, line: Line):
+        line_text = line.text
 
-            if complementary_rules:
-                if line_text == title:
-                    complementary_rules = False
-                else:
-                    continue
+        if self._title is None:
+            self._title = line_text
 
-            if line_text == title:
-                section_type = get_line_text(lines[i])
-                i += 1
+        if self._next_line_is_course:
+            self._next_line_is_course = False
 
-                if section_type != self._current_section.course:
-                    self._update_section(False)
+            if line_text != self._current_section.course:
+                self._update_section(False)
 
-                self._current_section.course = section_type
-                continue
+            self._current_section.course = line_text
+            return
 
-            self._parse_line(line, columns_x)
+        kind = classify_line(line, self._title)
 
-        self._update_section()
+        if self._complementary_rules and kind != LineKind.TITLE:
+            # skipped until the next title
+            return
 
-        return self._sections
+        match kind:
+            case LineKind.FOOTER | LineKind.HEADER | LineKind.IGNORED:
+                return
+            case LineKind.COMPLEMENTARY_RULES:
+                self._complementary_rules = True
+            case LineKind.TITLE:
+                self._complementary_rules = False
+                # the line after the title is the course
+                self._next_line_is_course = True
+            case LineKind.DOMAIN:
+                self._parse_domain(line)
+            case LineKind.SECTION_START:
+                self._parse_section_start(line)
+            case LineKind.COURSE:
+                self._parse_course(line)
+            case LineKind.LECLAB:
+                self._parse_leclab(line)
+            case LineKind.COURSE_TITLE | LineKind.DAY_TIME:
+                self._parse_title_and_times(line)
+            case LineKind.NOTE:
+                self._parse_note(line)
+
+    def _parse_domain(self, line: Line):
+        if self._current_section.domain != line.text:
+            self._update_section()
+
+        self._current_section.domain = line.text
+
+    def _parse_section_start(self, line: Line):
+        self._update_section()
+        self._current_section.section = _cell_text(line, Column.SECTION)
+        self._parse_course(line)
 
-    def _parse_line(self, line: list[Word], columns_x: ColumnsXs):
-        did_update_title = False
-        is_leclab_line = False
+    def _parse_course(self, line: Line):
+        code = _cell_text(line, Column.COURSE_NUMBER)
 
-        for i, word in enumerate(line):
-            x = word.x0
-            text = word.text
+        if _COURSE_CODE.fullmatch(code):
+            self._update_section_times()
+            self._current_section.code = code
 
-            if columns_x.section <= x < columns_x.disc:
-                if x != columns_x.section:
-                    return
+        self._parse_title_and_times(line)
 
-                if re.match(r"^\d{5}$", text):
-                    self._update_section()
-                    self._current_section.section = text
-                else:
-                    line_text = get_line_text(line)
-                    if self._current_section.domain != line_text:
-                        self._update_section()
-                    self._current_section.domain = line_text
-                continue
-
-            if columns_x.disc == x:
-                if "Lecture" in text:
-                    logger.info("lecture in disc")
-                    is_leclab_line = True
-                    self._leclab.type = LecLabType.LECTURE
-                elif "Laboratory" in text:
-                    is_leclab_line = True
-                    self._leclab.type = LecLabType.LAB
-                continue
-
-            if columns_x.course_number == x:
-                if "Lecture" == text:
-                    is_leclab_line = True
-                    self._leclab.type = LecLabType.LECTURE
-                    continue
-                elif "Laboratory" == text:
-                    is_leclab_line = True
-                    self._leclab.type = LecLabType.LAB
-                    continue
-                elif re.match(r"^\d{3}-[A-Z0-9]{3}-[A-Z0-9]{1,2}$", text):
-                    self._update_section_times()
-                    self._current_section.code = text
-                else:
-                    self._current_section.more += get_line_text(line)
+    def _parse_leclab(self, line: Line):
+        for column, text in line.cells():
+            if leclab_type := _leclab_type(column, text):
+                self._leclab.type = leclab_type
+                break
 
-                    if re.match("^ADDITIONAL", text) or re.match(
-                        r"\*\*\*.*\*\*\*", text
-                    ):
-                        self._current_section.more += "\n"
-                    else:
-                        self._current_section.more += " "
+        # the title column of a leclab line holds its prof
+        self._parse_title_and_times(line, is_prof=True)
+        self._leclab.prof = self._leclab.prof.strip()
 
-                    return
-                continue
+    def _parse_title_and_times(self, line: Line, is_prof: bool = False):
+        did_update_title = False
 
-            if columns_x.course_title <= x < columns_x.day:
-                if is_leclab_line:
+        for i, (column, text) in enumerate(line.cells()):
+            if column == Column.COURSE_TITLE:
+                if is_prof:
                     self._leclab.prof += text + " "
                 else:
                     self._leclab.title += text + " "
                     did_update_title = True
-                continue
-
-            if columns_x.day == x:
-                day = text
-                time = line[i + 1].text
-                start, end = time.split("-")
 
-                self._leclab.update_time(day, start, end)
-                continue
+            elif column == Column.DAY:
+                start, end = line.word_text(i + 1).split("-")
+                self._leclab.update_time(text, start, end)
 
         if did_update_title:
             self._leclab.title = self._leclab.title.strip()
             self._leclab.title += ";"
 
-        if is_leclab_line:
-            self._leclab.prof = self._leclab.prof.strip()
+    def _parse_note(self, line: Line):
+        self._current_section.more += line.text
+
+        if _NOTE_BREAK.match(_cell_text(line, Column.COURSE_NUMBER)):
+            self._current_section.more += "\n"
+        else:
+            self._current_section.more += " "
 
     def _update_section(self, keep_course: bool = True):
         if self._current_section.section == "":
@@ -158,6 +270,7 @@ class NewParser:
 
         id = f"{self._current_section.code}-{self._current_section.section}"
         self._current_section.id = id
+        self._current_section.fingerprint = self._current_section.compute_fingerprint()
 
         self._sections.append(self._current_section)
 
@@ -188,7 +301,7 @@ class NewParser:
 
             prof = title_lines[-1]
 
-            if prof.startswith("TBA-") or re.match(r"^([A-Z].+), ([A-Z].+)$", prof):
+            if prof.startswith("TBA-") or _PROF_NAME.fullmatch(prof):
                 logger.info(f"{prof} is valid")
 
                 self._leclab.prof = prof
@@ -205,14 +318,8 @@ class NewParser:
         self._leclab = LecLab()
 
     def _add_viewdata_to_current_section(self):
-        col = ["M", "T", "W", "R", "F"]
-        row: list[int] = []
-
-        for day in range(21):
-            if day % 2 == 0:
-                row.append(day * 50 + 800)
-            else:
-                row.append(math.floor(day / 2) * 2 * 50 + 830)
+        col = VIEW_DATA_DAYS
+        row = VIEW_DATA_TIMES
 
         days: dict[str, list[tuple[str, str]]] = {}
 
@@ -249,11 +356,11 @@ class NewParser:
         self._current_section.view_data = viewData
 
 
-def get_line_text(line: list[Word]) -> str:
+def _cell_text(line: Line, column: Column) -> str:
     """
-    Gets the str representation of the given list of Words
+    The first word of the line in the given column, empty if there is none
     """
-    return " ".join([word.text for word in line])
+    return next((text for c, text in line.cells() if c == column), "")
 
 
 def check_if_already_parsed(files: Files | None) -> list[Section] | None:
@@ -276,17 +383,17 @@ def check_if_already_parsed(files: Files | None) -> list[Section] | None:
     return None
 
 
-def get_semester(lines: list[list[Word]]):
+def get_semester(lines: WordTable):
     """
     Gets the semester of the pdf from the given lines
     """
 
-    title = get_line_text(lines[0])
+    title = lines.line(0).text
     return title.replace("SCHEDULE OF CLASSES - ", "")
 
 
 def parse_and_save(
-    sorted_lines: list[list[Word]],
+    sorted_lines: WordTable,
     columns_x: ColumnsXs,
     parsed_sections_path: Path,
     override: bool | None,
@@ -316,8 +423,6 @@ if __name__ == "__main__":
     files = Files()
     parser = NewParser()
 
-    sorted_lines_dict = compute_sorted_lines(files.pdf_path)
-    columns_x = compute_columns_x(sorted_lines_dict)
-    _ = parse_and_save(
-        list(sorted_lines_dict.values()), columns_x, files.parsed_sections_path, None
-    )
+    sorted_lines = compute_sorted_lines(files.pdf_path)
+    columns_x = compute_columns_x(sorted_lines)
+    _ = parse_and_save(sorted_lines, columns_x, files.parsed_sections_path, None)
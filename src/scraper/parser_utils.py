@@ -1,112 +1,352 @@
+from array import array
 from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+import itertools
 import json
+import math
+import mmap
 from pathlib import Path
 import re
-from typing import Any, TypeAlias
+import struct
+import sys
+from typing import Any
 
-from pydantic import TypeAdapter
 import pymupdf
 
-from scraper.models import ColumnsXs, Word
-from scraper.util import contains_data
+from scraper.models import ColumnsXs
+from scraper.util import contains_data, use_saved_data
+from scraper.word_table import IntColumn, WordTable
 
-ExtractedWord: TypeAlias = tuple[float, float, float, float, str, int, int, int]
+type ExtractedWord = tuple[float, float, float, float, str, int, int, int]
+# page height and the (text, x0, top) of each word of the page
+type ExtractedPage = tuple[float, list[tuple[str, int, float]]]
 CID_PATTERN = re.compile(r"\(cid:\d+\)")
+# number of pages extracted per worker task when streaming
+STREAM_CHUNK_PAGES = 8
+
+SORTED_LINES_MAGIC = b"WTBL"
+SORTED_LINES_FORMAT_VERSION = 1
+# magic, format version, big endian, word count, line count, text count, text length
+_SORTED_LINES_HEADER = struct.Struct("<4sI?xxxIIII")
+_INT_SIZE = array("i").itemsize
 
 
 def compute_sorted_lines_if_not_exist(
-    sorted_lines_path: Path, pdf_path: Path, override: bool | None
-) -> OrderedDict[int, list[Word]]:
+    sorted_lines_path: Path, pdf_path: Path, override: bool | None, workers: int = 1
+) -> WordTable:
     """
-    Gets the sorted lines at the given sorted_lines_path.
+    Gets the sorted lines saved in the binary format at the given sorted_lines_path.
     If it exists and already parsed, return it, otherwise
-    compute a fresh sorted_lines and save it
+    compute a fresh sorted_lines and save it.
+    Whether the saved lines are still those of the pdf is up to the override,
+    see the sorted_lines stage of main
     """
-    if s := contains_data(
+    if use_saved_data(
         override, sorted_lines_path, "Pdf already parsed into sorted lines."
     ):
-        adapter = TypeAdapter(OrderedDict[int, list[Word]])
-        return adapter.validate_json(s, by_alias=True)
+        return load_sorted_lines_binary(sorted_lines_path)
 
-    sorted_lines = compute_sorted_lines(pdf_path)
+    sorted_lines = compute_sorted_lines(pdf_path, workers=workers)
 
-    save_sorted_lines(sorted_lines, sorted_lines_path)
+    save_sorted_lines_binary(sorted_lines, sorted_lines_path)
 
     return sorted_lines
 
 
-def save_sorted_lines(
-    sorted_lines: OrderedDict[int, list[Word]], sorted_lines_path: Path
-):
-    """Saves the given sorted_lines as json to the given sorted_lines_path"""
-
-    def map(word: Word) -> dict[str, Any]:
-        return word.model_dump(by_alias=True)
+def export_sorted_lines_json(sorted_lines: WordTable, sorted_lines_path: Path):
+    """
+    Exports the given sorted_lines as indented json, keyed by the doctop of each line,
+    to be read by a person. The parser only saves and loads the binary format
+    """
 
-    serializable_lines: OrderedDict[float, list[dict[str, Any]]] = OrderedDict()
-    for k, v in sorted_lines.items():
-        serializable_lines[k] = [map(w) for w in v]
+    serializable_lines: OrderedDict[int, list[dict[str, Any]]] = OrderedDict()
+    for line in sorted_lines.lines():
+        serializable_lines[sorted_lines.doctops[line.start]] = [
+            {
+                "page_number": sorted_lines.page_numbers[i],
+                "text": sorted_lines.texts[sorted_lines.text_ids[i]],
+                "x0": sorted_lines.x0s[i],
+                "top": sorted_lines.tops[i],
+                "doctop": sorted_lines.doctops[i],
+            }
+            for i in range(line.start, line.stop)
+        ]
 
     with open(sorted_lines_path, "w") as f:
         json.dump(serializable_lines, f, indent=2, ensure_ascii=False)
 
 
+def load_sorted_lines(s: str) -> WordTable:
+    """Loads the sorted_lines json written by export_sorted_lines_json"""
+
+    table = WordTable()
+
+    for line in json.loads(s).values():
+        for word in line:
+            table.add_word(
+                word["page_number"],
+                word["text"],
+                word["x0"],
+                word["top"],
+                word["doctop"],
+            )
+        table.end_line()
+
+    return table
+
+
+def save_sorted_lines_binary(sorted_lines: WordTable, path: Path):
+    """
+    Saves the given sorted_lines in a compact binary format: a header, the int32 columns
+    of the table one after the other, then the string pool as the end offset of each text
+    followed by all the texts concatenated in utf-8.
+    The file is replaced rather than rewritten, as tables loaded from it map it
+    """
+
+    text_ends = array("i", itertools.accumulate(len(t) for t in sorted_lines.texts))
+    text_bytes = "".join(sorted_lines.texts).encode()
+
+    header = _SORTED_LINES_HEADER.pack(
+        SORTED_LINES_MAGIC,
+        SORTED_LINES_FORMAT_VERSION,
+        sys.byteorder == "big",
+        len(sorted_lines.x0s),
+        len(sorted_lines),
+        len(sorted_lines.texts),
+        len(text_bytes),
+    )
+
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        _ = f.write(header)
+        for column in (
+            sorted_lines.page_numbers,
+            sorted_lines.x0s,
+            sorted_lines.tops,
+            sorted_lines.doctops,
+            sorted_lines.text_ids,
+            sorted_lines.line_starts,
+            text_ends,
+        ):
+            _ = f.write(column)
+        _ = f.write(text_bytes)
+
+    _ = tmp_path.replace(path)
+
+
+def load_sorted_lines_binary(path: Path) -> WordTable:
+    """
+    Loads the sorted_lines written by save_sorted_lines_binary.
+    The file is memory-mapped and the columns of the table are views over it,
+    so nothing but the string pool is read until the words are
+    """
+
+    with open(path, "rb") as f:
+        # the map outlives the file, as long as a view over it does
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    (
+        magic,
+        version,
+        big_endian,
+        word_count,
+        line_count,
+        text_count,
+        text_length,
+    ) = _SORTED_LINES_HEADER.unpack_from(view)
+
+    if magic != SORTED_LINES_MAGIC or version != SORTED_LINES_FORMAT_VERSION:
+        raise ValueError(
+            f"{path} is not a version {SORTED_LINES_FORMAT_VERSION} sorted lines file"
+        )
+
+    offset = _SORTED_LINES_HEADER.size
+
+    def read_column(length: int) -> IntColumn:
+        nonlocal offset
+
+        end = offset + length * _INT_SIZE
+        column_bytes = view[offset:end]
+        offset = end
+
+        if big_endian == (sys.byteorder == "big"):
+            return column_bytes.cast("i")
+
+        # written on a machine of the other byte order, so copied to be swapped
+        column = array("i")
+        column.frombytes(column_bytes)
+        column.byteswap()
+        return column
+
+    page_numbers = read_column(word_count)
+    x0s = read_column(word_count)
+    tops = read_column(word_count)
+    doctops = read_column(word_count)
+    text_ids = read_column(word_count)
+    line_starts = read_column(line_count + 1)
+    text_ends = read_column(text_count)
+
+    all_texts = str(view[offset : offset + text_length], "utf-8")
+    texts = [
+        all_texts[start:end]
+        for start, end in zip(itertools.chain((0,), text_ends), text_ends)
+    ]
+
+    return WordTable.from_columns(
+        page_numbers, x0s, tops, doctops, text_ids, texts, line_starts
+    )
+
+
 def compute_sorted_lines(
-    pdf_path: Path, max_pages: int | None = None
-) -> OrderedDict[int, list[Word]]:
+    pdf_path: Path, max_pages: int | None = None, workers: int = 1
+) -> WordTable:
     """
-    Parses the pdf at the given path and returns an OrderedDict where
-    the key is the y position of the line in the entire pdf and
-    the value is a list of Word that makes up the line
+    Parses the pdf at the given path and returns a WordTable of its words,
+    grouped into lines sorted by their y position in the entire pdf.
+    With more than one worker, page ranges are extracted in a process pool
     """
-    lines: OrderedDict[int, list[Word]] = OrderedDict()
+    page_count = get_page_count(pdf_path, max_pages)
+
+    pages: Iterable[ExtractedPage]
+    if workers > 1 and page_count > 1:
+        pages = _extract_pages_in_parallel(pdf_path, page_count, workers)
+    else:
+        pages = _iter_page_range(pdf_path, 0, page_count)
+
+    table = WordTable()
+    doctop_offset = 0.0
+
+    for page_number, (height, words) in enumerate(pages):
+        _add_page_words(table, page_number, words, doctop_offset)
+        doctop_offset += height
+
+    return table
+
+
+def iter_sorted_lines(
+    pdf_path: Path, max_pages: int | None = None, workers: int = 1
+) -> Iterator[WordTable]:
+    """
+    Same as compute_sorted_lines, but yields a WordTable per page
+    as soon as the page is extracted instead of one table for the entire pdf
+    """
+    page_count = get_page_count(pdf_path, max_pages)
+
+    if workers > 1 and page_count > 1:
+        pages = _iter_pages_in_parallel(pdf_path, page_count, workers)
+    else:
+        pages = _iter_page_range(pdf_path, 0, page_count)
+
+    doctop_offset = 0.0
 
+    for page_number, (height, words) in enumerate(pages):
+        table = WordTable()
+        _add_page_words(table, page_number, words, doctop_offset)
+        doctop_offset += height
+
+        yield table
+
+
+def get_page_count(pdf_path: Path, max_pages: int | None = None) -> int:
+    """
+    Gets the number of pages of the pdf.
+    Raises if it exceeds the given max_pages
+    """
     with pymupdf.open(pdf_path) as doc:
-        if max_pages is not None and doc.page_count > max_pages:
-            raise ValueError(f"PDF exceeds the {max_pages}-page limit")
+        page_count = doc.page_count
+
+    if max_pages is not None and page_count > max_pages:
+        raise ValueError(f"PDF exceeds the {max_pages}-page limit")
+
+    return page_count
+
+
+def _extract_pages_in_parallel(
+    pdf_path: Path, page_count: int, workers: int
+) -> list[ExtractedPage]:
+    """
+    Shards the pages into contiguous ranges, one per worker, and extracts
+    them in a process pool. Results are returned in page order
+    """
+    workers = min(workers, page_count)
+    chunk_size = math.ceil(page_count / workers)
+    starts = range(0, page_count, chunk_size)
+    stops = [min(start + chunk_size, page_count) for start in starts]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(
+            _extract_page_range, itertools.repeat(pdf_path), starts, stops
+        )
+        return list(itertools.chain.from_iterable(chunks))
+
 
-        doctop_offset = 0.0
-        y = -1
-        line: list[Word] = []
+def _iter_pages_in_parallel(
+    pdf_path: Path, page_count: int, workers: int
+) -> Iterator[ExtractedPage]:
+    """
+    Extracts small ranges of pages in a process pool,
+    yielding them in page order as soon as each range is done
+    """
+    starts = range(0, page_count, STREAM_CHUNK_PAGES)
+    stops = [min(start + STREAM_CHUNK_PAGES, page_count) for start in starts]
 
-        for page_number, page in enumerate(doc):
-            for word in __get_sorted_words(page_number, page, doctop_offset):
-                if word.doctop != y:
-                    if y != -1:
-                        lines[y] = line
-                        line = []
-                    y = word.doctop
+    with ProcessPoolExecutor(max_workers=min(workers, len(starts))) as executor:
+        chunks = executor.map(
+            _extract_page_range, itertools.repeat(pdf_path), starts, stops
+        )
+        for chunk in chunks:
+            yield from chunk
 
-                line.append(word)
 
-            doctop_offset += page.rect.height
+def _extract_page_range(pdf_path: Path, start: int, stop: int) -> list[ExtractedPage]:
+    """
+    Opens its own document and extracts the pages in [start, stop).
+    Must stay a module level function so it can be sent to a worker process
+    """
+    return list(_iter_page_range(pdf_path, start, stop))
 
-        if line:
-            lines[y] = line
 
-    return lines
+def _iter_page_range(pdf_path: Path, start: int, stop: int) -> Iterator[ExtractedPage]:
+    with pymupdf.open(pdf_path) as doc:
+        for page_number in range(start, stop):
+            yield __get_page_words(doc[page_number])
 
 
-def __get_sorted_words(
-    page_number: int, page: pymupdf.Page, doctop_offset: float
-) -> list[Word]:
+def __get_page_words(page: pymupdf.Page) -> ExtractedPage:
     words: list[ExtractedWord] = page.get_text("words", sort=True)
 
-    return [
-        Word(
-            text=CID_PATTERN.sub("", word[4]),
-            x0=round(word[0]),
-            doctop=round(doctop_offset + word[1]),
-            top=round(word[1]),
-            page_number=page_number,
-        )
-        for word in words
+    return page.rect.height, [
+        (CID_PATTERN.sub("", word[4]), round(word[0]), word[1]) for word in words
     ]
 
 
+def _add_page_words(
+    table: WordTable,
+    page_number: int,
+    words: list[tuple[str, int, float]],
+    doctop_offset: float,
+) -> None:
+    """
+    Adds the words of an extracted page to the table, grouped into lines by their doctop
+    """
+    y = -1
+
+    for text, x0, top in words:
+        doctop = round(doctop_offset + top)
+
+        if doctop != y:
+            table.end_line()
+            y = doctop
+
+        table.add_word(page_number, text, x0, round(top), doctop)
+
+    table.end_line()
+
+
 def compute_columns_x_if_not_exists(
     columns_x_path: Path,
-    sorted_lines_dict: OrderedDict[int, list[Word]],
+    sorted_lines: WordTable,
     override: bool | None,
 ) -> ColumnsXs:
     """
@@ -118,7 +358,7 @@ def compute_columns_x_if_not_exists(
         with open(columns_x_path, "r") as f:
             return ColumnsXs.model_validate_json(s, by_alias=True)
 
-    columns_x = compute_columns_x(sorted_lines_dict)
+    columns_x = compute_columns_x(sorted_lines)
 
     with open(columns_x_path, "w") as f:
         json.dump(columns_x.model_dump(by_alias=True), f, ensure_ascii=False)
@@ -126,34 +366,31 @@ def compute_columns_x_if_not_exists(
     return columns_x
 
 
-def compute_columns_x(
-    sorted_lines_dict: OrderedDict[int, list[Word]],
-) -> ColumnsXs:
+def compute_columns_x(sorted_lines: WordTable) -> ColumnsXs:
     # using the first class section to get all the columns
     columns_x_dict: dict[str, list[int]] = {}
-    sorted_lines = list(sorted_lines_dict.values())
     i = 0
     while i < len(sorted_lines):
-        line = sorted_lines[i]
+        line = sorted_lines.line(i)
 
-        if line[0].text == "SECTION":
+        if line.word_text(0) == "SECTION":
             break
 
         i += 1
 
-    for word in sorted_lines[i]:
-        text: str = word.text
-        columns_x_dict.setdefault(text, []).append(word.x0)
+    for x0, text in sorted_lines.line(i).words():
+        columns_x_dict.setdefault(text, []).append(x0)
 
     i += 1
 
-    section_first_line = sorted_lines[i]
+    section_first_line = sorted_lines.line(i)
+    last = len(section_first_line) - 1
 
-    assert re.match(r"\d{4}-\d{4}", section_first_line[-1].text)
-    time_column = section_first_line[-1].x0
+    assert re.match(r"\d{4}-\d{4}", section_first_line.word_text(last))
+    time_column = section_first_line.x0(last)
 
-    assert re.match(r"[TMWRF]{1,5}", section_first_line[-2].text)
-    day_column = section_first_line[-2].x0
+    assert re.match(r"[TMWRF]{1,5}", section_first_line.word_text(last - 1))
+    day_column = section_first_line.x0(last - 1)
 
     columns_x = ColumnsXs(
         section=columns_x_dict["SECTION"].pop(),
@@ -167,34 +404,18 @@ def compute_columns_x(
     return columns_x
 
 
-def get_parser_deps_if_not_exists(
-    sorted_lines_path: Path, pdf_path: Path, columns_x_path: Path, override: bool | None
-) -> tuple[list[list[Word]], ColumnsXs]:
-    """
-    Gets the sorted_lines and columns_x with override
-    """
-
-    parsed_sorted_lines_dict = compute_sorted_lines_if_not_exist(
-        sorted_lines_path, pdf_path, override
-    )
-    parsed_columns_x = compute_columns_x_if_not_exists(
-        columns_x_path, parsed_sorted_lines_dict, override
-    )
-    parsed_sorted_lines = list(parsed_sorted_lines_dict.values())
-
-    return parsed_sorted_lines, parsed_columns_x
-
-
 def get_parser_deps(
     pdf_path: Path,
     max_pages: int | None = None,
-) -> tuple[list[list[Word]], ColumnsXs]:
+    workers: int = 1,
+) -> tuple[WordTable, ColumnsXs]:
     """
     Gets the sorted_lines and columns_x
     """
 
-    parsed_sorted_lines_dict = compute_sorted_lines(pdf_path, max_pages=max_pages)
-    parsed_columns_x = compute_columns_x(parsed_sorted_lines_dict)
-    parsed_sorted_lines = list(parsed_sorted_lines_dict.values())
+    parsed_sorted_lines = compute_sorted_lines(
+        pdf_path, max_pages=max_pages, workers=workers
+    )
+    parsed_columns_x = compute_columns_x(parsed_sorted_lines)
 
     return parsed_sorted_lines, parsed_columns_x
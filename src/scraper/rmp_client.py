@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+import time
+from types import TracebackType
+from typing import Self, final
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RMP_BASE_URL = "https://www.ratemyprofessors.com"
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:139.0) Gecko/20100101 Firefox/139.0"
+
+# statuses worth retrying: throttled or a server side hiccup
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+@final
+class TokenBucket:
+    """
+    Allows on average `rate` acquisitions per second, with bursts of up to `capacity`
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@final
+class RmpClient:
+    """
+    Async client for ratemyprofessors sharing one connection pool.
+    Requests are rate limited by a token bucket, capped in concurrency
+    and retried with jittered exponential backoff when throttled or on server errors
+    """
+
+    def __init__(
+        self,
+        base_url: str = RMP_BASE_URL,
+        requests_per_second: float = 5,
+        burst: int = 5,
+        max_concurrency: int = 8,
+        max_retries: int = 4,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 16,
+        timeout_seconds: float = 15,
+    ) -> None:
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+
+        self._rate_limiter = TokenBucket(requests_per_second, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> Self:
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            timeout=self.timeout_seconds,
+            follow_redirects=True,
+        )
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_text(self, path: str, params: dict[str, str] | None = None) -> str:
+        """
+        Gets the body of the page at the given path.
+        Raises ConnectionError on a non retryable status or once the retries are exhausted
+        """
+        assert self._client is not None, "RmpClient must be used with async with"
+
+        for attempt in range(self.max_retries + 1):
+            response: httpx.Response | None = None
+            error: str
+
+            async with self._semaphore:
+                await self._rate_limiter.acquire()
+
+                try:
+                    response = await self._client.get(path, params=params)
+                except httpx.TransportError as err:
+                    error = repr(err)
+
+            if response is not None:
+                if response.status_code == 200:
+                    return response.text
+
+                error = str(response.status_code)
+
+                if response.status_code not in RETRYABLE_STATUSES:
+                    raise ConnectionError(f"failed to get {path}: {error}")
+
+            if attempt == self.max_retries:
+                raise ConnectionError(
+                    f"failed to get {path} after {attempt + 1} attempts: {error}"
+                )
+
+            delay = self._backoff(attempt, response)
+            logger.debug(f"retrying {path} in {delay:.2f}s: {error}")
+            await asyncio.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+    def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff_seconds)
+
+        # full jitter
+        return random.uniform(
+            0, min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+        )
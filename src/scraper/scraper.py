@@ -1,18 +1,25 @@
+import asyncio
 import json
 from logging import log
 import logging
 import re
+import time
 from collections import OrderedDict
-from collections.abc import Iterable
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterable, Mapping
 from pathlib import Path
 
-import requests
 from pydantic import TypeAdapter
 
 from scraper import util
 from scraper.files import Files
 from scraper.models import Rating, Section, Status
+from scraper.rmp_client import RmpClient
+
+SCHOOL_ID = 12050
+SCHOOL_REF = "U2Nob29sLTEyMDUw"  # id for jac
+
+# how long a professor not found on rate my professor is not searched again
+MISSING_PID_TTL_SECONDS = 30 * 24 * 3600
 
 
 def scrape_with_override(
@@ -21,34 +28,156 @@ def scrape_with_override(
     pids_path: Path,
     override: bool | None,
     debug: bool,
+    ttl_seconds: float | None = None,
+    missing_pids_path: Path | None = None,
+    missing_pid_ttl_seconds: float = MISSING_PID_TTL_SECONDS,
 ) -> dict[str, Rating]:
     """
     Gets the rating for all professors in the given parsed_sections.
+    With a ttl_seconds and without override, only the professors that are new or whose
+    saved rating is older than the ttl are scraped again, the others keep their saved rating.
+    With a missing_pids_path, professors that weren't found in the last missing_pid_ttl_seconds
+    aren't searched again
 
-    SIDE EFFECT: will write to pids and ratings file if override
+    SIDE EFFECT: will write to pids, missing pids and ratings file if override or refreshing
     """
 
+    if ttl_seconds is not None and not override and ratings_path.exists():
+        return refresh_ratings(
+            parsed_sections,
+            ratings_path,
+            pids_path,
+            ttl_seconds,
+            debug,
+            missing_pids_path,
+            missing_pid_ttl_seconds,
+        )
+
     if s := util.contains_data(
         override, ratings_path, "Ratings JSON already populated."
     ):
         return TypeAdapter(dict[str, Rating]).validate_json(s)
 
     professors = util.get_professors_from_sections(parsed_sections)
+
+    ratings = _scrape_and_save_pids(
+        professors, pids_path, missing_pids_path, missing_pid_ttl_seconds, debug
+    )
+
+    _save_ratings(ratings_path, ratings)
+
+    return ratings
+
+
+def refresh_ratings(
+    parsed_sections: list[Section],
+    ratings_path: Path,
+    pids_path: Path,
+    ttl_seconds: float,
+    debug: bool,
+    missing_pids_path: Path | None = None,
+    missing_pid_ttl_seconds: float = MISSING_PID_TTL_SECONDS,
+) -> dict[str, Rating]:
+    """
+    Scrapes again the ratings of the professors of the given parsed_sections that are
+    missing from the saved ratings or are stale, and saves them with the fresh ones.
+    Returns the ratings of every professor of the given parsed_sections
+    """
+
+    saved_ratings = TypeAdapter(dict[str, Rating]).validate_json(
+        ratings_path.read_text()
+    )
+    professors = util.get_professors_from_sections(parsed_sections)
+
+    stale = get_stale_professors(professors, saved_ratings, ttl_seconds, time.time())
+    log(
+        logging.INFO,
+        f"REFRESHING {len(stale)} of {len(professors)} ratings older than {ttl_seconds}s",
+    )
+
+    if stale:
+        fresh_ratings = _scrape_and_save_pids(
+            stale, pids_path, missing_pids_path, missing_pid_ttl_seconds, debug
+        )
+
+        # ratings of professors of other semesters are kept for their next refresh
+        saved_ratings.update(fresh_ratings)
+        _save_ratings(ratings_path, saved_ratings)
+
+    return {prof: saved_ratings[prof] for prof in professors}
+
+
+def get_stale_professors(
+    professors: list[str],
+    saved_ratings: dict[str, Rating],
+    ttl_seconds: float,
+    now: float,
+) -> list[str]:
+    """
+    The professors without a saved rating, or with one fetched more than ttl_seconds ago
+    """
+
+    def is_stale(prof: str) -> bool:
+        rating = saved_ratings.get(prof)
+
+        if rating is None or rating.fetched_at is None:
+            return True
+
+        return now - rating.fetched_at > ttl_seconds
+
+    return [prof for prof in professors if is_stale(prof)]
+
+
+def _scrape_and_save_pids(
+    professors: list[str],
+    pids_path: Path,
+    missing_pids_path: Path | None,
+    missing_pid_ttl_seconds: float,
+    debug: bool,
+) -> dict[str, Rating]:
+    """
+    Scrapes the given professors, then saves the pids that were found and
+    the professors that were searched but not found
+    """
     pids = util.get_saved_pids(pids_path)
+    missing_pids = (
+        {} if missing_pids_path is None else util.get_missing_pids(missing_pids_path)
+    )
+
+    known_missing = get_known_missing_professors(
+        missing_pids, missing_pid_ttl_seconds, time.time()
+    )
+
+    ratings = scrape(professors, pids, debug, known_missing)
 
-    ratings = scrape(professors, pids, debug)
     _merge_pids_with_newer(pids, ratings.values())
     _save_pids(pids, pids_path)
 
-    _save_ratings(ratings_path, ratings)
+    if missing_pids_path is not None:
+        _merge_missing_pids(missing_pids, ratings.values(), known_missing)
+        _save_pids(missing_pids, missing_pids_path)
 
     return ratings
 
 
+def get_known_missing_professors(
+    missing_pids: dict[str, float], ttl_seconds: float, now: float
+) -> frozenset[str]:
+    """
+    The professors that weren't found on rate my professor in the last ttl_seconds
+    """
+    return frozenset(
+        prof
+        for prof, searched_at in missing_pids.items()
+        if now - searched_at <= ttl_seconds
+    )
+
+
 def scrape(
     professors: list[str],
     saved_pids: dict[str, str | None],
     debug: bool,
+    known_missing: frozenset[str] = frozenset(),
 ) -> dict[str, Rating]:
     """
     Returns the dict of ratings for all the given professors,
@@ -57,24 +186,45 @@ def scrape(
 
     log(logging.INFO, "SCRAPING RATINGS")
 
-    def fn(prof: str) -> tuple[Rating, str]:
-        rating = get_rating(prof, saved_pids)
+    # debug scrapes one professor at a time, like before
+    ratings = asyncio.run(
+        _scrape(
+            professors,
+            saved_pids,
+            max_concurrency=1 if debug else 8,
+            known_missing=known_missing,
+        )
+    )
+
+    log(logging.INFO, "FINISHED SCRAPING")
+
+    return ratings
+
+
+async def _scrape(
+    professors: list[str],
+    saved_pids: dict[str, str | None],
+    max_concurrency: int,
+    client: RmpClient | None = None,
+    known_missing: frozenset[str] = frozenset(),
+) -> dict[str, Rating]:
+    async def fn(client: RmpClient, prof: str) -> tuple[Rating, str]:
+        rating = await fetch_rating(client, prof, saved_pids, known_missing)
+        rating.fetched_at = time.time()
         log(logging.DEBUG, rating)
         return rating, prof
 
-    if debug:
-        results = [fn(p) for p in professors]
-    else:
-        with ThreadPoolExecutor() as e:
-            results = e.map(fn, professors)
+    if client is None:
+        client = RmpClient(max_concurrency=max_concurrency)
+
+    async with client:
+        results = await asyncio.gather(*(fn(client, p) for p in professors))
 
     ratings: dict[str, Rating] = {}
 
     for rating, prof in results:
         ratings[prof] = rating
 
-    log(logging.INFO, "FINISHED SCRAPING")
-
     return ratings
 
 
@@ -83,12 +233,31 @@ def _merge_pids_with_newer(
 ):
     """
     Merges the new pids from the ratings list with the existing one.
+    Professors that weren't found are left to the missing pids
     """
-    newer_pids = {rating.prof: rating.pId for rating in ratings}
+    newer_pids = {
+        rating.prof: rating.pId for rating in ratings if rating.pId is not None
+    }
     saved_pids.update(newer_pids)
 
 
-def _save_pids(pids: dict[str, str | None], pids_path: Path):
+def _merge_missing_pids(
+    missing_pids: dict[str, float],
+    ratings: Iterable[Rating],
+    known_missing: frozenset[str],
+):
+    """
+    Records when the professors without a pid were searched for, and forgets the ones
+    that were found. Known missing professors weren't searched so keep their time
+    """
+    for rating in ratings:
+        if rating.pId is not None:
+            _ = missing_pids.pop(rating.prof, None)
+        elif rating.prof not in known_missing:
+            missing_pids[rating.prof] = rating.fetched_at or time.time()
+
+
+def _save_pids(pids: Mapping[str, str | float | None], pids_path: Path):
     """
     Saves the given pids sorted by the key to the given path
     """
@@ -104,23 +273,40 @@ def get_rating(prof: str, saved_pids: dict[str, str | None]) -> Rating:
     If the pid is not saved, then try to get the pid of the given prof
     """
 
+    async def fn() -> Rating:
+        async with RmpClient() as client:
+            return await fetch_rating(client, prof, saved_pids)
+
+    return asyncio.run(fn())
+
+
+async def fetch_rating(
+    client: RmpClient,
+    prof: str,
+    saved_pids: dict[str, str | None],
+    known_missing: frozenset[str] = frozenset(),
+) -> Rating:
     log(logging.DEBUG, f"GETTING RATING for {prof}")
-    id = _get_prof_id_from_saved_pids(prof, saved_pids)
+    id = await _get_prof_id_from_saved_pids(client, prof, saved_pids, known_missing)
 
     if id is None:
         return Rating(prof=prof)
 
-    if rating := get_stats_from_pid(id, prof):
+    if rating := await fetch_stats_from_pid(client, id, prof):
         return rating
     else:
         return Rating(prof=prof, pId=id)
 
 
-def _get_prof_id_from_saved_pids(
-    prof: str, saved_pids: dict[str, str | None]
+async def _get_prof_id_from_saved_pids(
+    client: RmpClient,
+    prof: str,
+    saved_pids: dict[str, str | None],
+    known_missing: frozenset[str] = frozenset(),
 ) -> str | None:
     """
     Gets the id from the saved pids, otherwise try to get it from rate my professor
+    unless the prof is known to be missing from it
     """
 
     has_pid = (
@@ -131,11 +317,13 @@ def _get_prof_id_from_saved_pids(
 
     if has_pid:
         return saved_pids[prof]
+    elif prof in known_missing:
+        return None
     else:
-        return _get_pid_of_closest_prof(prof)
+        return await _get_pid_of_closest_prof(client, prof)
 
 
-def _get_pid_of_closest_prof(prof: str) -> str | None:
+async def _get_pid_of_closest_prof(client: RmpClient, prof: str) -> str | None:
     """
     The closest of this prof ig
     """
@@ -145,7 +333,10 @@ def _get_pid_of_closest_prof(prof: str) -> str | None:
     fname = _prof.split(", ")[1]
     lname = _prof.split(", ")[0]
 
-    pids = get_pids(lname)
+    return _closest_pid(await fetch_pids(client, lname), fname)
+
+
+def _closest_pid(pids: list[tuple[str, str]], fname: str) -> str | None:
     if len(pids) == 0:
         return None
 
@@ -166,40 +357,53 @@ def get_pids(lastname: str) -> list[tuple[str, str]]:
     Gets all the pids with the given lastname at JAC
     """
 
-    SCHOOL_REF = "U2Nob29sLTEyMDUw"  # id for jac
+    async def fn() -> list[tuple[str, str]]:
+        async with RmpClient() as client:
+            return await fetch_pids(client, lastname)
+
+    return asyncio.run(fn())
 
-    url = f"https://www.ratemyprofessors.com/search/professors/12050?q={lastname}"
-    r = requests.get(
-        url,
-        headers={
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:139.0) Gecko/20100101 Firefox/139.0"
-        },
-    )
 
-    if r.status_code != 200:
-        raise ConnectionError(f"failed to fetch pids for {lastname}: {r.status_code}")
+async def fetch_pids(client: RmpClient, lastname: str) -> list[tuple[str, str]]:
+    try:
+        text = await client.get_text(
+            f"/search/professors/{SCHOOL_ID}", params={"q": lastname}
+        )
+    except ConnectionError as err:
+        raise ConnectionError(f"failed to fetch pids for {lastname}: {err}") from err
 
+    return _parse_pids(text, lastname)
+
+
+def _parse_pids(text: str, lastname: str) -> list[tuple[str, str]]:
     return re.findall(
         r'{"__id":"[\w=]+","__typename":"Teacher","id":"[\w=]+","legacyId":(\d+),"avgRating":[\d\.]+,"numRatings":[\d\.]+,"wouldTakeAgainPercent":[\d\.]+,"avgDifficulty":[\d\.]+,"department":"[\w ]+","school":{"__ref":"'
         + f"{SCHOOL_REF}"
         + r'"},"firstName":"([\w\' \-,]+)","lastName":'
         + f'"{lastname}'
         + r',?","isSaved":false}',
-        r.text,
+        text,
         re.I,
     )
 
 
 def _save_ratings(ratings_path: Path, ratings: dict[str, Rating]):
     """
-    Saves the ratings at the given ratings_path
+    Saves the ratings at the given ratings_path, with the time they were fetched at
+    which is left out of the ratings served with the sections
     """
 
     log(logging.INFO, "SAVING RATINGS")
 
     dumpable = sorted(
         (
-            (prof, rating.model_dump(mode="json", by_alias=True))
+            (
+                prof,
+                {
+                    **rating.model_dump(mode="json", by_alias=True),
+                    "fetchedAt": rating.fetched_at,
+                },
+            )
             for [prof, rating] in ratings.items()
         ),
         key=lambda x: x[0],
@@ -210,27 +414,30 @@ def _save_ratings(ratings_path: Path, ratings: dict[str, Rating]):
 
 
 def get_stats_from_pid(pid: str, prof: str) -> Rating | None:
-    SCHOOL_ID = 12050
-    SCHOOL_REF = "U2Nob29sLTEyMDUw"
-
-    url = f"https://www.ratemyprofessors.com/ShowRatings.jsp?tid={pid}"
-    r = requests.get(
-        url,
-        headers={
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:139.0) Gecko/20100101 Firefox/139.0"
-        },
-    )
+    async def fn() -> Rating | None:
+        async with RmpClient() as client:
+            return await fetch_stats_from_pid(client, pid, prof)
+
+    return asyncio.run(fn())
+
+
+async def fetch_stats_from_pid(client: RmpClient, pid: str, prof: str) -> Rating | None:
+    try:
+        text = await client.get_text("/ShowRatings.jsp", params={"tid": pid})
+    except ConnectionError as err:
+        raise ConnectionError(f"failed to get stats for {pid}: {err}") from err
+
+    return _parse_stats(text, pid, prof)
 
-    if r.status_code != 200:
-        raise ConnectionError(f"failed to get stats for {pid}: {r.status_code}")
 
+def _parse_stats(text: str, pid: str, prof: str) -> Rating | None:
     if matches := re.search(
         rf'"__typename":"Teacher".+"legacyId":{pid}'
         + r',"firstName":"[\w\' \-,]+","lastName":"[\w\' \-,]+","department":"[\w ,]+","school":{"__ref":"'
         + f"{SCHOOL_REF}"
         + r'"}.+"numRatings":([\d\.]+).+"avgRating":([\d\.]+).+"avgDifficulty":([\d\.]+),"wouldTakeAgainPercent":([\d\.]+).+'
         + rf'"__typename":"School","legacyId":{SCHOOL_ID}',
-        r.text,
+        text,
     ):
         (
             numRating,
@@ -0,0 +1,57 @@
+from typing import Any
+
+from pydantic import JsonValue
+
+from scraper.models import SECTION_CONTENT_EXCLUDE, FieldChange, Section, SectionPatch
+
+
+def get_section_patch(
+    id: str, old_section: Section, new_section: Section
+) -> SectionPatch:
+    """
+    Gets the fields that changed from the old to the new section, ratings excluded.
+    The leclabs are compared field by field, by position
+    """
+    old = _section_content(old_section)
+    new = _section_content(new_section)
+    changes: list[FieldChange] = []
+
+    for key, old_value in old.items():
+        if key != "leclabs" and old_value != new[key]:
+            changes.append(FieldChange(path=key, old=old_value, new=new[key]))
+
+    old_leclabs: list[dict[str, JsonValue]] = old["leclabs"]
+    new_leclabs: list[dict[str, JsonValue]] = new["leclabs"]
+
+    for n in range(max(len(old_leclabs), len(new_leclabs))):
+        if n >= len(new_leclabs):
+            changes.append(
+                FieldChange(path=f"leclabs.{n}", old=old_leclabs[n], new=None)
+            )
+        elif n >= len(old_leclabs):
+            changes.append(
+                FieldChange(path=f"leclabs.{n}", old=None, new=new_leclabs[n])
+            )
+        else:
+            changes.extend(
+                FieldChange(
+                    path=f"leclabs.{n}.{key}", old=old_value, new=new_leclabs[n][key]
+                )
+                for key, old_value in old_leclabs[n].items()
+                if old_value != new_leclabs[n][key]
+            )
+
+    return SectionPatch(id=id, changes=changes)
+
+
+def _section_content(section: Section) -> dict[str, Any]:
+    return section.model_dump(
+        mode="json", by_alias=True, exclude=SECTION_CONTENT_EXCLUDE
+    )
+
+
+def section_fingerprint(section: Section) -> str:
+    """
+    Gets the fingerprint of the section, computing it for sections saved without one
+    """
+    return section.fingerprint or section.compute_fingerprint()
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import final
+
+from scraper.models import ConfiguredBaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class StageRecord(ConfiguredBaseModel):
+    inputs_hash: str
+    output_hash: str
+
+
+@final
+class StageCache:
+    """
+    Records, for each stage of the pipeline, the hash of the inputs it last ran with
+    and of the output it wrote, so a stage is only run again when one of them changed.
+    The records are saved to the manifest_path after every recorded stage
+    """
+
+    def __init__(self, manifest_path: Path) -> None:
+        self.manifest_path = manifest_path
+        self._records: dict[str, StageRecord] = {}
+
+        if manifest_path.exists():
+            self._records = {
+                stage: StageRecord.model_validate(record)
+                for stage, record in json.loads(manifest_path.read_bytes()).items()
+            }
+
+    def is_fresh(
+        self,
+        stage: str,
+        inputs_hash: str,
+        output_path: Path,
+        verify_output: bool = True,
+    ) -> bool:
+        """
+        Whether the stage already ran with the given inputs and its output is still there.
+        With verify_output, the output must also be the one the stage wrote, not one
+        edited or written by another run since
+        """
+        record = self._records.get(stage)
+
+        if record is None or record.inputs_hash != inputs_hash:
+            return False
+
+        if not output_path.exists():
+            return False
+
+        return not verify_output or hash_file(output_path) == record.output_hash
+
+    def should_run(
+        self,
+        stage: str,
+        inputs_hash: str,
+        output_path: Path,
+        override: bool | None,
+        verify_output: bool = True,
+    ) -> bool:
+        """
+        Whether the stage must run, forced by override when it is given,
+        otherwise when its inputs or its output changed
+        """
+        if override is not None:
+            return override
+
+        fresh = self.is_fresh(stage, inputs_hash, output_path, verify_output)
+        logger.info(f"stage {stage} is {'up to date' if fresh else 'out of date'}")
+        return not fresh
+
+    def record(self, stage: str, inputs_hash: str, output_path: Path) -> str:
+        """
+        Records that the stage ran with the given inputs and wrote output_path.
+        Returns the hash of the output, to be used in the inputs of the next stages
+        """
+        output_hash = hash_file(output_path)
+        self._records[stage] = StageRecord(
+            inputs_hash=inputs_hash, output_hash=output_hash
+        )
+
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        _ = tmp_path.write_text(
+            json.dumps(
+                {
+                    stage: record.model_dump(by_alias=True)
+                    for stage, record in self._records.items()
+                },
+                indent=2,
+            )
+        )
+        _ = tmp_path.replace(self.manifest_path)
+
+        return output_hash
+
+    def finish(
+        self,
+        stage: str,
+        inputs_hash: str,
+        output_path: Path,
+        ran: bool,
+        verify_output: bool = True,
+    ) -> str:
+        """
+        Records the stage if it ran or was already fresh. A saved output kept by a false
+        override while the inputs changed isn't recorded, so the stage still runs next time.
+        Returns the hash of the output either way
+        """
+        if ran or self.is_fresh(stage, inputs_hash, output_path, verify_output):
+            return self.record(stage, inputs_hash, output_path)
+
+        return hash_file(output_path)
+
+
+def hash_inputs(*inputs: str) -> str:
+    """
+    Hashes the given inputs of a stage, ie. the hashes of upstream outputs and versions
+    """
+    return hashlib.sha256("\0".join(inputs).encode()).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+
+    return digest.hexdigest()
@@ -0,0 +1,171 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from scraper import catalog_store
+from scraper.catalog_store import CatalogStore, SectionChanges, catalog_version
+from scraper.models import FieldChange, GlobalAllSections, LecLab, Rating, Section
+
+
+def _global_sections(*sections: Section) -> GlobalAllSections:
+    return GlobalAllSections(
+        semester="FALL 2026",
+        sections_by_id={section.id: section for section in sections},
+        filename="fall.pdf",
+        sections_diff=None,
+        comments=[],
+    )
+
+
+@pytest.fixture
+def global_sections() -> GlobalAllSections:
+    return _global_sections(
+        Section(id="1-00001", code="1", section="00001", title="Calculus I"),
+        Section(
+            id="2-00001",
+            code="2",
+            section="00001",
+            title="Linear Algebra",
+            leclabs=[LecLab(prof="prof 1")],
+        ),
+        Section(
+            id="3-00001",
+            code="3",
+            section="00001",
+            title="Physics",
+            leclabs=[LecLab(prof="prof 2")],
+        ),
+    )
+
+
+def test_checkout_published_version(tmp_path: Path, global_sections: GlobalAllSections):
+    store = CatalogStore(tmp_path)
+    version = store.publish(global_sections)
+
+    assert store.checkout(version) == global_sections
+    assert [v.version for v in store.versions()] == [version]
+
+    latest = store.latest(global_sections.semester)
+    assert latest is not None
+    assert latest.version == version
+    assert latest.section_count == 3
+    assert store.latest("SUMMER 1999") is None
+
+
+def test_index_is_read_once(tmp_path: Path, global_sections: GlobalAllSections):
+    store = CatalogStore(tmp_path)
+    version = store.publish(global_sections)
+    stat = store.index_path.stat()
+
+    # unchanged on disk, so the index in memory is used
+    _ = store.index_path.write_bytes(b" " * stat.st_size)
+    os.utime(store.index_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert [v.version for v in store.versions()] == [version]
+
+    _ = store.index_path.write_bytes(b"[]")
+    assert store.versions() == []
+
+
+def test_version_only_depends_on_the_sections(
+    tmp_path: Path, global_sections: GlobalAllSections
+):
+    store = CatalogStore(tmp_path)
+    version = store.publish(global_sections)
+    sections_json = [
+        section.model_dump_json(by_alias=True).encode()
+        for section in global_sections.sections_by_id.values()
+    ]
+
+    assert version == catalog_version(b"[" + b",".join(sections_json) + b"]")
+    assert store.publish(global_sections.model_copy(update={"comments": ["a"]})) == (
+        version
+    )
+    assert len(store.versions()) == 1
+
+
+def test_sections_are_stored_once(tmp_path: Path, global_sections: GlobalAllSections):
+    store = CatalogStore(tmp_path)
+    sections_by_id = dict(global_sections.sections_by_id)
+    sections_by_id["1-00001"] = sections_by_id["1-00001"].model_copy(
+        update={"title": "Calculus II"}
+    )
+
+    first = store.publish(global_sections)
+    second = store.publish(
+        global_sections.model_copy(update={"sections_by_id": sections_by_id})
+    )
+
+    assert len(list(store.objects_dir.glob("*/*.json"))) == 4
+    assert [v.version for v in store.versions()] == [first, second]
+    assert store.checkout(first) == global_sections
+
+
+def test_diff_between_versions(tmp_path: Path, global_sections: GlobalAllSections):
+    store = CatalogStore(tmp_path)
+    sections_by_id = dict(global_sections.sections_by_id)
+    del sections_by_id["1-00001"]
+    sections_by_id["2-00001"] = sections_by_id["2-00001"].model_copy(
+        update={"more": "new note"}
+    )
+    sections_by_id["3-00001"] = sections_by_id["3-00001"].model_copy(
+        update={"leclabs": [LecLab(prof="prof 2", rating=Rating(prof="prof 2"))]}
+    )
+
+    first = store.publish(global_sections)
+    second = store.publish(
+        global_sections.model_copy(update={"sections_by_id": sections_by_id})
+    )
+    diff = store.diff(first, second)
+
+    assert diff.sections_added == []
+    assert diff.sections_removed == ["1-00001"]
+    assert [patch.id for patch in diff.sections_changed] == ["2-00001"]
+    assert diff.sections_changed[0].changes == [
+        FieldChange(path="more", old="", new="new note")
+    ]
+    assert diff.ratings_changed == ["3-00001"]
+    assert store.diff(second, first).sections_added == ["1-00001"]
+
+
+def test_changes_are_precomputed_for_the_last_versions(
+    tmp_path: Path, global_sections: GlobalAllSections, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(catalog_store, "SECTION_CHANGES_VERSIONS", 3)
+    store = CatalogStore(tmp_path)
+
+    versions: list[str] = []
+    for title in ["Calculus I", "Calculus II", "Calculus III", "Calculus IV"]:
+        sections_by_id = dict(global_sections.sections_by_id)
+        sections_by_id["1-00001"] = sections_by_id["1-00001"].model_copy(
+            update={"title": title}
+        )
+        versions.append(
+            store.publish(
+                global_sections.model_copy(update={"sections_by_id": sections_by_id})
+            )
+        )
+    # the first version of another semester, which has nothing to be diffed with
+    del sections_by_id["1-00001"]
+    other_semester = store.publish(
+        global_sections.model_copy(
+            update={"semester": "WINTER 2027", "sections_by_id": sections_by_id}
+        )
+    )
+
+    assert store.changes(versions[0]) == {}
+    assert sorted(store.changes(versions[3])) == sorted(versions[1:3])
+    assert store.changes(other_semester) == {}
+
+    changes = SectionChanges.model_validate_json(
+        store.changes(versions[3])[versions[2]]
+    )
+    assert changes.since == versions[2]
+    assert changes.version == versions[3]
+    assert [section.title for section in changes.sections_changed] == ["Calculus IV"]
+    assert changes.sections_added == []
+    assert changes.sections_removed == []
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
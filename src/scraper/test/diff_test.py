@@ -5,10 +5,13 @@ from scraper.models import (
     GlobalAllSections,
     LecLab,
     Rating,
+    FieldChange,
     Section,
+    SectionPatch,
     SectionsDiff,
 )
-from scraper.util import get_global_sections_diff, get_sections_diff, is_different
+from scraper.section_patch import get_section_patch
+from scraper.util import get_global_sections_diff, get_sections_diff
 
 
 @pytest.mark.parametrize(
@@ -52,17 +55,43 @@ from scraper.util import get_global_sections_diff, get_sections_diff, is_differe
         ),
     ],
 )
-def test_is_different_prof(old_section: Section, new_section: Section, res: bool):
-    assert is_different(old_section, new_section) == res
+def test_section_changed_prof(old_section: Section, new_section: Section, res: bool):
+    assert is_changed(old_section, new_section) == res
+
+
+def is_changed(old_section: Section, new_section: Section) -> bool:
+    diff = get_sections_diff({"1": old_section}, {"1": new_section})
+    return diff.sections_changed != []
+
+
+def test_section_changed_with_fingerprints():
+    old_section = Section(id="1", code="1", leclabs=[LecLab(prof="prof 1")])
+    old_section.fingerprint = old_section.compute_fingerprint()
+
+    rated_section = old_section.model_copy(
+        update={
+            "leclabs": [LecLab(prof="prof 1", rating=Rating(prof="prof 1", score=2))]
+        }
+    )
+    assert rated_section.compute_fingerprint() == old_section.fingerprint
+    assert not is_changed(old_section, rated_section)
+
+    # the fingerprint is computed for the section saved without one
+    assert not is_changed(
+        old_section, Section(id="1", code="1", leclabs=[LecLab(prof="prof 1")])
+    )
+
+    # an outdated fingerprint is checked against the fields
+    outdated = old_section.model_copy(update={"fingerprint": "outdated"})
+    assert not is_changed(old_section, outdated)
+    assert is_changed(outdated, Section(id="1", code="2"))
 
 
 def test_global_diff_different_semester():
     old_global = GlobalAllSections(
         semester="fall 2026",
         filename="",
-        sections_diff=SectionsDiff(
-            previous_sections_changed=[], sections_added=[], sections_removed=[]
-        ),
+        sections_diff=SectionsDiff(sections_added=[], sections_removed=[]),
         sections_by_id={},
         comments=[],
     )
@@ -85,7 +114,12 @@ def test_global_diff_different_semester():
                 "4": Section(id="4", title="asdf"),
             },
             SectionsDiff(
-                previous_sections_changed=[Section(id="2", title="qwer")],
+                sections_changed=[
+                    SectionPatch(
+                        id="2",
+                        changes=[FieldChange(path="title", old="qwer", new="asdf")],
+                    )
+                ],
                 sections_added=["4"],
                 sections_removed=[Section(id="3", title="asdf")],
             ),
@@ -100,5 +134,70 @@ def test_section_diff(
     assert get_sections_diff(old_sections, new_sections) == diff
 
 
+def test_section_patch():
+    old_section = Section(
+        id="1",
+        more="note",
+        leclabs=[
+            LecLab(prof="prof 1", day_times=[DayTime(day="M")]),
+            LecLab(prof="prof 2", rating=Rating(prof="prof 2", score=1)),
+        ],
+    )
+    new_section = Section(
+        id="1",
+        more="other note",
+        leclabs=[LecLab(prof="prof 3", day_times=[DayTime(day="T")])],
+    )
+
+    patch = get_section_patch("1", old_section, new_section)
+
+    assert patch.id == "1"
+    assert patch.changes == [
+        FieldChange(path="more", old="note", new="other note"),
+        FieldChange(path="leclabs.0.prof", old="prof 1", new="prof 3"),
+        FieldChange(
+            path="leclabs.0.dayTimes",
+            old=[{"day": "M", "startTimeHhmm": "", "endTimeHhmm": ""}],
+            new=[{"day": "T", "startTimeHhmm": "", "endTimeHhmm": ""}],
+        ),
+        FieldChange(
+            path="leclabs.1",
+            old={"title": "", "type": None, "prof": "prof 2", "dayTimes": []},
+            new=None,
+        ),
+    ]
+
+
+def test_section_diff_ignores_ratings():
+    old_sections = {
+        "1": Section(
+            id="1", leclabs=[LecLab(prof="a", rating=Rating(prof="a", score=1))]
+        )
+    }
+    new_sections = {
+        "1": Section(
+            id="1", leclabs=[LecLab(prof="a", rating=Rating(prof="a", score=2))]
+        )
+    }
+
+    assert get_sections_diff(old_sections, new_sections) == SectionsDiff(
+        sections_added=[], sections_removed=[]
+    )
+
+
+def test_saved_diff_without_patches():
+    diff = SectionsDiff.model_validate(
+        {
+            "previousSectionsChanged": [{"id": "1"}],
+            "sectionsAdded": [],
+            "sectionsRemoved": [],
+        }
+    )
+
+    # the whole sections before they changed, saved before the patches, are dropped
+    assert diff == SectionsDiff(sections_added=[], sections_removed=[])
+    assert "previousSectionsChanged" not in diff.model_dump_json(by_alias=True)
+
+
 if __name__ == "__main__":
     exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
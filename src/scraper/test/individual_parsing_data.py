@@ -700,8 +700,8 @@ def func(x: dict[str, Any], xs: list[int]) -> ATestCase:
     return ATestCase(name=x["name"], lines=list(lines.values()))
 
 
-def make_data(columns_x: ColumnsXs) -> list[tuple[ATestCase, Section]]:
-    xs = [
+def make_xs(columns_x: ColumnsXs) -> list[int]:
+    return [
         columns_x.section,
         columns_x.disc,
         columns_x.course_number,
@@ -709,4 +709,8 @@ def make_data(columns_x: ColumnsXs) -> list[tuple[ATestCase, Section]]:
         columns_x.day,
         columns_x.time,
     ]
+
+
+def make_data(columns_x: ColumnsXs) -> list[tuple[ATestCase, Section]]:
+    xs = make_xs(columns_x)
     return [(func(test, xs), exp) for test, exp in raw_data]
@@ -8,11 +8,25 @@ import re
 
 
 from scraper.files import Files
+from scraper.lib import stream_sections
 from scraper.models import DayTime, LecLab, LecLabType, Section, Word
-from scraper.new_parser import NewParser
-from scraper.parser_utils import compute_columns_x, compute_sorted_lines
-from scraper.test.individual_parsing_data import ATestCase, make_data
-
+from scraper.new_parser import LineKind, NewParser, classify_line
+from scraper.parser_utils import (
+    compute_columns_x,
+    compute_sorted_lines,
+    compute_sorted_lines_if_not_exist,
+    export_sorted_lines_json,
+    load_sorted_lines,
+    load_sorted_lines_binary,
+    save_sorted_lines_binary,
+)
+from scraper.test.individual_parsing_data import (
+    ATestCase,
+    func,
+    make_data,
+    make_xs,
+)
+from scraper.word_table import Column, ColumnBuckets, WordTable
 
 pdf_path = (
     Path(__file__).parent.parent.parent.parent
@@ -27,9 +41,9 @@ pre_refac_path = (
 files = Files(pdf_path)
 width, height = 0, 0
 
-parsed_sorted_lines_dict = compute_sorted_lines(pdf_path)
-parsed_sorted_lines = list(parsed_sorted_lines_dict.values())
-parsed_columns_x = compute_columns_x(parsed_sorted_lines_dict)
+parsed_sorted_lines = compute_sorted_lines(pdf_path)
+parsed_sorted_lines_dict = parsed_sorted_lines.to_sorted_lines()
+parsed_columns_x = compute_columns_x(parsed_sorted_lines)
 
 with pymupdf.open(files.pdf_path) as document:
     page = document[0]
@@ -94,6 +108,85 @@ def test_rejects_pdf_over_page_limit() -> None:
         _ = compute_sorted_lines(pdf_path, max_pages=1)
 
 
+def test_parallel_extraction_matches_serial() -> None:
+    parallel_sorted_lines = compute_sorted_lines(pdf_path, workers=4)
+
+    assert parallel_sorted_lines.to_sorted_lines() == parsed_sorted_lines_dict
+
+
+def test_word_table_round_trip(tmp_path: Path) -> None:
+    table = WordTable.from_lines(list(parsed_sorted_lines_dict.values()))
+    assert table.to_sorted_lines() == parsed_sorted_lines_dict
+    assert len(table.texts) < len(table.x0s)
+
+    sorted_lines_path = tmp_path / "sorted_lines.json"
+    export_sorted_lines_json(parsed_sorted_lines, sorted_lines_path)
+    loaded = load_sorted_lines(sorted_lines_path.read_text())
+
+    assert loaded.to_sorted_lines() == parsed_sorted_lines_dict
+
+
+def test_binary_sorted_lines_round_trip(tmp_path: Path) -> None:
+    binary_path = tmp_path / "sorted_lines.bin"
+    save_sorted_lines_binary(parsed_sorted_lines, binary_path)
+
+    loaded = load_sorted_lines_binary(binary_path)
+
+    # unlike the json keyed by doctop, every line is kept as is
+    assert list(loaded.line_starts) == list(parsed_sorted_lines.line_starts)
+    assert loaded.texts == parsed_sorted_lines.texts
+    assert loaded.to_sorted_lines() == parsed_sorted_lines_dict
+    assert NewParser().parse(loaded, parsed_columns_x) == NewParser().parse(
+        parsed_sorted_lines, parsed_columns_x
+    )
+
+    # the columns are views over the file, so the loaded table is read-only
+    assert isinstance(loaded.x0s, memoryview)
+    with pytest.raises(TypeError):
+        loaded.add_word(1, "word", 0, 0, 0)
+
+    bad_path = tmp_path / "bad.bin"
+    _ = bad_path.write_bytes(b"nope" + binary_path.read_bytes()[4:])
+    with pytest.raises(ValueError):
+        _ = load_sorted_lines_binary(bad_path)
+
+
+def test_sorted_lines_are_only_saved_as_binary(tmp_path: Path) -> None:
+    sorted_lines_path = tmp_path / "sorted_lines.bin"
+    json_path = tmp_path / "sorted_lines.json"
+
+    computed = compute_sorted_lines_if_not_exist(sorted_lines_path, pdf_path, True)
+    assert computed.to_sorted_lines() == parsed_sorted_lines_dict
+    assert [p.name for p in tmp_path.iterdir()] == [sorted_lines_path.name]
+
+    saved = compute_sorted_lines_if_not_exist(sorted_lines_path, pdf_path, False)
+    assert saved.to_sorted_lines() == parsed_sorted_lines_dict
+
+    export_sorted_lines_json(saved, json_path)
+    assert sorted_lines_path.stat().st_size < json_path.stat().st_size / 5
+
+
+def test_column_buckets_match_column_ranges():
+    c = parsed_columns_x
+    buckets = ColumnBuckets(c)
+
+    for x in range(-1, c.time + 50):
+        if c.section <= x < c.disc:
+            expected = Column.SECTION if x == c.section else Column.SECTION_INDENT
+        elif x == c.disc:
+            expected = Column.DISC
+        elif x == c.course_number:
+            expected = Column.COURSE_NUMBER
+        elif c.course_title <= x < c.day:
+            expected = Column.COURSE_TITLE
+        elif x == c.day:
+            expected = Column.DAY
+        else:
+            expected = Column.NONE
+
+        assert buckets.column(x) == expected, x
+
+
 def test_correct_column_x():
     columns_x: dict[str, set[Word]] = {}
 
@@ -167,13 +260,50 @@ def test_correct_column_x():
     assert columns_x["time"].pop().x0 == parsed_columns_x.time
 
 
+TITLE = "SCHEDULE OF CLASSES - FALL 2026"
+
+
+@pytest.mark.parametrize(
+    "row,expected",
+    [
+        (["John Abbott College 12"], LineKind.FOOTER),
+        (["John Abbott College 123"], LineKind.FOOTER),
+        (["SECTION", "DISC", "COURSE NUMBER", "COURSE TITLE"], LineKind.HEADER),
+        (["COMPLEMENTARY RULES"], LineKind.COMPLEMENTARY_RULES),
+        ([TITLE], LineKind.TITLE),
+        (["MATHEMATICS"], LineKind.DOMAIN),
+        (
+            ["00001", "MATH", "201-NYA-05", "Calculus I", "TR", "1300-1430"],
+            LineKind.SECTION_START,
+        ),
+        (["", "MATH", "201-NYA-05", "Calculus I", "M", "0800-1000"], LineKind.COURSE),
+        (["", "", "Lecture", "Smith, John", "", ""], LineKind.LECLAB),
+        (["", "Laboratory", "", "Smith, John", "", ""], LineKind.LECLAB),
+        (["", "", "", "and Vectors", "", ""], LineKind.COURSE_TITLE),
+        (["", "", "", "", "W", "1000-1200"], LineKind.DAY_TIME),
+        (["", "", "ADDITIONAL FEES", "", "", ""], LineKind.NOTE),
+        (["", "CERAMICS", "", "", "", ""], LineKind.IGNORED),
+        (["John Abbott College"], LineKind.DOMAIN),
+        (["COMPLEMENTARY RULES APPLY"], LineKind.DOMAIN),
+    ],
+)
+def test_classify_line(row: list[str], expected: LineKind):
+    lines = WordTable.from_lines(
+        func({"name": "classify", "lines": [row]}, make_xs(parsed_columns_x)).lines
+    )
+    lines.assign_columns(parsed_columns_x)
+
+    assert classify_line(lines.line(len(lines) - 1), TITLE) == expected
+
+
 @pytest.mark.parametrize("test_case,expected", make_data(parsed_columns_x))
 def test_individual_parsing(parser: NewParser, test_case: ATestCase, expected: Section):
     print(test_case.name)
-    sections = parser.parse(test_case.lines, parsed_columns_x)
+    sections = parser.parse(WordTable.from_lines(test_case.lines), parsed_columns_x)
 
     for section in sections:
         section.view_data = []
+        section.fingerprint = ""
 
     assert len(sections) == 1
 
@@ -185,6 +315,14 @@ def test_individual_parsing(parser: NewParser, test_case: ATestCase, expected: S
     ]
 
 
+def test_stream_sections_matches_parse():
+    sections = NewParser().parse(parsed_sorted_lines, parsed_columns_x)
+    streamed_sections = list(stream_sections(pdf_path))
+
+    assert len(streamed_sections) > 0
+    assert streamed_sections == sections
+
+
 def test_parity_with_old_parser():
     files = Files(pre_refac_path)
     parser = NewParser()
@@ -192,14 +330,14 @@ def test_parity_with_old_parser():
     def remove_double_space(s: str) -> str:
         return re.sub(" +", " ", s)
 
-    old_sorted_lines_dict = compute_sorted_lines(files.pdf_path)
-    old_sorted_lines = list(old_sorted_lines_dict.values())
-    old_columns_x = compute_columns_x(old_sorted_lines_dict)
+    old_sorted_lines = compute_sorted_lines(files.pdf_path)
+    old_columns_x = compute_columns_x(old_sorted_lines)
 
     sections = parser.parse(old_sorted_lines, old_columns_x)
 
     for section in sections:
         section.view_data = []
+        section.fingerprint = ""
 
     with open(files.out_file_path, "r") as file:
         out: list[dict[str, Any]] = from_json(file.read())
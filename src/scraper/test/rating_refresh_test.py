@@ -0,0 +1,183 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+import scraper.scraper as scraper
+from scraper.models import LecLab, Rating, Section, Status
+
+DAY = 24 * 3600
+
+
+def section_with_profs(id: str, *profs: str) -> Section:
+    return Section(id=id, leclabs=[LecLab(prof=prof) for prof in profs])
+
+
+def test_stale_professors():
+    now = 10 * DAY
+    saved = {
+        "Fresh, Prof": Rating(prof="Fresh, Prof", fetched_at=now - DAY / 2),
+        "Old, Prof": Rating(prof="Old, Prof", fetched_at=now - 2 * DAY),
+        "Legacy, Prof": Rating(prof="Legacy, Prof"),
+    }
+
+    stale = scraper.get_stale_professors(
+        ["Fresh, Prof", "Old, Prof", "Legacy, Prof", "New, Prof"], saved, DAY, now
+    )
+
+    assert stale == ["Old, Prof", "Legacy, Prof", "New, Prof"]
+
+
+def test_fetched_at_is_only_saved_in_ratings_file(tmp_path: Path):
+    ratings_path = tmp_path / "ratings.json"
+    rating = Rating(prof="Doe, Jane", avg=4, fetched_at=DAY)
+    scraper._save_ratings(ratings_path, {rating.prof: rating})
+
+    assert json.loads(ratings_path.read_text())["Doe, Jane"]["fetchedAt"] == DAY
+    assert "fetchedAt" not in LecLab(rating=rating).model_dump_json(by_alias=True)
+
+
+def test_refresh_only_scrapes_stale_and_new(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    now = time.time()
+    ratings_path = tmp_path / "ratings.json"
+    pids_path = tmp_path / "pids.json"
+    _ = pids_path.write_text(json.dumps({"Fresh, Prof": "1", "Old, Prof": "2"}))
+
+    saved = {
+        "Fresh, Prof": Rating(prof="Fresh, Prof", pId="1", avg=4, fetched_at=now),
+        "Old, Prof": Rating(prof="Old, Prof", pId="2", avg=2, fetched_at=now - DAY),
+        "Gone, Prof": Rating(prof="Gone, Prof", pId="3", fetched_at=now - DAY),
+    }
+    scraper._save_ratings(ratings_path, saved)
+
+    scraped: list[str] = []
+
+    def fake_scrape(
+        professors: list[str],
+        _saved_pids: dict[str, str | None],
+        _debug: bool,
+        _known_missing: frozenset[str],
+    ) -> dict[str, Rating]:
+        scraped.extend(professors)
+        return {
+            prof: Rating(
+                prof=prof, pId=f"new-{prof}", status=Status.FOUND, fetched_at=now
+            )
+            for prof in professors
+        }
+
+    monkeypatch.setattr(scraper, "scrape", fake_scrape)
+
+    sections = [
+        section_with_profs("00001", "Fresh, Prof", "Old, Prof"),
+        section_with_profs("00002", "New, Prof"),
+    ]
+    ratings = scraper.scrape_with_override(
+        sections, ratings_path, pids_path, None, False, ttl_seconds=DAY / 2
+    )
+
+    assert sorted(scraped) == ["New, Prof", "Old, Prof"]
+    assert ratings.keys() == {"Fresh, Prof", "Old, Prof", "New, Prof"}
+    assert ratings["Fresh, Prof"] == saved["Fresh, Prof"]
+    assert ratings["Old, Prof"].status == Status.FOUND
+
+    # the refreshed ratings are saved alongside the ones of other semesters
+    saved_again = json.loads(ratings_path.read_text())
+    assert saved_again.keys() == {"Fresh, Prof", "Old, Prof", "New, Prof", "Gone, Prof"}
+    assert json.loads(pids_path.read_text())["New, Prof"] == "new-New, Prof"
+
+
+def test_refresh_without_stale_skips_scraping(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    ratings_path = tmp_path / "ratings.json"
+    scraper._save_ratings(
+        ratings_path,
+        {"Fresh, Prof": Rating(prof="Fresh, Prof", fetched_at=time.time())},
+    )
+
+    def fail_scrape(*_args: object) -> dict[str, Rating]:
+        raise AssertionError("nothing should be scraped")
+
+    monkeypatch.setattr(scraper, "scrape", fail_scrape)
+
+    ratings = scraper.scrape_with_override(
+        [section_with_profs("00001", "Fresh, Prof")],
+        ratings_path,
+        tmp_path / "pids.json",
+        False,
+        False,
+        ttl_seconds=DAY,
+    )
+
+    assert list(ratings) == ["Fresh, Prof"]
+
+
+def test_missing_pids_are_not_searched_until_expired(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    now = time.time()
+    pids_path = tmp_path / "pids.json"
+    missing_pids_path = tmp_path / "missing_pids.json"
+    _ = missing_pids_path.write_text(
+        json.dumps(
+            {
+                "Recent, Missing": now - DAY,
+                "Expired, Missing": now - 40 * DAY,
+                "Found, Now": now - 40 * DAY,
+            }
+        )
+    )
+
+    def fake_scrape(
+        professors: list[str],
+        _saved_pids: dict[str, str | None],
+        _debug: bool,
+        known_missing: frozenset[str],
+    ) -> dict[str, Rating]:
+        assert known_missing == {"Recent, Missing"}
+        return {
+            prof: Rating(
+                prof=prof,
+                pId="42" if prof == "Found, Now" else None,
+                fetched_at=now,
+            )
+            for prof in professors
+        }
+
+    monkeypatch.setattr(scraper, "scrape", fake_scrape)
+
+    _ = scraper.scrape_with_override(
+        [
+            section_with_profs(
+                "00001",
+                "Recent, Missing",
+                "Expired, Missing",
+                "Found, Now",
+                "TBA, Never",
+            )
+        ],
+        tmp_path / "ratings.json",
+        pids_path,
+        True,
+        False,
+        missing_pids_path=missing_pids_path,
+        missing_pid_ttl_seconds=30 * DAY,
+    )
+
+    # unmatched professors stay out of pids.json, which only keeps the found ones
+    assert json.loads(pids_path.read_text()) == {"Found, Now": "42"}
+
+    missing_pids = json.loads(missing_pids_path.read_text())
+    assert missing_pids == {
+        "Recent, Missing": pytest.approx(now - DAY),
+        "Expired, Missing": pytest.approx(now),
+        "TBA, Never": pytest.approx(now),
+    }
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vv", __file__]))
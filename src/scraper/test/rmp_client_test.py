@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import scraper.scraper as scraper
+from scraper.models import Rating, Status
+from scraper.rmp_client import RmpClient, TokenBucket
+
+SEARCH_PAGE = (
+    '{"__id":"VGVhY2hlci0x","__typename":"Teacher","id":"VGVhY2hlci0x","legacyId":817818,'
+    '"avgRating":4.5,"numRatings":10,"wouldTakeAgainPercent":90,"avgDifficulty":2.5,'
+    '"department":"Physics","school":{"__ref":"U2Nob29sLTEyMDUw"},'
+    '"firstName":"Grell","lastName":"Grant","isSaved":false}'
+)
+
+STATS_PAGE = (
+    '"__typename":"Teacher","id":"VGVhY2hlci0x","legacyId":817818,'
+    '"firstName":"Grell","lastName":"Grant","department":"Physics",'
+    '"school":{"__ref":"U2Nob29sLTEyMDUw"},"x":1,"numRatings":10,"y":1,'
+    '"avgRating":4.5,"z":1,"avgDifficulty":2.5,"wouldTakeAgainPercent":90,"w":1,'
+    '"__typename":"School","legacyId":12050'
+)
+
+
+@dataclass
+class StubRmp:
+    """
+    What the stub server answers, and what it saw
+    """
+
+    base_url: str = ""
+    # statuses to answer before succeeding, per path
+    failures: dict[str, list[int]] = field(default_factory=dict)
+    delay_seconds: float = 0
+    hits: dict[str, int] = field(default_factory=dict)
+    in_flight: int = 0
+    max_in_flight: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@pytest.fixture
+def stub() -> Iterator[StubRmp]:
+    state = StubRmp()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+
+            with state.lock:
+                state.hits[url.path] = state.hits.get(url.path, 0) + 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                failures = state.failures.get(url.path, [])
+                status = failures.pop(0) if failures else 200
+
+            time.sleep(state.delay_seconds)
+
+            if url.path.startswith("/search/professors/"):
+                query = parse_qs(url.query)["q"][0]
+                body = SEARCH_PAGE if query.lower() == "grant" else ""
+            elif url.path == "/ShowRatings.jsp":
+                body = STATS_PAGE
+            else:
+                status = 404
+                body = ""
+
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            _ = self.wfile.write(body.encode())
+
+            with state.lock:
+                state.in_flight -= 1
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    state.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield state
+
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(stub: StubRmp, **kwargs: float) -> RmpClient:
+    options: dict[str, float] = {
+        "requests_per_second": 1000,
+        "burst": 1000,
+        "backoff_seconds": 0.01,
+        "max_backoff_seconds": 0.05,
+    }
+    options.update(kwargs)
+
+    return RmpClient(base_url=stub.base_url, **options)  # type: ignore[arg-type]
+
+
+async def get_text(client: RmpClient, path: str) -> str:
+    async with client:
+        return await client.get_text(path)
+
+
+def test_retries_throttled_and_server_errors(stub: StubRmp):
+    stub.failures["/ShowRatings.jsp"] = [429, 503, 500]
+
+    text = asyncio.run(get_text(client_for(stub), "/ShowRatings.jsp"))
+
+    assert text == STATS_PAGE
+    assert stub.hits["/ShowRatings.jsp"] == 4
+
+
+def test_gives_up_after_max_retries(stub: StubRmp):
+    stub.failures["/ShowRatings.jsp"] = [502] * 10
+
+    with pytest.raises(ConnectionError):
+        _ = asyncio.run(get_text(client_for(stub, max_retries=2), "/ShowRatings.jsp"))
+
+    assert stub.hits["/ShowRatings.jsp"] == 3
+
+
+def test_does_not_retry_client_errors(stub: StubRmp):
+    with pytest.raises(ConnectionError):
+        _ = asyncio.run(get_text(client_for(stub), "/missing"))
+
+    assert stub.hits["/missing"] == 1
+
+
+def test_bounded_concurrency(stub: StubRmp):
+    stub.delay_seconds = 0.05
+
+    async def fn() -> None:
+        async with client_for(stub, max_concurrency=3) as client:
+            _ = await asyncio.gather(
+                *(client.get_text("/ShowRatings.jsp") for _ in range(12))
+            )
+
+    asyncio.run(fn())
+
+    assert stub.hits["/ShowRatings.jsp"] == 12
+    assert stub.max_in_flight <= 3
+
+
+def test_token_bucket_rate():
+    async def fn() -> float:
+        bucket = TokenBucket(rate=50, capacity=5)
+        start = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # the burst is free, the 10 others wait for a token each
+    assert asyncio.run(fn()) >= 10 / 50 * 0.9
+
+
+def test_scrape_against_stub(stub: StubRmp):
+    stub.failures["/ShowRatings.jsp"] = [429]
+
+    ratings = asyncio.run(
+        scraper._scrape(
+            ["Grant, Grell", "Nobody, Here"],
+            {},
+            max_concurrency=2,
+            client=client_for(stub),
+        )
+    )
+
+    assert ratings["Nobody, Here"].model_copy(update={"fetched_at": None}) == Rating(
+        prof="Nobody, Here"
+    )
+    assert all(rating.fetched_at is not None for rating in ratings.values())
+
+    rating = ratings["Grant, Grell"]
+    assert rating.pId == "817818"
+    assert rating.status == Status.FOUND
+    assert rating.nRating == 10
+    assert rating.avg == 4.5
+    assert rating.difficulty == 2.5
+    assert rating.takeAgain == 90
+
+
+def test_saved_pid_skips_search(stub: StubRmp):
+    ratings = asyncio.run(
+        scraper._scrape(
+            ["Grant, Grell"],
+            {"Grant, Grell": "817818"},
+            max_concurrency=1,
+            client=client_for(stub),
+        )
+    )
+
+    assert ratings["Grant, Grell"].status == Status.FOUND
+    assert not any(path.startswith("/search") for path in stub.hits)
+
+
+def test_known_missing_skips_search(stub: StubRmp):
+    ratings = asyncio.run(
+        scraper._scrape(
+            ["Grant, Grell"],
+            {},
+            max_concurrency=1,
+            client=client_for(stub),
+            known_missing=frozenset({"Grant, Grell"}),
+        )
+    )
+
+    assert ratings["Grant, Grell"].pId is None
+    assert stub.hits == {}
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vv", __file__]))
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import pytest
+
+from scraper.stage_cache import StageCache, hash_file, hash_inputs
+
+
+def test_stage_is_fresh_after_record(tmp_path: Path):
+    output = tmp_path / "out.json"
+    _ = output.write_text("[1, 2]")
+    stages = StageCache(tmp_path / "stages.json")
+    inputs = hash_inputs("pdf", "1")
+
+    assert not stages.is_fresh("parse", inputs, output)
+
+    _ = stages.record("parse", inputs, output)
+
+    assert stages.is_fresh("parse", inputs, output)
+    assert not stages.is_fresh("parse", hash_inputs("pdf", "2"), output)
+    assert not stages.is_fresh("other", inputs, output)
+
+
+def test_records_are_saved(tmp_path: Path):
+    output = tmp_path / "out.json"
+    _ = output.write_text("[1, 2]")
+    inputs = hash_inputs("pdf")
+    output_hash = StageCache(tmp_path / "stages.json").record("parse", inputs, output)
+
+    stages = StageCache(tmp_path / "stages.json")
+
+    assert stages.is_fresh("parse", inputs, output)
+    assert stages.record("parse", inputs, output) == output_hash
+
+
+def test_changed_or_missing_output_is_stale(tmp_path: Path):
+    output = tmp_path / "out.json"
+    _ = output.write_text("[1, 2]")
+    stages = StageCache(tmp_path / "stages.json")
+    inputs = hash_inputs("pdf")
+    _ = stages.record("parse", inputs, output)
+
+    _ = output.write_text("[1, 2, 3]")
+    assert not stages.is_fresh("parse", inputs, output)
+    assert stages.is_fresh("parse", inputs, output, verify_output=False)
+
+    output.unlink()
+    assert not stages.is_fresh("parse", inputs, output, verify_output=False)
+
+
+def test_override_wins(tmp_path: Path):
+    output = tmp_path / "out.json"
+    _ = output.write_text("[1, 2]")
+    stages = StageCache(tmp_path / "stages.json")
+    inputs = hash_inputs("pdf")
+
+    assert stages.should_run("parse", inputs, output, None)
+    assert not stages.should_run("parse", inputs, output, False)
+
+    _ = stages.record("parse", inputs, output)
+
+    assert not stages.should_run("parse", inputs, output, None)
+    assert stages.should_run("parse", inputs, output, True)
+
+
+def test_kept_output_is_only_recorded_when_fresh(tmp_path: Path):
+    output = tmp_path / "out.json"
+    _ = output.write_text("[1, 2]")
+    stages = StageCache(tmp_path / "stages.json")
+    old_inputs = hash_inputs("pdf", "1")
+    new_inputs = hash_inputs("pdf", "2")
+    _ = stages.record("parse", old_inputs, output)
+
+    # the saved output is kept by a false override, the new inputs never ran
+    assert stages.finish("parse", new_inputs, output, ran=False) == hash_file(output)
+    assert stages.should_run("parse", new_inputs, output, None)
+
+    _ = stages.finish("parse", old_inputs, output, ran=False)
+    assert stages.is_fresh("parse", old_inputs, output)
+
+    _ = stages.finish("parse", new_inputs, output, ran=True)
+    assert not stages.should_run("parse", new_inputs, output, None)
+
+
+def test_hash_inputs_keeps_boundaries():
+    assert hash_inputs("ab", "c") != hash_inputs("a", "bc")
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
@@ -0,0 +1,42 @@
+import pytest
+
+from scraper.trie import Trie
+
+trie = Trie(["Calculus I", "Calculus II", "calculus lab", "Chemistry", "Biology"])
+
+
+def test_contains():
+    assert trie.contains("Calculus I")
+    assert not trie.contains("calculus i")
+    assert not trie.contains("Calc")
+
+
+def test_add_keeps_words_distinct():
+    added = Trie(["b"])
+    added.add("a")
+    added.add("b")
+
+    assert len(added) == 2
+    assert added == Trie(["a", "b"])
+
+
+@pytest.mark.parametrize(
+    "prefix, expected",
+    [
+        ("calc", ["Calculus I", "Calculus II", "calculus lab"]),
+        ("CALCULUS I", ["Calculus I", "Calculus II"]),
+        ("c", ["Calculus I", "Calculus II", "calculus lab", "Chemistry"]),
+        ("", ["Biology", "Calculus I", "Calculus II", "calculus lab", "Chemistry"]),
+        ("z", []),
+    ],
+)
+def test_get_words(prefix: str, expected: list[str]):
+    assert trie.get_words(prefix) == expected
+
+
+def test_get_words_limit():
+    assert trie.get_words("c", limit=2) == ["Calculus I", "Calculus II"]
+
+
+if __name__ == "__main__":
+    exit(pytest.main(["--no-header", "-s", "-vvv", __file__]))
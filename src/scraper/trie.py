@@ -1,44 +1,52 @@
-from pydantic import BaseModel
+from bisect import bisect_left
+from collections.abc import Iterable
 
 
-class TrieNode(BaseModel):
-    children: dict[str, TrieNode] = {}
-    word: str | None = None
+class Trie:
+    """
+    Prefix index over a sorted array of the words, matched case insensitively.
+    A prefix lookup is a bisection followed by a scan of the matching words only
+    """
 
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        # (folded word, word) pairs, sorted by the folded word
+        self._entries: list[tuple[str, str]] = sorted(
+            {(word.casefold(), word) for word in words}
+        )
 
-class Trie(BaseModel):
-    root: TrieNode = TrieNode()
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Trie) and self._entries == other._entries
 
     def add(self, word: str):
-        node = self.root
-        for char in word:
-            node = node.children.setdefault(char, TrieNode())
-        node.word = word
+        entry = (word.casefold(), word)
+
+        i = bisect_left(self._entries, entry)
+        if i == len(self._entries) or self._entries[i] != entry:
+            self._entries.insert(i, entry)
 
     def contains(self, word: str) -> bool:
-        node = self.root
-        for char in word:
-            if char not in node.children:
-                return False
-            node = node.children[char]
-        return node.word == word
-
-    def get_words(self, prefix: str) -> list[str]:
-        node = self.root
-        for char in prefix:
-            if char not in node.children:
-                return []
-            node = node.children[char]
+        entry = (word.casefold(), word)
 
-        words: list[str] = []
+        i = bisect_left(self._entries, entry)
+        return i < len(self._entries) and self._entries[i] == entry
 
-        def fn(node: TrieNode):
-            if node.word is not None:
-                words.append(node.word)
+    def get_words(self, prefix: str, limit: int | None = None) -> list[str]:
+        """
+        Words starting with the given prefix, ignoring case, in alphabetical order.
+        At most limit words are returned when given
+        """
+        folded = prefix.casefold()
+        words: list[str] = []
 
-            for child in node.children.values():
-                fn(child)
+        i = bisect_left(self._entries, (folded,))
+        while i < len(self._entries) and self._entries[i][0].startswith(folded):
+            if limit is not None and len(words) >= limit:
+                break
 
-        fn(node)
+            words.append(self._entries[i][1])
+            i += 1
 
         return words
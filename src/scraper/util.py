@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from collections.abc import Iterable
 import json
 from logging import log
 import logging
@@ -6,13 +7,16 @@ from pathlib import Path
 
 from pydantic import TypeAdapter
 
-
+from scraper.catalog_store import CatalogStore
+from scraper.compact_sections import save_compact_sections
 from scraper.models import (
     GlobalAllSections,
     Rating,
+    SectionPatch,
     SectionsDiff,
     Section,
 )
+from scraper.section_patch import get_section_patch, section_fingerprint
 
 
 def normalize_string(s: str):
@@ -57,6 +61,13 @@ def make_sections_final(
         json.dump(sections_dict_json, file, indent=2, ensure_ascii=False)
 
 
+def normalize_semester(semester: str) -> str:
+    """
+    Normalizes the given semester to the form of GlobalAllSections.semester, ie. FALL 2026
+    """
+    return " ".join(semester.split()).upper()
+
+
 def get_global_sections_diff(
     current_semester: str,
     old_global_all_sections: GlobalAllSections,
@@ -79,49 +90,48 @@ def get_sections_diff(
     old_sections_by_id: dict[str, Section], new_sections_by_id: dict[str, Section]
 ) -> SectionsDiff:
     """
-    Gets the diff between the old and new sections_by_id
+    Gets the diff between the old and new sections_by_id, in a single pass over
+    both sorted lists of ids.
+    The sections are compared by fingerprint, only the ones whose fingerprints differ
+    have their fields compared, into the patch of their changed fields
     """
 
     sections_added: list[str] = []
     sections_removed: list[Section] = []
-    previous_sections: list[Section] = []
+    sections_changed: list[SectionPatch] = []
+
+    old_ids = sorted(old_sections_by_id)
+    new_ids = sorted(new_sections_by_id)
+    i = j = 0
+
+    while i < len(old_ids) or j < len(new_ids):
+        if j == len(new_ids) or (i < len(old_ids) and old_ids[i] < new_ids[j]):
+            sections_removed.append(old_sections_by_id[old_ids[i]])
+            i += 1
 
-    for id, old_section in old_sections_by_id.items():
-        if id not in new_sections_by_id:
-            sections_removed.append(old_section)
+        elif i == len(old_ids) or new_ids[j] < old_ids[i]:
+            sections_added.append(new_ids[j])
+            j += 1
 
-        elif is_different(old_section, new_sections_by_id[id]):
-            previous_sections.append(old_section)
+        else:
+            old_section = old_sections_by_id[old_ids[i]]
+            new_section = new_sections_by_id[new_ids[j]]
 
-    for id in new_sections_by_id.keys():
-        if id not in old_sections_by_id:
-            sections_added.append(id)
+            if section_fingerprint(old_section) != section_fingerprint(new_section):
+                patch = get_section_patch(old_ids[i], old_section, new_section)
+                if patch.changes:
+                    sections_changed.append(patch)
+
+            i += 1
+            j += 1
 
     return SectionsDiff(
-        previous_sections_changed=previous_sections,
+        sections_changed=sections_changed,
         sections_added=sections_added,
         sections_removed=sections_removed,
     )
 
 
-def is_different(old_section: Section, new_section: Section) -> bool:
-    """
-    Checks whether the given old and new sections are the same after removing
-    the teacher's rating
-    """
-
-    old_section_copy = old_section.model_copy(deep=True)
-    new_section_copy = new_section.model_copy(deep=True)
-
-    for leclab in old_section_copy.leclabs:
-        leclab.rating = None
-
-    for leclab in new_section_copy.leclabs:
-        leclab.rating = None
-
-    return old_section_copy != new_section_copy
-
-
 def save_global_sections_final(
     semester: str,
     section_by_id: dict[str, Section],
@@ -129,9 +139,13 @@ def save_global_sections_final(
     global_all_sections_final_path_json: Path,
     diff: SectionsDiff | None,
     comments: list[str],
+    global_all_sections_compact_path: Path | None = None,
+    catalog_store: CatalogStore | None = None,
 ) -> GlobalAllSections:
     """
-    Write to the same place rather than by directory
+    Write to the same place rather than by directory.
+    Also writes the compact copy of the sections the api loads at startup if given its path,
+    and keeps the sections in the history of the catalog store if given one
     """
 
     filename = pdf_path.name
@@ -151,45 +165,78 @@ def save_global_sections_final(
             ensure_ascii=False,
         )
 
+    if global_all_sections_compact_path is not None:
+        save_compact_sections(
+            global_sections,
+            global_all_sections_final_path_json,
+            global_all_sections_compact_path,
+        )
+
+    if catalog_store is not None:
+        _ = catalog_store.publish(global_sections)
+
     return global_sections
 
 
+def archive_global_sections(global_sections: GlobalAllSections, path: Path) -> None:
+    """
+    Saves the global all sections of a semester that is being replaced,
+    so the api can keep serving it
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "w") as file:
+        json.dump(
+            global_sections.model_dump(mode="json", by_alias=True),
+            file,
+            indent=2,
+            ensure_ascii=False,
+        )
+
+
 def contains_data(override: bool | None, path: Path, message: str) -> str | None:
     """
     Gets the data at the given path if it exists.
     If it exists and given override is true, then no data is returned.
     If override is None, then asks the user with the given message if they want to override it.
     """
-    if not path.exists():
-        return None
-
-    if override is None:
-        return _ask_override_for_path(path, message)
-
-    if override:
+    if not use_saved_data(override, path, message):
         return None
 
     with open(path, "r") as f:
         return f.read()
 
 
-def _ask_override_for_path(path: Path, message: str) -> str | None:
+def use_saved_data(override: bool | None, path: Path, message: str) -> bool:
     """
-    If override is None, ask the user if they want to override or not
-    the data at the given path with the given message if there is data.
-    Returns the existing data if no override and exists
-    Any input other than y/Y is treated as false.
+    Whether the data at the given path exists and should be used instead of being overridden.
+    If override is None, then asks the user with the given message if they want to override it.
+    """
+    if not path.exists():
+        return False
+
+    if override is None:
+        return _ask_keep_saved_data(path, message)
+
+    return not override
+
+
+def _ask_keep_saved_data(path: Path, message: str) -> bool:
+    """
+    Asks the user if they want to override or not
+    the data at the given path with the given message.
+    Returns whether the existing data should be kept.
+    Any input other than y/Y or nothing is treated as false.
     """
 
     override = input(f"{message} Override? (y) ").lower().strip()
 
     if override == "y" or override == "":
         log(logging.INFO, f"Overriding {path}")
-        return None
+        return False
 
     log(logging.INFO, "Using saved data.")
-    with open(path, "r") as f:
-        return f.read()
+    return True
 
 
 def get_professors_from_sections(parsed_sections: list[Section]) -> list[str]:
@@ -227,7 +274,20 @@ def get_saved_pids(pids_path: Path) -> dict[str, str | None]:
         return adapter.validate_json(file.read())
 
 
-def to_sections_by_id(sections: list[Section]) -> OrderedDict[str, Section]:
+def get_missing_pids(missing_pids_path: Path) -> dict[str, float]:
+    """
+    Gets when each professor that wasn't found on rate my professor was last searched for
+    """
+
+    if not missing_pids_path.exists():
+        return {}
+
+    with open(missing_pids_path, "r") as file:
+        adapter = TypeAdapter(dict[str, float])
+        return adapter.validate_json(file.read())
+
+
+def to_sections_by_id(sections: Iterable[Section]) -> OrderedDict[str, Section]:
     """
     Returns an ordered dict of the sections
     """
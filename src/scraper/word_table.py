@@ -0,0 +1,281 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Iterator
+from enum import IntEnum
+from typing import final
+
+from scraper.models import ColumnsXs, Word
+
+# a column built in memory, or a read-only view over a loaded file
+type IntColumn = array[int] | memoryview
+
+
+class Column(IntEnum):
+    """
+    The column of the schedule a word is in
+    """
+
+    NONE = 0
+    # words at the start of the section column, the section number or the domain
+    SECTION = 1
+    # words inside the section column but not at its start, the whole line is ignored
+    SECTION_INDENT = 2
+    DISC = 3
+    COURSE_NUMBER = 4
+    COURSE_TITLE = 5
+    DAY = 6
+
+
+@final
+class ColumnBuckets:
+    """
+    Assigns words to a column from their x0 with a bisect over the x of the columns.
+    The course title column is a range up to the day column, the section column
+    a range up to the disc column and every other column is an exact x
+    """
+
+    def __init__(self, columns_x: ColumnsXs) -> None:
+        self.columns_x = columns_x
+        self.bounds = [
+            columns_x.section,
+            columns_x.disc,
+            columns_x.course_number,
+            columns_x.course_title,
+            columns_x.day,
+        ]
+
+        if any(a >= b for a, b in zip(self.bounds, self.bounds[1:])):
+            raise ValueError(f"columns are not in order: {columns_x}")
+
+        # column of the words at exactly and after each bound
+        self._at_bound = (
+            Column.SECTION,
+            Column.DISC,
+            Column.COURSE_NUMBER,
+            Column.COURSE_TITLE,
+            Column.DAY,
+        )
+        self._after_bound = (
+            Column.SECTION_INDENT,
+            Column.NONE,
+            Column.NONE,
+            Column.COURSE_TITLE,
+            Column.NONE,
+        )
+
+    def column(self, x: int) -> Column:
+        i = bisect_right(self.bounds, x) - 1
+
+        if i < 0:
+            return Column.NONE
+
+        if x == self.bounds[i]:
+            return self._at_bound[i]
+
+        return self._after_bound[i]
+
+
+@final
+class WordTable:
+    """
+    Columnar storage of the words of a pdf.
+    Every column is a parallel array indexed by word, the text of the words is
+    interned into a string pool and lines are stored as offsets into the columns
+    """
+
+    def __init__(self) -> None:
+        self.page_numbers: IntColumn = array("i")
+        self.x0s: IntColumn = array("i")
+        self.tops: IntColumn = array("i")
+        self.doctops: IntColumn = array("i")
+        self.text_ids: IntColumn = array("i")
+        self.texts: list[str] = []
+        self._text_ids: dict[str, int] = {}
+
+        # line i is made of the words in [line_starts[i], line_starts[i + 1])
+        self.line_starts: IntColumn = array("i", [0])
+
+        # the Column of each word, once assigned from the columns_x
+        self.columns = array("b")
+        self.columns_x: ColumnsXs | None = None
+
+    def __len__(self) -> int:
+        return len(self.line_starts) - 1
+
+    def add_word(
+        self, page_number: int, text: str, x0: int, top: int, doctop: int
+    ) -> None:
+        """
+        Adds a word to the line currently being built
+        """
+        _append(self.page_numbers, page_number)
+        _append(self.x0s, x0)
+        _append(self.tops, top)
+        _append(self.doctops, doctop)
+        _append(self.text_ids, self._intern(text))
+
+    def end_line(self) -> None:
+        """
+        Closes the line currently being built. Does nothing if it has no words
+        """
+        if len(self.x0s) != self.line_starts[-1]:
+            _append(self.line_starts, len(self.x0s))
+
+    def assign_columns(self, columns_x: ColumnsXs) -> None:
+        """
+        Buckets every word into its Column, once per columns_x
+        """
+        if self.columns_x == columns_x and len(self.columns) == len(self.x0s):
+            return
+
+        buckets = ColumnBuckets(columns_x)
+        # few distinct x, so each is only bisected once
+        column_by_x: dict[int, Column] = {}
+
+        def column(x: int) -> int:
+            c = column_by_x.get(x)
+            if c is None:
+                c = column_by_x[x] = buckets.column(x)
+            return c
+
+        self.columns = array("b", map(column, self.x0s))
+        self.columns_x = columns_x
+
+    def _intern(self, text: str) -> int:
+        text_id = self._text_ids.get(text)
+
+        if text_id is None:
+            text_id = len(self.texts)
+            self._text_ids[text] = text_id
+            self.texts.append(text)
+
+        return text_id
+
+    def line(self, i: int) -> Line:
+        return Line(self, self.line_starts[i], self.line_starts[i + 1])
+
+    def lines(self) -> Iterator[Line]:
+        for i in range(len(self)):
+            yield self.line(i)
+
+    def to_sorted_lines(self) -> OrderedDict[int, list[Word]]:
+        """
+        Converts back to the sorted lines of pydantic Words, keyed by the doctop of each line.
+        Only meant for tests, parsing should go through the table directly
+        """
+        lines: OrderedDict[int, list[Word]] = OrderedDict()
+
+        for line in self.lines():
+            lines[self.doctops[line.start]] = [
+                Word(
+                    page_number=self.page_numbers[i],
+                    text=self.texts[self.text_ids[i]],
+                    x0=self.x0s[i],
+                    top=self.tops[i],
+                    doctop=self.doctops[i],
+                )
+                for i in range(line.start, line.stop)
+            ]
+
+        return lines
+
+    @classmethod
+    def from_columns(
+        cls,
+        page_numbers: IntColumn,
+        x0s: IntColumn,
+        tops: IntColumn,
+        doctops: IntColumn,
+        text_ids: IntColumn,
+        texts: list[str],
+        line_starts: IntColumn,
+    ) -> WordTable:
+        """
+        Builds a table directly from its columns, without going through add_word.
+        Words can't be added to a table built from memoryviews
+        """
+        table = cls()
+        table.page_numbers = page_numbers
+        table.x0s = x0s
+        table.tops = tops
+        table.doctops = doctops
+        table.text_ids = text_ids
+        table.texts = texts
+        table._text_ids = {text: i for i, text in enumerate(texts)}
+        table.line_starts = line_starts
+
+        return table
+
+    @classmethod
+    def from_lines(cls, lines: list[list[Word]]) -> WordTable:
+        """
+        Builds a table from lines of pydantic Words, keeping the given line breaks
+        """
+        table = cls()
+
+        for line in lines:
+            for word in line:
+                table.add_word(
+                    word.page_number, word.text, word.x0, word.top, word.doctop
+                )
+            table.end_line()
+
+        return table
+
+
+def _append(column: IntColumn, value: int) -> None:
+    if isinstance(column, memoryview):
+        raise TypeError("Words can't be added to a table loaded from a file")
+    column.append(value)
+
+
+@final
+class Line:
+    """
+    A view over the words of a single line of a WordTable
+    """
+
+    __slots__ = ("_table", "start", "stop", "_text")
+
+    def __init__(self, table: WordTable, start: int, stop: int) -> None:
+        self._table = table
+        self.start = start
+        self.stop = stop
+        self._text: str | None = None
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @property
+    def text(self) -> str:
+        """
+        The words of the line joined by a space, computed once
+        """
+        if self._text is None:
+            self._text = " ".join(self.word_texts())
+
+        return self._text
+
+    def x0(self, k: int) -> int:
+        return self._table.x0s[self.start + k]
+
+    def word_text(self, k: int) -> str:
+        table = self._table
+        return table.texts[table.text_ids[self.start + k]]
+
+    def word_texts(self) -> Iterator[str]:
+        texts = self._table.texts
+        return (texts[i] for i in self._table.text_ids[self.start : self.stop])
+
+    def words(self) -> Iterator[tuple[int, str]]:
+        """
+        The (x0, text) of each word of the line
+        """
+        return zip(self._table.x0s[self.start : self.stop], self.word_texts())
+
+    def cells(self) -> Iterator[tuple[int, str]]:
+        """
+        The (Column, text) of each word of the line, once the table's columns are assigned
+        """
+        return zip(self._table.columns[self.start : self.stop], self.word_texts())